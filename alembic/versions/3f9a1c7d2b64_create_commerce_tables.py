@@ -0,0 +1,106 @@
+"""create commerce tables
+
+Revision ID: 3f9a1c7d2b64
+Revises: bb745a61a256
+Create Date: 2026-10-18 09:12:41.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a1c7d2b64'
+down_revision: Union[str, None] = 'bb745a61a256'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('customers',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('platform', sa.String(), nullable=False),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('first_name', sa.String(), nullable=True),
+    sa.Column('last_name', sa.String(), nullable=True),
+    sa.Column('orders_count', sa.Integer(), nullable=True),
+    sa.Column('total_spent', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=True),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('products',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('platform', sa.String(), nullable=False),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('vendor', sa.String(), nullable=True),
+    sa.Column('product_type', sa.String(), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=True),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('orders',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('platform', sa.String(), nullable=False),
+    sa.Column('customer_id', sa.String(), nullable=True),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('financial_status', sa.String(), nullable=True),
+    sa.Column('fulfillment_status', sa.String(), nullable=True),
+    sa.Column('total_price', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('currency', sa.String(), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=True),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=True),
+    sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_orders_user_id_created_at', 'orders', ['user_id', 'created_at'], unique=False)
+    op.create_table('variants',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('product_id', sa.String(), nullable=True),
+    sa.Column('platform', sa.String(), nullable=False),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('sku', sa.String(), nullable=True),
+    sa.Column('price', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('inventory_quantity', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('order_items',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('order_id', sa.String(), nullable=True),
+    sa.Column('product_id', sa.String(), nullable=True),
+    sa.Column('variant_id', sa.String(), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=True),
+    sa.Column('price', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('sku', sa.String(), nullable=True),
+    sa.Column('platform', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['variant_id'], ['variants.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_order_items_user_id_order_id', 'order_items', ['user_id', 'order_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_order_items_user_id_order_id', table_name='order_items')
+    op.drop_table('order_items')
+    op.drop_table('variants')
+    op.drop_index('ix_orders_user_id_created_at', table_name='orders')
+    op.drop_table('orders')
+    op.drop_table('products')
+    op.drop_table('customers')
@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import delete
+from src.db.bulk import BULK_BATCH_SIZE, bulk_upsert
+from src.db.db_schema import Order, OrderItem, User
+from src.db.utils import writable_session
+from src.integrations.shopify_sync import upsert_statement
+
+def synthetic_rows(user_id, prefix: str, lines: int, lines_per_order: int = 4) -> tuple[list[dict], list[dict]]:
+    created = datetime(2024, 1, 1)
+    orders = [{'id': f'{prefix}-o{i}', 'user_id': user_id, 'platform': 'shopify', 'customer_id': None,
+               'email': None, 'financial_status': 'PAID', 'fulfillment_status': 'FULFILLED',
+               'total_price': Decimal('40.00'), 'currency': 'EUR',
+               'created_at': created + timedelta(minutes=i), 'updated_at': created + timedelta(minutes=i)}
+              for i in range(max(lines // lines_per_order, 1))]
+    items = [{'id': f'{prefix}-l{i}', 'user_id': user_id, 'platform': 'shopify',
+              'order_id': orders[i % len(orders)]['id'], 'product_id': None, 'variant_id': None,
+              'quantity': 1, 'price': Decimal('10.00'), 'title': 'Mug', 'sku': 'MUG'}
+             for i in range(lines)]
+    return orders, items
+
+async def orm_add(session, model, rows: list[dict]):
+    # One ORM object per row, the way shopify_callback stores its integration.
+    session.add_all(model(**row) for row in rows)
+    await session.flush()
+
+async def executemany_upsert(session, model, rows: list[dict]):
+    await session.execute(upsert_statement(model), rows)
+
+async def copy_upsert(session, model, rows: list[dict]):
+    await bulk_upsert(session, model, rows)
+
+async def timed(write, user_id, prefix: str, lines: int) -> float:
+    orders, items = synthetic_rows(user_id, prefix, lines)
+    started = time.perf_counter()
+    async with writable_session() as session:
+        await write(session, Order, orders)
+        await write(session, OrderItem, items)
+    return time.perf_counter() - started
+
+async def compare(lines: int):
+    user_id = uuid.uuid4()
+    async with writable_session() as session:
+        session.add(User(id=user_id, email=f'bench-{user_id}@example.com'))
+    try:
+        rows = lines + max(lines // 4, 1)
+        for name, write in [('orm add_all', orm_add), ('insert on conflict', executemany_upsert),
+                            ('copy + merge', copy_upsert)]:
+            seconds = await timed(write, user_id, f'{name[:4]}-{uuid.uuid4().hex[:6]}', lines)
+            print(f"{name:<20} {rows} rows {seconds:8.2f}s  {rows / seconds:10.0f} rows/s", flush=True)
+    finally:
+        async with writable_session() as session:
+            await session.execute(delete(OrderItem).where(OrderItem.user_id == user_id))
+            await session.execute(delete(Order).where(Order.user_id == user_id))
+            await session.execute(delete(User).where(User.id == user_id))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ORM inserts with the COPY-based bulk upsert")
+    parser.add_argument("--lines", type=int, default=200_000)
+    args = parser.parse_args()
+    print(f"order lines={args.lines} merge batch={BULK_BATCH_SIZE}")
+    asyncio.run(compare(args.lines))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import os
+import shutil
+import tempfile
+import warnings
+from src.analysis import duckdb_backend
+from src.analysis.pipeline import (load_data, prepare_data, compute_kpis, compute_weekly_monthly_revenue,
+                                   convert_to_snapshots, csv_files, date_bounds, revenue_batch_table)
+from benchmarks.harness import best_of
+from benchmarks.run import DATA_ROOT
+from benchmarks.synthetic import SIZES, ensure_dataset
+
+RANGE = ('2023-03-01', '2023-03-31')
+
+def prepared(data_path: str):
+    # The frame the pandas backend keeps cached: merged and sorted by purchase time.
+    df_full = prepare_data(*load_data(data_path))
+    return df_full.sort_values('order_purchase_timestamp', kind='stable', na_position='last', ignore_index=True)
+
+def daily_range(df_full) -> dict:
+    timestamps = df_full['order_purchase_timestamp'].to_numpy()
+    return revenue_batch_table(timestamps, df_full['revenue'].to_numpy(), 'D', 0, 31, date_bounds(*RANGE))
+
+def compare(label: str, data_path: str, repeat: int):
+    df_full = prepared(data_path)
+    cases = [
+        ('kpis',
+         lambda: compute_kpis(prepare_data(*load_data(data_path))),
+         lambda: compute_kpis(df_full),
+         lambda: duckdb_backend.compute_kpis(data_path)),
+        ('weekly/monthly revenue',
+         lambda: compute_weekly_monthly_revenue(prepare_data(*load_data(data_path))),
+         lambda: compute_weekly_monthly_revenue(df_full),
+         lambda: duckdb_backend.revenue_all(data_path)),
+        (f'daily revenue {RANGE[0]}..{RANGE[1]}',
+         lambda: daily_range(prepared(data_path)),
+         lambda: daily_range(df_full),
+         lambda: duckdb_backend.revenue_chart_data_batch('D', 0, 31, *RANGE, data_path=data_path))
+    ]
+    for name, pandas_cold, pandas_warm, duckdb_query in cases:
+        cold = best_of(pandas_cold, repeat)
+        warm = best_of(pandas_warm, repeat)
+        duckdb_seconds = best_of(duckdb_query, repeat)
+        print(f"{label:<9} {name:<34} pandas load+query {cold:7.3f}s  pandas cached frame {warm:7.3f}s  "
+              f"duckdb {duckdb_seconds:7.3f}s  ({cold / duckdb_seconds:.1f}x vs load+query)", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the DuckDB engine with the pandas pipeline")
+    parser.add_argument("--size", choices=list(SIZES), default='1m')
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--data-root", default=DATA_ROOT)
+    # In the API the cores are shared between analytics workers; here one process has them all.
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    warnings.simplefilter('ignore', FutureWarning)
+    duckdb_backend.DUCKDB_THREADS = args.threads
+
+    data_path = ensure_dataset(args.data_root, args.size, args.seed)
+    print(f"size={args.size} duckdb threads={duckdb_backend.DUCKDB_THREADS}")
+    compare('csv', data_path, args.repeat)
+    # Snapshots go in a scratch copy so the shared dataset keeps being read as CSV.
+    with tempfile.TemporaryDirectory() as snapshot_path:
+        for path in csv_files(data_path):
+            shutil.copy(path, os.path.join(snapshot_path, os.path.basename(path)))
+        convert_to_snapshots(snapshot_path)
+        compare('parquet', snapshot_path, args.repeat)
+
+if __name__ == "__main__":
+    main()
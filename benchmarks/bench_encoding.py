@@ -0,0 +1,34 @@
+import argparse
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from src.analysis.encoding import JSON_MEDIA_TYPE, COLUMNAR_MEDIA_TYPE, ARROW_MEDIA_TYPE, frame_columns, encode_result
+from benchmarks.harness import best_of
+
+def daily_series(days, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'date': pd.date_range('2015-01-01', periods=days, freq='D'),
+        'revenue': rng.gamma(2.0, 500.0, days)
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare response encodings for a daily revenue series")
+    parser.add_argument("--days", type=int, nargs="+", default=[3650, 36500])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for days in args.days:
+        df = daily_series(days)
+        # What the endpoints did before: records through FastAPI's default encoder.
+        legacy_body = lambda: JSONResponse(jsonable_encoder({"data": df.to_dict(orient='records')})).body
+        legacy, body = best_of(legacy_body, args.repeat), legacy_body()
+        print(f"days={days:>6}  legacy records  {legacy * 1000:8.1f}ms  {len(body):>10} bytes")
+        for media_type in [JSON_MEDIA_TYPE, COLUMNAR_MEDIA_TYPE, ARROW_MEDIA_TYPE]:
+            encoded_body = lambda: encode_result({"data": frame_columns(df)}, media_type).body
+            seconds, body = best_of(encoded_body, args.repeat), encoded_body()
+            print(f"days={days:>6}  {media_type:<42}  {seconds * 1000:8.1f}ms  {len(body):>10} bytes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import os
+import shutil
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+from src.http_client import build_client
+
+BODY = b'{"access_token": "token", "scope": "read_orders"}'
+
+
+class TokenHandler(BaseHTTPRequestHandler):
+    # Stands in for the OAuth token endpoint; HTTP/1.1 so connections can be kept alive.
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; with Nagle on, delayed ACKs dominate every timing.
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+def self_signed_certificate(directory: str) -> tuple[str, str]:
+    cert, key = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+                    '-addext', 'subjectAltName=IP:127.0.0.1', '-keyout', key, '-out', cert],
+                   check=True, capture_output=True)
+    return cert, key
+
+def start_server(cert: str = None, key: str = None) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), TokenHandler)
+    if cert:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def fresh_client_call(url: str, verify):
+    # What shopify_callback used to do: a client, and so a handshake, per request.
+    async with httpx.AsyncClient(verify=verify) as client:
+        (await client.post(url, json={'code': 'abc'})).raise_for_status()
+
+async def shared_client_call(client: httpx.AsyncClient, url: str):
+    (await client.post(url, json={'code': 'abc'})).raise_for_status()
+
+async def latencies(call, requests: int) -> list[float]:
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        await call()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+async def concurrent_seconds(call, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with semaphore:
+            await call()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited() for _ in range(requests)))
+    return time.perf_counter() - started
+
+def summary(timings: list[float]) -> str:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    return f"median {statistics.median(timings) * 1000:7.2f}ms  p95 {p95 * 1000:7.2f}ms"
+
+async def compare(url: str, verify, requests: int, concurrency: int):
+    async with build_client(verify=verify) as shared:
+        cases = [('client per request', lambda: fresh_client_call(url, verify)),
+                 ('shared client', lambda: shared_client_call(shared, url))]
+        for name, call in cases:
+            await call()
+            print(f"{name:<20} sequential {summary(await latencies(call, requests))}  "
+                  f"{requests} requests x{concurrency} concurrent "
+                  f"{await concurrent_seconds(call, requests, concurrency):6.2f}s", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a client per request with the shared pooled client")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--plain", action="store_true", help="plain HTTP, without TLS handshakes")
+    args = parser.parse_args()
+
+    tls = not args.plain and shutil.which('openssl') is not None
+    with tempfile.TemporaryDirectory() as directory:
+        cert, key = self_signed_certificate(directory) if tls else (None, None)
+        server = start_server(cert, key)
+        try:
+            verify = ssl.create_default_context(cafile=cert) if tls else True
+            url = f"{'https' if tls else 'http'}://127.0.0.1:{server.server_port}/admin/oauth/access_token"
+            print(f"{'https' if tls else 'http'} stand-in on 127.0.0.1, {args.requests} requests")
+            asyncio.run(compare(url, verify, args.requests, args.concurrency))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == "__main__":
+    main()
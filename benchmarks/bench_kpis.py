@@ -0,0 +1,40 @@
+import argparse
+import numpy as np
+import pandas as pd
+from src.analysis.dtypes import downcast_frame
+from src.analysis.kpis import compute_kpi_frames
+from benchmarks.harness import best_of
+
+def legacy_compute_kpis(df_full):
+    order_volume = df_full['order_id'].nunique()
+    total_revenue = df_full['revenue'].sum()
+    customer_spending = df_full.groupby('customer_id', observed=True)['revenue'].sum().reset_index(name='total_spent')
+    orders_per_customer = df_full.groupby('customer_id', observed=True)['order_id'].nunique().reset_index(name='order_count')
+    avg_customer_order = total_revenue / order_volume if order_volume else 0
+    return order_volume, total_revenue, customer_spending, orders_per_customer, avg_customer_order
+
+def full_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    n_orders = max(rows // 2, 1)
+    order_codes = rng.integers(0, n_orders, rows)
+    return downcast_frame(pd.DataFrame({
+        'order_id': pd.Categorical.from_codes(order_codes, [f'order{i:09d}' for i in range(n_orders)]),
+        'customer_id': pd.Categorical.from_codes(order_codes % max(n_orders // 3, 1),
+                                                 [f'cust{i:08d}' for i in range(max(n_orders // 3, 1))]),
+        'revenue': rng.gamma(2.0, 60.0, rows)
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the legacy KPI passes with the single-pass engine")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        df_full = full_frame(rows)
+        legacy = best_of(lambda: legacy_compute_kpis(df_full), args.repeat)
+        engine = best_of(lambda: compute_kpi_frames(df_full), args.repeat)
+        print(f"rows={rows:>10}  legacy {legacy:.3f}s  engine {engine:.3f}s  speedup {legacy / engine:.1f}x")
+
+if __name__ == "__main__":
+    main()
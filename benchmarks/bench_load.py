@@ -0,0 +1,25 @@
+import argparse
+import tempfile
+from src.analysis.pipeline import load_csv_data, load_data, prepare_data, convert_to_snapshots
+from benchmarks.harness import best_of
+from benchmarks.synthetic import write_csv_dataset
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CSV and Parquet snapshot load paths")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_path:
+        write_csv_dataset(data_path, args.rows)
+        csv_seconds = best_of(lambda: prepare_data(*load_csv_data(data_path)), args.repeat)
+        convert_to_snapshots(data_path)
+        snapshot_seconds = best_of(lambda: prepare_data(*load_data(data_path)), args.repeat)
+
+    print(f"rows={args.rows}")
+    print(f"csv load+prepare:      {csv_seconds:.3f}s")
+    print(f"snapshot load+prepare: {snapshot_seconds:.3f}s")
+    print(f"speedup:               {csv_seconds / snapshot_seconds:.1f}x")
+
+if __name__ == "__main__":
+    main()
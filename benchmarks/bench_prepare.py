@@ -0,0 +1,40 @@
+import argparse
+import warnings
+import pandas as pd
+from src.analysis.dtypes import downcast_frame
+from src.analysis.pipeline import load_data, prepare_data
+from benchmarks.harness import median_of, measure
+from benchmarks.run import DATA_ROOT
+from benchmarks.synthetic import SIZES, ensure_dataset
+
+def legacy_prepare_data(df_order_items, df_orders, df_customers):
+    # The merge-based prepare stage: mutates its inputs and carries every column through.
+    df_orders['order_purchase_timestamp'] = pd.to_datetime(df_orders['order_purchase_timestamp'])
+    df_orders['order_approved_at'] = pd.to_datetime(df_orders['order_approved_at'])
+    df_order_items['revenue'] = df_order_items['price'] + df_order_items['shipping_charges']
+    df_order_items.drop(['price', 'shipping_charges'], axis=1, inplace=True)
+    df_orders_customers = pd.merge(df_orders, df_customers, on='customer_id')
+    df_full = pd.merge(df_order_items, df_orders_customers, on='order_id', how='left')
+    return downcast_frame(df_full)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the merge-based prepare stage with the integer-key join")
+    parser.add_argument("--size", choices=list(SIZES), default='1m')
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--data-root", default=DATA_ROOT)
+    args = parser.parse_args()
+    warnings.simplefilter('ignore', FutureWarning)
+
+    frames = load_data(ensure_dataset(args.data_root, args.size, args.seed))
+    # The legacy stage mutates its inputs, so both get fresh copies outside the timed region.
+    copies = lambda: tuple(frame.copy() for frame in frames)
+    print(f"size={args.size}")
+    for name, fn in [('legacy merge', legacy_prepare_data), ('integer-key join', prepare_data)]:
+        seconds = median_of(fn, args.repeat, copies)
+        _, peak = measure(fn, copies)
+        result = fn(*copies()).memory_usage(deep=True).sum()
+        print(f"{name:<18} {seconds:7.3f}s  peak {peak / 2**20:8.1f} MiB  result {result / 2**20:7.1f} MiB", flush=True)
+
+if __name__ == "__main__":
+    main()
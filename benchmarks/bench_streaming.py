@@ -0,0 +1,28 @@
+import argparse
+import tempfile
+from src.analysis.pipeline import load_data, prepare_data, compute_kpis, stream_data
+from src.analysis.rollup import build_daily_rollup
+from benchmarks.harness import measure
+from benchmarks.synthetic import write_csv_dataset
+
+def in_memory(data_path):
+    df_full = prepare_data(*load_data(data_path))
+    return compute_kpis(df_full), build_daily_rollup(df_full)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare in-memory and chunked ingestion")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=250_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_path:
+        write_csv_dataset(data_path, args.rows)
+        memory_seconds, memory_peak = measure(lambda: in_memory(data_path))
+        streaming_seconds, streaming_peak = measure(lambda: stream_data(data_path, args.chunk_size))
+
+    print(f"rows={args.rows} chunk_size={args.chunk_size}")
+    print(f"in-memory: {memory_seconds:.3f}s peak {memory_peak / 2**20:.1f} MiB")
+    print(f"streaming: {streaming_seconds:.3f}s peak {streaming_peak / 2**20:.1f} MiB")
+
+if __name__ == "__main__":
+    main()
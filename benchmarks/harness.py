@@ -0,0 +1,39 @@
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable
+
+def best_of(fn: Callable[[], Any], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def median_of(fn: Callable[..., Any], repeat: int, setup: Callable[[], tuple] = tuple) -> float:
+    # setup runs outside the timed region, e.g. to hand fn fresh copies of inputs it mutates.
+    timings = []
+    for _ in range(repeat):
+        args = setup()
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+def measure(fn: Callable[..., Any], setup: Callable[[], tuple] = tuple) -> tuple[float, int]:
+    """Wall time and peak traced allocation of one call.
+
+    tracemalloc slows allocation-heavy code, so use the time for comparisons
+    against other traced runs only.
+    """
+    args = setup()
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        fn(*args)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak
@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import pandas as pd
+from src.analysis import pipeline
+from src.analysis.pipeline import load_data, prepare_data, compute_kpis, compute_weekly_monthly_revenue
+from benchmarks.harness import median_of, measure
+from benchmarks.synthetic import SIZES, ensure_dataset
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+DATA_ROOT = os.path.join(tempfile.gettempdir(), 'storesight-bench')
+# A stage regresses only when it is past --threshold and also slower by more than
+# MIN_SECONDS or larger by more than MIN_PEAK_MIB. Medians of the same code move
+# by up to ~0.16s between runs on one machine (100k load_data: 0.33s to 0.49s),
+# so the time floor sits above that; peak allocation is deterministic.
+MIN_SECONDS = 0.25
+MIN_PEAK_MIB = 2.0
+
+def run_suite(data_path: str, repeat: int) -> dict:
+    stages = {}
+
+    def record(name, fn, setup=tuple):
+        seconds = median_of(fn, repeat, setup)
+        _, peak = measure(fn, setup)
+        stages[name] = {"seconds": round(seconds, 4), "peak_mib": round(peak / 2**20, 2)}
+        print(f"{name:<32} {seconds:8.3f}s  peak {peak / 2**20:9.1f} MiB", flush=True)
+
+    frames = load_data(data_path)
+    record('load_data', lambda: load_data(data_path))
+    record('prepare_data', lambda: prepare_data(*frames))
+    df_full = prepare_data(*frames)
+    record('compute_kpis', lambda: compute_kpis(df_full))
+    record('compute_weekly_monthly_revenue', lambda: compute_weekly_monthly_revenue(df_full))
+
+    # Hourly buckets over a quarter take the prepared-frame path, not the daily rollup.
+    previous = pipeline.base_path, pipeline.ANALYSIS_MODE
+    pipeline.base_path, pipeline.ANALYSIS_MODE = data_path, 'memory'
+    pipeline.clear_caches()
+    try:
+        pipeline.get_prepared_data()
+        record('revenue_chart_data_batch',
+               lambda: pipeline.revenue_chart_data_batch(freq='h', offset=0, limit=24 * 90))
+    finally:
+        pipeline.base_path, pipeline.ANALYSIS_MODE = previous
+        pipeline.clear_caches()
+    return stages
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for name, stage in current["stages"].items():
+        before = baseline["stages"].get(name)
+        if before is None:
+            continue
+        for metric, floor in [("seconds", MIN_SECONDS), ("peak_mib", MIN_PEAK_MIB)]:
+            limit = before[metric] * (1 + threshold)
+            if stage[metric] > limit and stage[metric] - before[metric] > floor:
+                regressions.append(f"{name} {metric}: {stage[metric]} vs baseline {before[metric]} "
+                                   f"(+{stage[metric] / before[metric] - 1:.0%})")
+    return regressions
+
+def baseline_path(baseline_dir: str, size: str) -> str:
+    return os.path.join(baseline_dir, f'{size}.json')
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and memory benchmarks for the analysis pipeline stages")
+    parser.add_argument("--size", choices=list(SIZES), default='100k')
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="timings compared are the median of this many runs")
+    parser.add_argument("--data-root", default=DATA_ROOT)
+    parser.add_argument("--baseline-dir", default=BASELINE_DIR)
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit non-zero if a stage regressed past --threshold")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    data_path = ensure_dataset(args.data_root, args.size, args.seed)
+    results = {
+        "size": args.size,
+        "n_items": SIZES[args.size],
+        "seed": args.seed,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "stages": run_suite(data_path, args.repeat)
+    }
+
+    path = baseline_path(args.baseline_dir, args.size)
+    if args.check:
+        if not os.path.isfile(path):
+            sys.exit(f"No baseline at {path}; run with --save first")
+        with open(path) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No stage regressed more than {args.threshold:.0%} against {path}")
+    if args.save:
+        os.makedirs(args.baseline_dir, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"Baseline written: {path}")
+
+if __name__ == "__main__":
+    main()
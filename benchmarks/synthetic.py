@@ -0,0 +1,106 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from pandas.core.frame import DataFrame
+
+# Dataset sizes the benchmark suite knows about, in order items.
+SIZES = {
+    '100k': 100_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000
+}
+
+START = np.datetime64('2022-01-01T00:00:00')
+DAYS = 2 * 365
+MEAN_ITEMS_PER_ORDER = 1 / 0.65
+N_PRODUCTS = 5000
+
+def _zipf_choice(rng: np.random.Generator, n: int, size: int, exponent: float) -> np.ndarray:
+    # Popularity falls off as 1/rank**exponent; ranks are shuffled so the
+    # heaviest customers/products are not simply the lowest ids.
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    ranks = rng.choice(n, size=size, p=weights / weights.sum())
+    return rng.permutation(n)[ranks]
+
+def _purchase_times(rng: np.random.Generator, size: int) -> np.ndarray:
+    day = np.arange(DAYS)
+    day_of_week = (day + 5) % 7  # 2022-01-01 was a Saturday
+    day_of_year = day % 365
+    weights = (
+        (1 + 0.6 * day / DAYS)  # growth
+        * np.where(day_of_week >= 5, 1.25, 1.0)  # weekends
+        * (1 + 1.5 * np.exp(-0.5 * ((day_of_year - 328) / 6.0) ** 2))  # late-November peak
+        * (1 + 0.4 * ((day_of_year >= 335) & (day_of_year < 358)))  # December run-up
+    )
+    hour_weights = np.array([2, 1, 1, 1, 1, 2, 3, 5, 7, 8, 9, 9, 10, 9, 8, 8, 9, 10, 12, 14, 13, 10, 6, 4], dtype=float)
+    days = rng.choice(DAYS, size=size, p=weights / weights.sum())
+    hours = rng.choice(24, size=size, p=hour_weights / hour_weights.sum())
+    seconds = days * 86400 + hours * 3600 + rng.integers(0, 3600, size)
+    return START + seconds.astype('timedelta64[s]')
+
+def generate_frames(n_items: int, seed: int = 0) -> tuple[DataFrame, DataFrame, DataFrame]:
+    """Orders, order items and customers with a realistic shape.
+
+    Deterministic for a given (n_items, seed). Customers order with Zipf-like
+    frequency, products sell the same way, most orders hold one or two items,
+    and volume follows a growth trend with weekly and year-end seasonality.
+    A small share of customers is missing from the customer export, as in
+    the real data, so their orders drop out of the join.
+    """
+    rng = np.random.default_rng(seed)
+
+    items_per_order = rng.geometric(0.65, int(n_items / MEAN_ITEMS_PER_ORDER * 1.1) + 16)
+    ends = np.cumsum(items_per_order)
+    n_orders = int(np.searchsorted(ends, n_items)) + 1
+    items_per_order = items_per_order[:n_orders]
+    items_per_order[-1] -= int(ends[n_orders - 1]) - n_items
+    n_customers = max(n_orders // 3, 1)
+
+    customer_ids = np.array([f'cust{i:08d}' for i in range(n_customers)], dtype=object)
+    order_ids = np.array([f'order{i:09d}' for i in range(n_orders)], dtype=object)
+
+    purchase = np.sort(_purchase_times(rng, n_orders))
+    approved = purchase + rng.integers(60, 48 * 3600, n_orders).astype('timedelta64[s]')
+
+    df_orders = pd.DataFrame({
+        'order_id': order_ids,
+        'customer_id': customer_ids[_zipf_choice(rng, n_customers, n_orders, 0.6)],
+        'order_status': 'delivered',
+        'order_purchase_timestamp': pd.Series(purchase).dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'order_approved_at': pd.Series(approved).dt.strftime('%Y-%m-%d %H:%M:%S')
+    })
+    df_order_items = pd.DataFrame({
+        'order_id': np.repeat(order_ids, items_per_order),
+        'product_id': _zipf_choice(rng, N_PRODUCTS, n_items, 0.9),
+        'price': rng.lognormal(4.0, 0.8, n_items).round(2),
+        'shipping_charges': rng.gamma(2.0, 8.0, n_items).round(2)
+    })
+    known_customers = np.sort(rng.choice(n_customers, size=n_customers - n_customers // 1000, replace=False))
+    df_customers = pd.DataFrame({
+        'customer_id': customer_ids[known_customers],
+        'customer_city': 'city',
+        'customer_state': 'SP'
+    })
+    return df_order_items, df_orders, df_customers
+
+def write_csv_dataset(data_path: str, n_items: int, seed: int = 0):
+    os.makedirs(data_path, exist_ok=True)
+    df_order_items, df_orders, df_customers = generate_frames(n_items, seed)
+    df_orders.to_csv(os.path.join(data_path, 'df_Orders.csv'), index=False)
+    df_order_items.to_csv(os.path.join(data_path, 'df_OrderItems.csv'), index=False)
+    df_customers.to_csv(os.path.join(data_path, 'df_Customers.csv'), index=False)
+
+def ensure_dataset(root: str, size: str, seed: int = 0) -> str:
+    """Path of the CSV dataset for a named size, generating it on first use."""
+    data_path = os.path.join(root, f'{size}-seed{seed}')
+    marker = os.path.join(data_path, 'dataset.json')
+    params = {"n_items": SIZES[size], "seed": seed}
+    if os.path.isfile(marker):
+        with open(marker) as f:
+            if json.load(f) == params:
+                return data_path
+    write_csv_dataset(data_path, SIZES[size], seed)
+    with open(marker, 'w') as f:
+        json.dump(params, f)
+    return data_path
@@ -0,0 +1,62 @@
+import os
+from starlette.concurrency import run_in_threadpool
+from .executor import AnalyticsExecutor, analytics_executor
+from .pipeline import (current_kpis, approximate_kpis, revenue_chart_data_batch, revenue_all, revenue_series, top_customers,
+                       data_version)
+
+# 'pandas' runs the in-process pipeline over the exported files; 'sql' pushes the
+# aggregation down to Postgres and only fetches per-bucket/per-customer totals;
+# 'duckdb' runs the same queries as SQL over the exported files with DuckDB.
+ANALYTICS_BACKEND = os.getenv('ANALYTICS_BACKEND', 'pandas')
+
+
+class PandasBackend:
+    name = 'pandas'
+
+    def __init__(self, executor: AnalyticsExecutor = analytics_executor):
+        self.executor = executor
+
+    # The exported files hold a single tenant, so user_id does not filter here.
+    async def data_version(self, user_id) -> str:
+        return await run_in_threadpool(data_version)
+
+    async def kpis(self, user_id) -> dict:
+        return await self.executor.run(current_kpis)
+
+    async def approximate_kpis(self, user_id, start_date: str = None, end_date: str = None,
+                               precision: int = None) -> dict:
+        return await self.executor.run(approximate_kpis, start_date, end_date, precision)
+
+    async def revenue_batch(self, user_id, freq: str = 'W', offset: int = 0, limit: int = 10,
+                            start_date: str = None, end_date: str = None) -> dict:
+        return await self.executor.run(revenue_chart_data_batch, freq, offset, limit, start_date, end_date)
+
+    async def revenue_all(self, user_id) -> dict:
+        return await self.executor.run(revenue_all)
+
+    async def revenue_series(self, user_id, freqs: list[str], start_date: str = None, end_date: str = None,
+                             cumulative: bool = False, moving_average: int = None) -> dict:
+        return await self.executor.run(revenue_series, freqs, start_date, end_date, cumulative, moving_average)
+
+    async def top_customers(self, user_id, by: str = 'spend', limit: int = 10, cursor: str = None) -> dict:
+        return await self.executor.run(top_customers, by, limit, cursor)
+
+
+_backends = {}
+
+def get_backend(name: str = None):
+    name = name or ANALYTICS_BACKEND
+    if name not in _backends:
+        if name == 'pandas':
+            _backends[name] = PandasBackend()
+        elif name == 'sql':
+            # Imported lazily: the SQL backend needs a configured database.
+            from .sql_backend import SqlBackend
+            _backends[name] = SqlBackend()
+        elif name == 'duckdb':
+            # Optional dependency, only needed when this engine is selected.
+            from .duckdb_backend import DuckDbBackend
+            _backends[name] = DuckDbBackend()
+        else:
+            raise ValueError(f"Unknown analytics backend: {name}")
+    return _backends[name]
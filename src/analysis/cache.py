@@ -0,0 +1,131 @@
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable
+
+try:
+    import fcntl
+except ImportError:
+    # Windows locks a byte range through msvcrt instead.
+    fcntl = None
+    import msvcrt
+
+
+def file_fingerprint(paths: Iterable[str]) -> tuple:
+    fingerprint = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            fingerprint.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            fingerprint.append((path, None, None))
+    return tuple(fingerprint)
+
+
+def fingerprint_version(fingerprint: tuple) -> str:
+    return hashlib.sha1(repr(fingerprint).encode('utf-8')).hexdigest()[:16]
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive lock on path across processes, blocking until it is free.
+
+    Locks belong to the open file, so two threads of one process exclude each
+    other as well; the same thread must not take the lock twice.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after about ten seconds; keep waiting.
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FrameCache:
+    """Process-wide cache of a value built from a set of files.
+
+    The value is rebuilt only when the mtime/size fingerprint of the files
+    changes. Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, build: Callable[[], Any], files: Callable[[], Iterable[str]]):
+        self._build = build
+        self._files = files
+        self._entry = None
+        self._build_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.last_rebuild_seconds = 0.0
+
+    def get(self) -> Any:
+        fingerprint = file_fingerprint(self._files())
+        entry = self._entry
+        if entry is not None and entry[0] == fingerprint:
+            self._count('hits')
+            return entry[1]
+
+        self._count('misses')
+        with self._build_lock:
+            # Another thread may have rebuilt while we waited for the lock.
+            entry = self._entry
+            if entry is not None and entry[0] == fingerprint:
+                return entry[1]
+            started = time.perf_counter()
+            value = self._build()
+            self._entry = (fingerprint, value)
+            with self._stats_lock:
+                self.rebuilds += 1
+                self.last_rebuild_seconds = time.perf_counter() - started
+            return value
+
+    def peek(self) -> Any:
+        # The cached value if it is current, without building it.
+        entry = self._entry
+        if entry is not None and entry[0] == file_fingerprint(self._files()):
+            return entry[1]
+        return None
+
+    def fingerprint(self) -> tuple:
+        return file_fingerprint(self._files())
+
+    def version(self) -> str:
+        return fingerprint_version(self.fingerprint())
+
+    def clear(self):
+        with self._build_lock:
+            self._entry = None
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "rebuilds": self.rebuilds,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "last_rebuild_seconds": self.last_rebuild_seconds,
+                "cached": self._entry is not None
+            }
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+from pandas.core.frame import DataFrame
+
+# Read plans for the three exports: only the columns the pipeline uses are parsed.
+# IDs are low-cardinality relative to row count, so they load as categoricals.
+# Money stays float64: float32 drifts visibly once millions of lines are summed.
+ORDERS_SCHEMA = {
+    'usecols': ['order_id', 'customer_id', 'order_purchase_timestamp', 'order_approved_at'],
+    'dtype': {'order_id': 'category', 'customer_id': 'category'}
+}
+ORDER_ITEMS_SCHEMA = {
+    'usecols': ['order_id', 'price', 'shipping_charges'],
+    'dtype': {'order_id': 'category', 'price': 'float64', 'shipping_charges': 'float64'}
+}
+CUSTOMERS_SCHEMA = {
+    'usecols': ['customer_id'],
+    'dtype': {'customer_id': 'category'}
+}
+
+ID_COLUMNS = ['order_id', 'customer_id']
+
+def key_codes(series: pd.Series) -> tuple[np.ndarray, pd.Index]:
+    # Categoricals already carry sorted integer codes; everything else is factorized once.
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    codes, uniques = pd.factorize(series, sort=True)
+    return codes, pd.Index(uniques)
+
+def downcast_frame(df: DataFrame) -> DataFrame:
+    for column in df.columns:
+        series = df[column]
+        if column in ID_COLUMNS and not isinstance(series.dtype, pd.CategoricalDtype):
+            df[column] = series.astype('category')
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            df[column] = pd.to_numeric(series, downcast='integer')
+    return df
+
+def memory_report(before: DataFrame, after: DataFrame) -> DataFrame:
+    report = pd.DataFrame({
+        'before_bytes': before.memory_usage(index=False, deep=True),
+        'after_bytes': after.memory_usage(index=False, deep=True)
+    }).fillna(0).astype('int64')
+    report['saved_bytes'] = report['before_bytes'] - report['after_bytes']
+    report.index.name = 'column'
+    report.loc['total'] = report.sum()
+    return report.reset_index()
@@ -0,0 +1,237 @@
+import os
+import threading
+import duckdb
+import numpy as np
+import pandas as pd
+from pandas.core.frame import DataFrame
+from starlette.concurrency import run_in_threadpool
+from .cache import file_fingerprint, fingerprint_version
+from .executor import AnalyticsExecutor, analytics_executor, ANALYTICS_WORKERS
+from .kpis import kpis_to_json
+from .pipeline import (data_files, data_sources, date_bounds, revenue_batch_table,
+                       revenue_all as rebucketed_revenue, revenue_series_tables, series_freqs)
+from .rollup import trunc_unit, finest_unit
+from .snapshots import snapshot_parts
+from .ranking import RANK_METRICS, encode_cursor, decode_cursor
+from ..metrics import timed_stage
+
+# Every analytics worker gets its own DuckDB; by default they split the cores
+# between them rather than each starting a thread per core.
+DUCKDB_THREADS = int(os.getenv('ANALYTICS_DUCKDB_THREADS', str(max((os.cpu_count() or 1) // max(ANALYTICS_WORKERS, 1), 1))))
+
+_connection = None
+_connection_lock = threading.Lock()
+
+def connection() -> duckdb.DuckDBPyConnection:
+    global _connection
+    with _connection_lock:
+        if _connection is None:
+            _connection = duckdb.connect(config={'threads': DUCKDB_THREADS})
+        # A cursor per call: one DuckDB connection must not be shared between threads.
+        return _connection.cursor()
+
+def _literal(path: str) -> str:
+    return "'" + path.replace("'", "''") + "'"
+
+def _scan(path: str, id_columns: list[str], numbered: bool = False) -> str:
+    """A table function over the file; numbered adds file_index and file_row_number, in file order."""
+    if path.endswith('.parquet'):
+        # A snapshot and the batches appended to it since it was written.
+        parts = ', '.join(_literal(part) for part in snapshot_parts(path))
+        return f"read_parquet([{parts}]{', file_row_number = true' if numbered else ''})"
+    # IDs stay text even when they look numeric, so joins and ordering match pandas.
+    types = ', '.join(f"'{column}': 'VARCHAR'" for column in id_columns)
+    scan = f"read_csv({_literal(path)}, header = true, types = {{{types}}})"
+    if numbered:
+        # read_csv has no row number column; the scan keeps insertion order, so row_number() follows the file.
+        return f"(SELECT *, 0 AS file_index, row_number() OVER () AS file_row_number FROM {scan})"
+    return scan
+
+def attributed_sql(data_path: str = None) -> str:
+    """CTEs over the order files mirroring prepare_data.
+
+    items holds every order line; attributed keeps the lines whose order and
+    customer both exist, with the purchase time. Like prepare_data, the first
+    row of a repeated order wins and a repeated customer counts once. DuckDB
+    pushes projections and date filters on attributed down into the file scans.
+    """
+    orders_file, order_items_file, customers_file = data_files(data_path)
+    revenue = 'revenue' if order_items_file.endswith('.parquet') else 'price + shipping_charges'
+    return f"""
+        WITH orders AS (
+            SELECT order_id, customer_id, CAST(order_purchase_timestamp AS TIMESTAMP) AS purchased_at
+            FROM {_scan(orders_file, ['order_id', 'customer_id'], numbered=True)}
+            QUALIFY row_number() OVER (PARTITION BY order_id ORDER BY file_index, file_row_number) = 1
+        ), customers AS (
+            SELECT customer_id FROM {_scan(customers_file, ['customer_id'])}
+        ), items AS (
+            SELECT order_id, {revenue} AS revenue FROM {_scan(order_items_file, ['order_id'])}
+        ), attributed AS (
+            SELECT items.order_id, orders.customer_id, orders.purchased_at, items.revenue
+            FROM items
+            JOIN orders ON orders.order_id = items.order_id
+            WHERE orders.customer_id IN (SELECT customer_id FROM customers)
+        )
+    """
+
+def _range_filter(start: pd.Timestamp = None, end: pd.Timestamp = None) -> tuple[str, list]:
+    clauses, params = ['purchased_at IS NOT NULL'], []
+    if start is not None:
+        clauses.append('purchased_at >= ?')
+        params.append(start.to_pydatetime())
+    if end is not None:
+        clauses.append('purchased_at < ?')
+        params.append(end.to_pydatetime())
+    return ' AND '.join(clauses), params
+
+def data_version(data_path: str = None) -> str:
+    return fingerprint_version(file_fingerprint(data_sources(data_path)))
+
+@timed_stage('duckdb_kpis')
+def compute_kpis(data_path: str = None) -> dict:
+    try:
+        cursor = connection()
+        ctes = attributed_sql(data_path)
+        order_volume, total_revenue = cursor.execute(
+            f"{ctes} SELECT count(DISTINCT order_id), coalesce(sum(revenue), 0) FROM items"
+        ).fetchone()
+        per_customer = cursor.execute(f"""{ctes}
+            SELECT customer_id, coalesce(sum(revenue), 0) AS total_spent, count(DISTINCT order_id) AS order_count
+            FROM attributed
+            WHERE customer_id IS NOT NULL
+            GROUP BY customer_id
+            ORDER BY customer_id
+        """).df()
+    except duckdb.Error as e:
+        raise LookupError(f"Column not found or computation error: {e}")
+    total_revenue = float(total_revenue)
+    return {
+        "order_volume": int(order_volume),
+        "total_revenue": total_revenue,
+        "customer_spending": per_customer[['customer_id', 'total_spent']],
+        "orders_per_customer": per_customer[['customer_id', 'order_count']].astype({'order_count': np.int64}),
+        "avg_customer_order": total_revenue / order_volume if order_volume else 0
+    }
+
+def current_kpis(data_path: str = None) -> dict:
+    return kpis_to_json(compute_kpis(data_path))
+
+@timed_stage('duckdb_buckets')
+def bucket_totals(unit: str, start: pd.Timestamp = None, end: pd.Timestamp = None,
+                  data_path: str = None) -> DataFrame:
+    where, params = _range_filter(start, end)
+    # unit comes from TRUNC_UNITS, never from the request.
+    buckets = connection().execute(f"""{attributed_sql(data_path)}
+        SELECT date_trunc('{unit}', purchased_at) AS date, coalesce(sum(revenue), 0) AS revenue
+        FROM attributed
+        WHERE {where}
+        GROUP BY 1
+        ORDER BY 1
+    """, params).df()
+    return buckets.set_index(pd.DatetimeIndex(buckets['date'], name='date'))[['revenue']]
+
+def revenue_chart_data_batch(freq: str = 'W', offset: int = 0, limit: int = 10, start_date: str = None,
+                             end_date: str = None, data_path: str = None) -> dict:
+    try:
+        bounds = date_bounds(start_date, end_date) if start_date and end_date else (None, None)
+        buckets = bucket_totals(trunc_unit(freq), *bounds, data_path=data_path)
+        return revenue_batch_table(buckets.index.to_numpy(), buckets['revenue'].to_numpy(), freq, offset, limit)
+    except Exception as e:
+        raise ValueError(f"Error in revenue_chart_data_batch: {e}")
+
+def revenue_all(data_path: str = None) -> dict:
+    return rebucketed_revenue(rollup=bucket_totals('day', data_path=data_path))
+
+def revenue_series(freqs: list[str], start_date: str = None, end_date: str = None, cumulative: bool = False,
+                   moving_average: int = None, data_path: str = None) -> dict:
+    try:
+        freqs = series_freqs(freqs)
+        bounds = date_bounds(start_date, end_date) if start_date and end_date else (None, None)
+        buckets = bucket_totals(finest_unit(freqs), *bounds, data_path=data_path)
+        return revenue_series_tables(buckets, freqs, cumulative, moving_average)
+    except Exception as e:
+        raise ValueError(f"Error in revenue_series: {e}")
+
+def approximate_kpis(start_date: str = None, end_date: str = None, precision: int = None,
+                     data_path: str = None) -> dict:
+    # Distinct counts over a pushed-down date filter are cheap here, so like the
+    # SQL backend this answers exactly and reports zero error.
+    bounds = date_bounds(start_date, end_date) if start_date and end_date else (None, None)
+    where, params = _range_filter(*bounds)
+    order_volume, distinct_customers, total_revenue = connection().execute(f"""{attributed_sql(data_path)}
+        SELECT count(DISTINCT order_id), count(DISTINCT customer_id), coalesce(sum(revenue), 0)
+        FROM attributed
+        WHERE {where}
+    """, params).fetchone()
+    total_revenue = float(total_revenue)
+    return {
+        "approximate": False,
+        "precision": None,
+        "relative_error": 0.0,
+        "order_volume": int(order_volume),
+        "distinct_customers": int(distinct_customers),
+        "order_volume_interval": [int(order_volume), int(order_volume)],
+        "distinct_customers_interval": [int(distinct_customers), int(distinct_customers)],
+        "total_revenue": total_revenue,
+        "avg_customer_order": total_revenue / order_volume if order_volume else 0
+    }
+
+@timed_stage('duckdb_rank_customers')
+def top_customers(by: str = 'spend', limit: int = 10, cursor: str = None, data_path: str = None) -> dict:
+    if by not in RANK_METRICS:
+        raise ValueError(f"Cannot rank customers by {by}")
+    version = data_version(data_path)
+    offset = decode_cursor(cursor, version, by) if cursor else 0
+    rows = connection().execute(f"""{attributed_sql(data_path)}
+        SELECT customer_id, coalesce(sum(revenue), 0) AS total_spent, count(DISTINCT order_id) AS order_count,
+               count(*) OVER () AS total_customers
+        FROM attributed
+        WHERE customer_id IS NOT NULL
+        GROUP BY customer_id
+        ORDER BY {RANK_METRICS[by]} DESC, customer_id
+        LIMIT ? OFFSET ?
+    """, [limit + 1, offset]).fetchall()
+    page = rows[:limit]
+    next_offset = offset + len(page)
+    return {
+        "customers": {
+            "rank": list(range(offset + 1, next_offset + 1)),
+            "customer_id": [row[0] for row in page],
+            "total_spent": [float(row[1]) for row in page],
+            "order_count": [int(row[2]) for row in page]
+        },
+        "total_customers": int(rows[0][3]) if rows else None,
+        "next_cursor": encode_cursor(version, by, next_offset) if len(rows) > limit else None
+    }
+
+
+class DuckDbBackend:
+    name = 'duckdb'
+
+    def __init__(self, executor: AnalyticsExecutor = analytics_executor):
+        self.executor = executor
+
+    # Same single-tenant exports as the pandas backend, queried in place.
+    async def data_version(self, user_id) -> str:
+        return await run_in_threadpool(data_version)
+
+    async def kpis(self, user_id) -> dict:
+        return await self.executor.run(current_kpis)
+
+    async def approximate_kpis(self, user_id, start_date: str = None, end_date: str = None,
+                               precision: int = None) -> dict:
+        return await self.executor.run(approximate_kpis, start_date, end_date, precision)
+
+    async def revenue_batch(self, user_id, freq: str = 'W', offset: int = 0, limit: int = 10,
+                            start_date: str = None, end_date: str = None) -> dict:
+        return await self.executor.run(revenue_chart_data_batch, freq, offset, limit, start_date, end_date)
+
+    async def revenue_all(self, user_id) -> dict:
+        return await self.executor.run(revenue_all)
+
+    async def revenue_series(self, user_id, freqs: list[str], start_date: str = None, end_date: str = None,
+                             cumulative: bool = False, moving_average: int = None) -> dict:
+        return await self.executor.run(revenue_series, freqs, start_date, end_date, cumulative, moving_average)
+
+    async def top_customers(self, user_id, by: str = 'spend', limit: int = 10, cursor: str = None) -> dict:
+        return await self.executor.run(top_customers, by, limit, cursor)
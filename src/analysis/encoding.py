@@ -0,0 +1,113 @@
+import json
+import numpy as np
+import pandas as pd
+from pandas.core.frame import DataFrame
+from fastapi import HTTPException
+from fastapi.responses import Response
+from .snapshots import HAS_PYARROW
+from ..metrics import timed_stage
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+JSON_MEDIA_TYPE = 'application/json'
+COLUMNAR_MEDIA_TYPE = 'application/vnd.storesight.columnar+json'
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+MEDIA_TYPES = [JSON_MEDIA_TYPE, COLUMNAR_MEDIA_TYPE, ARROW_MEDIA_TYPE]
+
+ISO_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# Analytics results keep their tables column-oriented: {column: [values, ...]}.
+# Date columns ('date' or '*_date') travel as ISO strings so the same value can
+# be cached as JSON, and are turned back into timestamps for Arrow clients.
+
+def frame_columns(df: DataFrame) -> dict:
+    columns = {}
+    for name, series in df.items():
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            values = series.to_numpy(dtype='datetime64[s]')
+            iso = np.datetime_as_string(values, unit='s').astype(object)
+            iso[np.isnat(values)] = None
+            columns[name] = iso.tolist()
+        else:
+            columns[name] = series.tolist()
+    return columns
+
+def is_table(value) -> bool:
+    return isinstance(value, dict) and len(value) > 0 and all(isinstance(column, list) for column in value.values())
+
+def table_records(table: dict) -> list[dict]:
+    names = list(table)
+    return [dict(zip(names, row)) for row in zip(*table.values())]
+
+def is_date_column(name: str) -> bool:
+    return name == 'date' or name.endswith('_date')
+
+def dumps(payload) -> bytes:
+    if HAS_ORJSON:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+def quality(params: str) -> float:
+    # q=0, q=0.0 and q=0.000 all mark a media type as not acceptable.
+    for param in params.split(';'):
+        name, _, value = param.partition('=')
+        if name.strip().lower() == 'q':
+            try:
+                return float(value.strip())
+            except ValueError:
+                return 1.0
+    return 1.0
+
+def negotiate(accept: str | None) -> str:
+    if not accept:
+        return JSON_MEDIA_TYPE
+    for part in accept.split(','):
+        media_type, _, params = part.strip().partition(';')
+        media_type = media_type.strip().lower()
+        if quality(params) <= 0:
+            continue
+        if media_type in MEDIA_TYPES:
+            return media_type
+        if media_type in ('*/*', 'application/*'):
+            return JSON_MEDIA_TYPE
+    raise HTTPException(status_code=406, detail=f"Supported media types: {', '.join(MEDIA_TYPES)}")
+
+def arrow_stream(table: dict, metadata: dict = None) -> bytes:
+    import pyarrow as pa
+    arrays = {}
+    for name, values in table.items():
+        if is_date_column(name):
+            arrays[name] = pa.array(pd.to_datetime(pd.Series(values, dtype='object'), format=ISO_FORMAT))
+        else:
+            arrays[name] = pa.array(values)
+    batch = pa.record_batch(list(arrays.values()), names=list(arrays))
+    if metadata:
+        batch = batch.replace_schema_metadata({'storesight': json.dumps(metadata)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+@timed_stage('serialise')
+def encode_result(result: dict, media_type: str, table: str = None) -> Response:
+    if media_type == COLUMNAR_MEDIA_TYPE:
+        return Response(content=dumps(result), media_type=media_type)
+    if media_type == JSON_MEDIA_TYPE:
+        # The original row-per-dict shape, for existing clients.
+        records = {name: table_records(value) if is_table(value) else value for name, value in result.items()}
+        return Response(content=dumps(records), media_type=media_type)
+
+    if not HAS_PYARROW:
+        raise HTTPException(status_code=406, detail="Arrow responses need pyarrow installed on the server")
+    tables = [name for name, value in result.items() if is_table(value) or isinstance(value, dict) and not value]
+    if table is None and len(tables) == 1:
+        table = tables[0]
+    if table not in tables:
+        raise HTTPException(status_code=406, detail=f"Arrow responses hold one table; choose one with ?table= from: {', '.join(tables)}")
+    # Scalars (totals, averages) ride along as schema metadata.
+    metadata = {name: value for name, value in result.items() if name not in tables}
+    return Response(content=arrow_stream(result[table], metadata), media_type=media_type)
@@ -0,0 +1,108 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable
+from starlette.concurrency import run_in_threadpool
+from ..metrics import registry
+
+ANALYTICS_WORKERS = int(os.getenv('ANALYTICS_WORKERS', str(os.cpu_count() or 1)))
+ANALYTICS_MAX_QUEUE = int(os.getenv('ANALYTICS_MAX_QUEUE', '32'))
+ANALYTICS_START_METHOD = os.getenv('ANALYTICS_START_METHOD', 'spawn')
+
+
+class AnalyticsBusy(Exception):
+    pass
+
+
+def _init_worker():
+    # Pay the pandas/pipeline import cost once per worker, not on the first request.
+    from . import pipeline  # noqa: F401
+
+
+def _call_with_metrics(fn: Callable, *args: Any) -> tuple[Any, dict]:
+    # Metrics recorded in a worker are shipped back with each result for the parent to merge.
+    return fn(*args), registry.drain()
+
+
+def _warm_up(hold_seconds: float) -> int:
+    from . import pipeline
+    try:
+        pipeline.get_daily_rollup()
+    except Exception:
+        # No data yet is fine; the worker is still warm.
+        pass
+    # Keep this worker busy briefly so the pool has to start the others too.
+    time.sleep(hold_seconds)
+    return os.getpid()
+
+
+class AnalyticsExecutor:
+    """Runs CPU-bound pipeline calls in a process pool behind a bounded queue.
+
+    With workers <= 0 calls run in the threadpool instead, as they did before.
+    """
+
+    def __init__(self, workers: int = ANALYTICS_WORKERS, max_queue: int = ANALYTICS_MAX_QUEUE,
+                 start_method: str = ANALYTICS_START_METHOD):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.start_method = start_method
+        self._pool = None
+        self._in_flight = 0
+
+    @property
+    def capacity(self) -> int:
+        return max(self.workers, 1) + self.max_queue
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def start(self):
+        if self.workers <= 0 or self._pool is not None:
+            return
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(self.start_method),
+            initializer=_init_worker
+        )
+
+    async def warm_up(self, hold_seconds: float = 0.2) -> list[int]:
+        if self.workers <= 0:
+            return []
+        self.start()
+        loop = asyncio.get_running_loop()
+        futures = [loop.run_in_executor(self._pool, _warm_up, hold_seconds) for _ in range(self.workers)]
+        return await asyncio.gather(*futures)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        if self._in_flight >= self.capacity:
+            raise AnalyticsBusy("Analytics workers are busy, retry shortly")
+        self._in_flight += 1
+        try:
+            if self.workers <= 0:
+                return await run_in_threadpool(fn, *args)
+            self.start()
+            loop = asyncio.get_running_loop()
+            result, metrics = await loop.run_in_executor(self._pool, _call_with_metrics, fn, *args)
+            registry.merge(metrics)
+            return result
+        finally:
+            self._in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight
+        }
+
+
+analytics_executor = AnalyticsExecutor()
@@ -0,0 +1,266 @@
+import json
+import os
+import pickle
+import uuid
+import numpy as np
+import pandas as pd
+from pandas.core.frame import DataFrame
+
+# The state on disk is a checkpoint plus one delta per batch appended since,
+# listed in manifest.json; past ANALYSIS_KPI_STATE_MAX_DELTAS deltas they are
+# folded into a new checkpoint.
+STATE_MANIFEST = 'manifest.json'
+KPI_STATE_MAX_DELTAS = int(os.getenv('ANALYSIS_KPI_STATE_MAX_DELTAS', '32'))
+
+def line_revenue(order_items: DataFrame) -> pd.Series:
+    if 'revenue' in order_items.columns:
+        return order_items['revenue'].astype(np.float64)
+    return order_items['price'].astype(np.float64) + order_items['shipping_charges'].astype(np.float64)
+
+
+class KpiState:
+    """KPI aggregates that absorb append-only batches of exports.
+
+    Matches compute_kpis/build_daily_rollup over the concatenated batches:
+    an order item counts towards totals straight away, and towards its
+    customer and purchase day once both its order and that order's customer
+    have been seen, in whichever batch they arrive.
+    """
+
+    def __init__(self):
+        self.total_revenue = 0.0
+        self.customers = set()
+        # order_id -> (customer_id, purchase day or None)
+        self.orders = {}
+        # order_id -> [revenue, item count] over every item seen for the order
+        self.order_items = {}
+        self.attributed = set()
+        # Orders whose customer record has not arrived yet, by customer_id.
+        self.waiting_for_customer = {}
+        self.customer_spend = {}
+        self.customer_orders = {}
+        # day -> [revenue, order count, item count]
+        self.daily = {}
+        self.batches = 0
+
+    def _attribute(self, order_id):
+        customer_id, day = self.orders[order_id]
+        revenue, items = self.order_items[order_id]
+        self.customer_spend[customer_id] = self.customer_spend.get(customer_id, 0.0) + revenue
+        self.customer_orders[customer_id] = self.customer_orders.get(customer_id, 0) + 1
+        if day is not None:
+            totals = self.daily.setdefault(day, [0.0, 0, 0])
+            totals[0] += revenue
+            totals[1] += 1
+            totals[2] += items
+        self.attributed.add(order_id)
+
+    def _add_customers(self, customers: DataFrame):
+        for customer_id in customers['customer_id'].dropna().unique().tolist():
+            if customer_id in self.customers:
+                continue
+            self.customers.add(customer_id)
+            for order_id in self.waiting_for_customer.pop(customer_id, []):
+                if order_id in self.order_items:
+                    self._attribute(order_id)
+
+    def _add_orders(self, orders: DataFrame):
+        days = pd.to_datetime(orders['order_purchase_timestamp']).dt.floor('D')
+        for order_id, customer_id, day in zip(orders['order_id'].tolist(), orders['customer_id'].tolist(), days.tolist()):
+            if order_id in self.orders or pd.isna(order_id) or pd.isna(customer_id):
+                continue
+            self.orders[order_id] = (customer_id, None if pd.isna(day) else day)
+            if customer_id not in self.customers:
+                self.waiting_for_customer.setdefault(customer_id, []).append(order_id)
+            elif order_id in self.order_items:
+                self._attribute(order_id)
+
+    def _add_order_items(self, order_items: DataFrame):
+        revenue = line_revenue(order_items)
+        self.total_revenue += float(revenue.sum())
+        grouped = revenue.groupby(order_items['order_id'].to_numpy(), sort=False).agg(['sum', 'size'])
+        for order_id, batch_revenue, batch_items in zip(grouped.index.tolist(), grouped['sum'].tolist(),
+                                                        grouped['size'].tolist()):
+            totals = self.order_items.get(order_id)
+            if totals is None:
+                self.order_items[order_id] = [batch_revenue, batch_items]
+                order = self.orders.get(order_id)
+                if order is not None and order[0] in self.customers:
+                    self._attribute(order_id)
+                continue
+            totals[0] += batch_revenue
+            totals[1] += batch_items
+            if order_id in self.attributed:
+                customer_id, day = self.orders[order_id]
+                self.customer_spend[customer_id] += batch_revenue
+                if day is not None:
+                    self.daily[day][0] += batch_revenue
+                    self.daily[day][2] += batch_items
+
+    def append(self, order_items: DataFrame = None, orders: DataFrame = None, customers: DataFrame = None):
+        try:
+            if customers is not None:
+                self._add_customers(customers)
+            if orders is not None:
+                self._add_orders(orders)
+            if order_items is not None:
+                self._add_order_items(order_items)
+            self.batches += 1
+            return self
+        except Exception as e:
+            raise ValueError(f"Error applying batch to KPI state: {e}")
+
+    @classmethod
+    def from_frames(cls, order_items: DataFrame, orders: DataFrame, customers: DataFrame) -> 'KpiState':
+        return cls().append(order_items, orders, customers)
+
+    def kpi_frames(self) -> dict:
+        customer_ids = sorted(self.customer_spend)
+        order_volume = len(self.order_items)
+        return {
+            "order_volume": order_volume,
+            "total_revenue": self.total_revenue,
+            "customer_spending": pd.DataFrame({
+                'customer_id': customer_ids,
+                'total_spent': np.array([self.customer_spend[c] for c in customer_ids], dtype=np.float64)
+            }),
+            "orders_per_customer": pd.DataFrame({
+                'customer_id': customer_ids,
+                'order_count': np.array([self.customer_orders[c] for c in customer_ids], dtype=np.int64)
+            }),
+            "avg_customer_order": self.total_revenue / order_volume if order_volume else 0
+        }
+
+    def rollup(self) -> DataFrame:
+        days = sorted(self.daily)
+        return pd.DataFrame({
+            'revenue': np.array([self.daily[day][0] for day in days], dtype=np.float64),
+            'order_count': np.array([self.daily[day][1] for day in days], dtype=np.int64),
+            'item_count': np.array([self.daily[day][2] for day in days], dtype=np.int64)
+        }, index=pd.DatetimeIndex(days, name='date'))
+
+    def attributed_orders(self) -> DataFrame:
+        order_ids = list(self.attributed)
+        return pd.DataFrame({
+            'order_id': order_ids,
+            'customer_id': [self.orders[order_id][0] for order_id in order_ids],
+            'order_purchase_timestamp': pd.DatetimeIndex([self.orders[order_id][1] for order_id in order_ids])
+        })
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        _dump(self, path)
+
+    @staticmethod
+    def load(path: str) -> 'KpiState':
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            raise FileNotFoundError(f"Error loading KPI state from {path}: {e}")
+
+
+def batch_delta(order_items: DataFrame = None, orders: DataFrame = None, customers: DataFrame = None) -> dict:
+    # Only the columns KpiState reads, so a delta stays the size of the batch.
+    return {
+        "order_items": None if order_items is None else pd.DataFrame({'order_id': order_items['order_id'].to_numpy(),
+                                                                      'revenue': line_revenue(order_items).to_numpy()}),
+        "orders": None if orders is None else orders[['order_id', 'customer_id', 'order_purchase_timestamp']],
+        "customers": None if customers is None else customers[['customer_id']]
+    }
+
+def state_manifest_path(root: str) -> str:
+    return os.path.join(root, STATE_MANIFEST)
+
+def read_state_manifest(root: str) -> dict | None:
+    try:
+        with open(state_manifest_path(root)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_state_manifest(root: str, manifest: dict):
+    path = state_manifest_path(root)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+def _dump(value, path: str):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def write_state(state: KpiState, root: str) -> dict:
+    """Checkpoint state under root, replacing the previous checkpoint and its deltas."""
+    os.makedirs(root, exist_ok=True)
+    checkpoint = f'checkpoint-{uuid.uuid4().hex[:12]}.pkl'
+    state.save(os.path.join(root, checkpoint))
+    manifest = {"checkpoint": checkpoint, "batches": state.batches, "deltas": []}
+    # The manifest is swapped in last; files it no longer lists are then unused.
+    _write_state_manifest(root, manifest)
+    for name in os.listdir(root):
+        if name.endswith('.pkl') and name != checkpoint:
+            os.remove(os.path.join(root, name))
+    return manifest
+
+def read_state(root: str) -> KpiState:
+    """The checkpoint with every delta appended since replayed on top."""
+    manifest = read_state_manifest(root)
+    if manifest is None:
+        raise FileNotFoundError(f"No KPI state manifest in {root}")
+    state = KpiState.load(os.path.join(root, manifest["checkpoint"]))
+    for delta in manifest["deltas"]:
+        try:
+            with open(os.path.join(root, delta), 'rb') as f:
+                frames = pickle.load(f)
+        except Exception as e:
+            raise FileNotFoundError(f"Error loading KPI state delta {delta}: {e}")
+        state.append(**frames)
+    return state
+
+def append_state(root: str, order_items: DataFrame = None, orders: DataFrame = None,
+                 customers: DataFrame = None) -> dict:
+    """Record a batch as a delta; costs the size of the batch, not of the state.
+
+    Callers serialise appends to root.
+    """
+    manifest = read_state_manifest(root)
+    if manifest is None:
+        raise FileNotFoundError(f"No KPI state manifest in {root}")
+    delta = f'batch-{uuid.uuid4().hex[:12]}.pkl'
+    try:
+        _dump(batch_delta(order_items, orders, customers), os.path.join(root, delta))
+    except Exception as e:
+        raise ValueError(f"Error recording batch in KPI state: {e}")
+    manifest["deltas"].append(delta)
+    manifest["batches"] += 1
+    _write_state_manifest(root, manifest)
+    if len(manifest["deltas"]) >= KPI_STATE_MAX_DELTAS:
+        manifest = write_state(read_state(root), root)
+    return manifest
+
+
+def compare_state(state: KpiState, kpis: dict, rollup: DataFrame, rtol: float = 1e-9) -> list[str]:
+    """Differences between the incremental state and a full recomputation."""
+    mismatches = []
+    current = state.kpi_frames()
+    if current["order_volume"] != kpis["order_volume"]:
+        mismatches.append(f"order_volume {current['order_volume']} != {kpis['order_volume']}")
+    if not np.isclose(current["total_revenue"], kpis["total_revenue"], rtol=rtol):
+        mismatches.append(f"total_revenue {current['total_revenue']} != {kpis['total_revenue']}")
+    for name, column in [("customer_spending", 'total_spent'), ("orders_per_customer", 'order_count')]:
+        expected = kpis[name]
+        if list(current[name]['customer_id']) != list(expected['customer_id'].astype(object)):
+            mismatches.append(f"{name} customers differ")
+        elif not np.allclose(current[name][column], expected[column], rtol=rtol):
+            mismatches.append(f"{name} {column} differs")
+    current_rollup = state.rollup()
+    if list(current_rollup.index) != list(rollup.index):
+        mismatches.append("daily rollup days differ")
+    else:
+        for column in ['revenue', 'order_count', 'item_count']:
+            if not np.allclose(current_rollup[column], rollup[column], rtol=rtol):
+                mismatches.append(f"daily rollup {column} differs")
+    return mismatches
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+from pandas.core.frame import DataFrame
+from .dtypes import key_codes
+
+def compute_kpi_frames(df_full: DataFrame) -> dict:
+    customer_codes, customer_ids = key_codes(df_full['customer_id'])
+    order_codes, order_ids = key_codes(df_full['order_id'])
+    revenue = df_full['revenue']
+    n_orders = max(len(order_ids), 1)
+
+    has_order = order_codes >= 0
+    order_volume = int(np.count_nonzero(np.bincount(order_codes[has_order], minlength=len(order_ids))))
+    total_revenue = revenue.sum()
+
+    has_customer = customer_codes >= 0
+    spend = revenue[has_customer].groupby(customer_codes[has_customer]).sum()
+
+    # Each (customer, order) pair packed into one int64 so distinct orders per
+    # customer come from a single hash pass instead of a per-group nunique.
+    paired = has_customer & has_order
+    pairs = pd.unique(customer_codes[paired].astype(np.int64) * n_orders + order_codes[paired])
+    order_counts = np.bincount(pairs // n_orders, minlength=len(customer_ids))[spend.index]
+
+    spending_ids = customer_ids[spend.index]
+    avg_customer_order = total_revenue / order_volume if order_volume else 0
+    return {
+        "order_volume": order_volume,
+        "total_revenue": total_revenue,
+        "customer_spending": pd.DataFrame({'customer_id': spending_ids, 'total_spent': spend.to_numpy()}),
+        "orders_per_customer": pd.DataFrame({'customer_id': spending_ids, 'order_count': order_counts}),
+        "avg_customer_order": avg_customer_order
+    }
+
+def kpis_to_json(kpis: dict) -> dict:
+    spending = kpis["customer_spending"]
+    orders = kpis["orders_per_customer"]
+    return {
+        "order_volume": int(kpis["order_volume"]),
+        "total_revenue": float(kpis["total_revenue"]),
+        "avg_customer_order": float(kpis["avg_customer_order"]),
+        "customer_spending": {
+            "customer_id": spending['customer_id'].tolist(),
+            "total_spent": spending['total_spent'].tolist()
+        },
+        "orders_per_customer": {
+            "customer_id": orders['customer_id'].tolist(),
+            "order_count": orders['order_count'].tolist()
+        }
+    }
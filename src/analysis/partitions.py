@@ -0,0 +1,150 @@
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+import pandas as pd
+from pandas.core.frame import DataFrame
+from .snapshots import HAS_PYARROW
+
+# The prepared rows, one directory per purchase month (Hive style: month=2023-03),
+# so date-bounded reads open only the months they overlap. Lines without a
+# purchase time (unattributed) live in month=undated.
+PARTITION_COLUMNS = ['order_id', 'customer_id', 'order_purchase_timestamp', 'revenue']
+TIMESTAMP_COLUMN = 'order_purchase_timestamp'
+UNDATED = 'undated'
+MANIFEST = 'manifest.json'
+
+
+def manifest_path(root: str) -> str:
+    return os.path.join(root, MANIFEST)
+
+def read_manifest(root: str) -> dict | None:
+    try:
+        with open(manifest_path(root)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_manifest(root: str, manifest: dict):
+    path = manifest_path(root)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def _iso(value) -> str | None:
+    return None if pd.isna(value) else pd.Timestamp(value).isoformat()
+
+def _write_months(df_full: DataFrame, root: str) -> dict:
+    """Write one new part file per month present in df_full; returns their manifest entries."""
+    timestamps = pd.to_datetime(df_full[TIMESTAMP_COLUMN]).to_numpy()
+    months = timestamps.astype('datetime64[M]')
+    keys = np.where(np.isnat(months), UNDATED, np.datetime_as_string(months, unit='M'))
+    entries = {}
+    for month, positions in pd.Series(np.arange(len(df_full))).groupby(keys):
+        part = df_full.iloc[positions.to_numpy()]
+        # Parquet would otherwise store every category of the whole frame in each file.
+        part = part.apply(lambda column: column.cat.remove_unused_categories()
+                          if isinstance(column.dtype, pd.CategoricalDtype) else column)
+        relative = os.path.join(f'month={month}', f'part-{uuid.uuid4().hex[:12]}.parquet')
+        path = os.path.join(root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        part.to_parquet(tmp_path, engine='pyarrow', index=False)
+        os.replace(tmp_path, path)
+        stamps = part[TIMESTAMP_COLUMN]
+        entries[month] = {"file": relative, "rows": len(part), "min": _iso(stamps.min()), "max": _iso(stamps.max())}
+    return entries
+
+def write_partitions(df_full: DataFrame, root: str, source_version: str) -> dict:
+    """Lay out df_full as month partitions under root, replacing any previous layout."""
+    if not HAS_PYARROW:
+        raise ImportError("pyarrow is required to write partitioned data")
+    try:
+        df_full = df_full[PARTITION_COLUMNS]
+        tmp_root = f'{root}.tmp'
+        shutil.rmtree(tmp_root, ignore_errors=True)
+        os.makedirs(tmp_root)
+        manifest = {"source_version": source_version,
+                    "partitions": {month: [entry] for month, entry in _write_months(df_full, tmp_root).items()}}
+        _write_manifest(tmp_root, manifest)
+    except Exception as e:
+        raise ValueError(f"Cannot write partitioned data: {e}")
+    shutil.rmtree(root, ignore_errors=True)
+    os.replace(tmp_root, root)
+    return manifest
+
+def append_partitions(df_full: DataFrame | None, root: str, source_version: str, replace: list[str] = ()) -> dict:
+    """Add df_full's rows as new part files; other existing files are never rewritten.
+
+    Months in replace drop their current files, so df_full must carry every
+    row those months keep. With no rows, only the manifest's source_version
+    moves on.
+    """
+    manifest = read_manifest(root)
+    if manifest is None:
+        raise FileNotFoundError(f"No partition manifest in {root}")
+    replaced = [entry["file"] for month in replace for entry in manifest["partitions"].pop(month, [])]
+    try:
+        if df_full is not None:
+            for month, entry in _write_months(df_full[PARTITION_COLUMNS], root).items():
+                manifest["partitions"].setdefault(month, []).append(entry)
+    except Exception as e:
+        raise ValueError(f"Cannot append partitioned data: {e}")
+    manifest["source_version"] = source_version
+    # The manifest is swapped in last, so readers see either all new parts or none.
+    _write_manifest(root, manifest)
+    for file in replaced:
+        os.remove(os.path.join(root, file))
+    return manifest
+
+def select_files(manifest: dict, start: pd.Timestamp = None, end: pd.Timestamp = None) -> list[str]:
+    """Part files that can hold rows in [start, end); undated rows only match unbounded reads."""
+    files = []
+    for month, entries in sorted(manifest["partitions"].items()):
+        for entry in entries:
+            if month == UNDATED or entry["min"] is None:
+                if start is None and end is None:
+                    files.append(entry["file"])
+                continue
+            if start is not None and pd.Timestamp(entry["max"]) < start:
+                continue
+            if end is not None and pd.Timestamp(entry["min"]) >= end:
+                continue
+            files.append(entry["file"])
+    return files
+
+def _empty_frame(columns: list[str]) -> DataFrame:
+    return pd.DataFrame({column: pd.Series(dtype='datetime64[ns]' if column == TIMESTAMP_COLUMN else 'float64')
+                         for column in columns})
+
+def _read_files(root: str, files: list[str], columns: list[str]) -> DataFrame:
+    if not files:
+        return _empty_frame(columns)
+    try:
+        return pd.concat([pd.read_parquet(os.path.join(root, file), columns=columns) for file in files],
+                         ignore_index=True)
+    except Exception as e:
+        raise FileNotFoundError(f"Error reading partitioned data from {root}: {e}")
+
+def read_partition(root: str, month: str, columns: list[str] = None) -> DataFrame:
+    """Every row of one month partition (or of UNDATED), in storage order."""
+    manifest = read_manifest(root)
+    if manifest is None:
+        raise FileNotFoundError(f"No partition manifest in {root}")
+    return _read_files(root, [entry["file"] for entry in manifest["partitions"].get(month, [])],
+                       columns or PARTITION_COLUMNS)
+
+def read_partitions(root: str, start: pd.Timestamp = None, end: pd.Timestamp = None,
+                    columns: list[str] = None) -> DataFrame:
+    """Rows of the overlapping partitions, sorted by purchase time.
+
+    Whole partitions are read, so rows just outside [start, end) can appear;
+    callers slice with slice_bounds as they do on the resident frame.
+    """
+    manifest = read_manifest(root)
+    if manifest is None:
+        raise FileNotFoundError(f"No partition manifest in {root}")
+    frame = _read_files(root, select_files(manifest, start, end), columns or PARTITION_COLUMNS)
+    return frame.sort_values(TIMESTAMP_COLUMN, kind='stable', na_position='last', ignore_index=True)
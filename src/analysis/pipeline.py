@@ -1,71 +1,567 @@
+import os
+import numpy as np
 import pandas as pd
 from pandas.core.frame import DataFrame
+from pandas.tseries.frequencies import to_offset
+from .cache import FrameCache, file_fingerprint, fingerprint_version, file_lock
+from .snapshots import (snapshots_available, snapshot_files, snapshot_parts, read_snapshots, read_snapshot_rows,
+                        write_snapshots, append_snapshots)
+from .dtypes import ORDERS_SCHEMA, ORDER_ITEMS_SCHEMA, CUSTOMERS_SCHEMA, downcast_frame, key_codes, memory_report
+from .kpis import compute_kpi_frames, kpis_to_json
+from .streaming import stream_aggregates
+from .timeslice import slice_bounds, window_buckets
+from .rollup import FLOOR_FREQS, build_daily_rollup, serves_freq, finest_unit, rebucket, read_rollup, write_rollup
+from .encoding import frame_columns
+from .ranking import RANK_METRICS, Ranking, encode_cursor, decode_cursor
+from .incremental import (KpiState, compare_state, line_revenue, state_manifest_path, read_state_manifest, read_state,
+                          write_state, append_state)
+from .sketches import MIN_PRECISION, build_daily_sketches, read_sketches, write_sketches, fold, estimate, relative_error
+from .partitions import UNDATED, read_manifest, write_partitions, append_partitions, read_partition, read_partitions
+from ..metrics import stage_timer, timed_stage
 
-base_path = 'C:\\Projects\\Contests\\Recruitment\\Ecommerce Order Dataset\\test'
+base_path = os.getenv('ANALYSIS_DATA_PATH', 'C:\\Projects\\Contests\\Recruitment\\Ecommerce Order Dataset\\test')
 
-def load_data() -> tuple[DataFrame, DataFrame, DataFrame]:
+# 'memory' keeps the merged frame resident; 'streaming' folds order items in
+# chunks of ANALYSIS_CHUNK_SIZE rows so peak memory no longer grows with the data.
+# 'incremental' serves KPIs and the rollup from the KpiState kept by append_batch.
+ANALYSIS_MODE = os.getenv('ANALYSIS_MODE', 'memory')
+CHUNK_SIZE = int(os.getenv('ANALYSIS_CHUNK_SIZE', '250000'))
+# Sketches are stored at this precision; requests may ask for any lower one.
+HLL_PRECISION = int(os.getenv('ANALYTICS_HLL_PRECISION', '12'))
+MAX_SERIES = 8
+
+def csv_files(data_path: str = None) -> list[str]:
+    data_path = data_path or base_path
+    return [
+        os.path.join(data_path, 'df_Orders.csv'),
+        os.path.join(data_path, 'df_OrderItems.csv'),
+        os.path.join(data_path, 'df_Customers.csv')
+    ]
+
+def snapshot_dir(data_path: str = None) -> str:
+    if data_path is None:
+        return os.getenv('ANALYSIS_SNAPSHOT_PATH', os.path.join(base_path, 'snapshots'))
+    return os.path.join(data_path, 'snapshots')
+
+def data_files(data_path: str = None) -> list[str]:
+    snapshot_path = snapshot_dir(data_path)
+    if snapshots_available(snapshot_path):
+        return snapshot_files(snapshot_path)
+    return csv_files(data_path)
+
+def data_sources(data_path: str = None) -> list[str]:
+    # data_files plus the batches appended to the snapshots since they were written.
+    return [part for path in data_files(data_path) for part in snapshot_parts(path)] \
+        if snapshots_available(snapshot_dir(data_path)) else data_files(data_path)
+
+def kpi_state_root(data_path: str = None) -> str:
+    return os.path.join(snapshot_dir(data_path), 'kpi_state')
+
+def append_lock_path(data_path: str = None) -> str:
+    return os.path.join(snapshot_dir(data_path), 'append.lock')
+
+def incremental_mode() -> bool:
+    return ANALYSIS_MODE == 'incremental'
+
+def source_files(data_path: str = None) -> list[str]:
+    # What the served aggregates are derived from, and so what versions them.
+    if incremental_mode():
+        return [state_manifest_path(kpi_state_root(data_path))]
+    return data_sources(data_path)
+
+def partition_root(data_path: str = None) -> str:
+    return os.path.join(snapshot_dir(data_path), 'partitioned')
+
+def data_files_version(data_path: str = None) -> str:
+    return fingerprint_version(file_fingerprint(data_sources(data_path)))
+
+def partitions_current(data_path: str = None) -> bool:
+    # Partitions are only trusted while they were built from the data files as they are now.
+    manifest = read_manifest(partition_root(data_path))
+    return manifest is not None and manifest.get("source_version") == data_files_version(data_path)
+
+@timed_stage('load_csv')
+def load_csv_data(data_path: str = None, use_schema: bool = True) -> tuple[DataFrame, DataFrame, DataFrame]:
     try:
-        df_orders = pd.read_csv(f'{base_path}\\df_Orders.csv')
-        df_order_items = pd.read_csv(f'{base_path}\\df_OrderItems.csv')
-        df_customers = pd.read_csv(f'{base_path}\\df_Customers.csv')
+        orders_file, order_items_file, customers_file = csv_files(data_path)
+        if use_schema:
+            df_orders = pd.read_csv(orders_file, **ORDERS_SCHEMA)
+            df_order_items = pd.read_csv(order_items_file, **ORDER_ITEMS_SCHEMA)
+            df_customers = pd.read_csv(customers_file, **CUSTOMERS_SCHEMA)
+        else:
+            df_orders = pd.read_csv(orders_file)
+            df_order_items = pd.read_csv(order_items_file)
+            df_customers = pd.read_csv(customers_file)
         return df_order_items, df_orders, df_customers
     except Exception as e:
         raise FileNotFoundError(f"Error loading data due to file not present: {e}")
 
+def load_data(data_path: str = None) -> tuple[DataFrame, DataFrame, DataFrame]:
+    snapshot_path = snapshot_dir(data_path)
+    if snapshots_available(snapshot_path):
+        try:
+            with stage_timer('load_snapshots'):
+                return read_snapshots(snapshot_path)
+        except Exception as e:
+            raise FileNotFoundError(f"Error loading data from snapshots: {e}")
+    return load_csv_data(data_path)
+
+def convert_to_snapshots(data_path: str = None) -> list[str]:
+    with file_lock(append_lock_path(data_path)):
+        df_order_items, df_orders, df_customers = load_csv_data(data_path)
+        return write_snapshots(df_order_items, df_orders, df_customers, snapshot_dir(data_path))
+
+@timed_stage('merge')
 def prepare_data(df_order_items: DataFrame, df_orders: DataFrame, df_customers: DataFrame) -> DataFrame:
+    """Attribute every order line to its order's customer and purchase time.
+
+    Same rows as a left merge of the lines onto the orders of known customers,
+    keeping only the columns later stages read. Both joins run on integer
+    codes and the caller's frames are left untouched.
+    """
     try:
-        df_orders['order_purchase_timestamp'] = pd.to_datetime(df_orders['order_purchase_timestamp'])
-        df_orders['order_approved_at'] = pd.to_datetime(df_orders['order_approved_at'])
-        df_order_items['revenue'] = df_order_items['price'] + df_order_items['shipping_charges']
-        df_order_items.drop(['price', 'shipping_charges'], axis=1, inplace=True)
-        df_orders_customers = pd.merge(df_orders, df_customers, on='customer_id')
-        df_full = pd.merge(df_order_items, df_orders_customers, on='order_id', how='left')
-        return df_full
+        item_codes, item_order_ids = key_codes(df_order_items['order_id'])
+        order_codes, order_ids = key_codes(df_orders['order_id'])
+        customer_codes, customer_ids = key_codes(df_orders['customer_id'])
+        # Each lookup table ends in a slot for "missing", which code -1 lands on.
+        known_customer = np.append(customer_ids.isin(df_customers['customer_id']), False)
+        attributed = known_customer[customer_codes] & (order_codes >= 0)
+        # Like KpiState, the first row of a duplicated order wins.
+        attributed &= ~df_orders['order_id'].duplicated().to_numpy()
+        rows = np.flatnonzero(attributed)
+        row_of_order = np.full(len(order_ids) + 1, -1, dtype=np.intp)
+        row_of_order[order_codes[rows]] = rows
+        # One hash lookup per distinct order id, then an integer gather per line.
+        order_rows = row_of_order[np.append(order_ids.get_indexer(item_order_ids), -1)[item_codes]]
+
+        purchased_at = pd.to_datetime(df_orders['order_purchase_timestamp']).to_numpy()
+        if 'revenue' in df_order_items.columns:
+            revenue = df_order_items['revenue'].to_numpy(dtype=np.float64)
+        else:
+            revenue = (df_order_items['price'].to_numpy(dtype=np.float64)
+                       + df_order_items['shipping_charges'].to_numpy(dtype=np.float64))
+        df_full = pd.DataFrame({
+            'order_id': pd.Categorical.from_codes(item_codes, categories=item_order_ids),
+            'customer_id': pd.Categorical.from_codes(np.append(customer_codes, -1)[order_rows], categories=customer_ids),
+            'order_purchase_timestamp': np.append(purchased_at, np.datetime64('NaT'))[order_rows],
+            'revenue': revenue
+        })
+        return downcast_frame(df_full)
     except Exception as e:
         raise ValueError(f"Cannot merge data: {e}")
 
+def dtype_memory_report(data_path: str = None) -> dict:
+    raw_items, raw_orders, raw_customers = load_csv_data(data_path, use_schema=False)
+    df_order_items, df_orders, df_customers = load_csv_data(data_path)
+    report = {
+        'order_items': memory_report(raw_items, df_order_items),
+        'orders': memory_report(raw_orders, df_orders),
+        'customers': memory_report(raw_customers, df_customers)
+    }
+    raw_full = pd.merge(
+        raw_items.assign(revenue=raw_items['price'] + raw_items['shipping_charges']),
+        pd.merge(raw_orders, raw_customers, on='customer_id'),
+        on='order_id', how='left'
+    )
+    report['df_full'] = memory_report(raw_full, prepare_data(df_order_items, df_orders, df_customers))
+    return report
+
+def _build_prepared_data() -> DataFrame:
+    df_order_items, df_orders, df_customers = load_data()
+    df_full = prepare_data(df_order_items, df_orders, df_customers)
+    # Kept sorted by purchase time (NaT last) so date ranges are binary searches.
+    return df_full.sort_values('order_purchase_timestamp', kind='stable', na_position='last', ignore_index=True)
+
+prepared_data_cache = FrameCache(_build_prepared_data, data_sources)
+
+def get_prepared_data() -> DataFrame:
+    # Shared across requests: callers must treat the frame as read-only.
+    return prepared_data_cache.get()
+
+@timed_stage('stream')
+def stream_data(data_path: str = None, chunk_size: int = None) -> tuple[dict, DataFrame, DataFrame]:
+    orders_file, order_items_file, customers_file = data_files(data_path)
+    return stream_aggregates(orders_file, order_items_file, customers_file, chunk_size or CHUNK_SIZE)
+
+streamed_data_cache = FrameCache(stream_data, data_sources)
+
+def streaming_mode() -> bool:
+    return ANALYSIS_MODE == 'streaming'
+
+def _load_kpi_state() -> KpiState:
+    with stage_timer('load_kpi_state'):
+        return read_state(kpi_state_root())
+
+kpi_state_cache = FrameCache(_load_kpi_state, source_files)
+
+def _build_kpi_frames() -> dict:
+    if incremental_mode():
+        return kpi_state_cache.get().kpi_frames()
+    if streaming_mode():
+        return streamed_data_cache.get()[0]
+    return compute_kpis(get_prepared_data())
+
+kpi_frames_cache = FrameCache(_build_kpi_frames, source_files)
+
+def current_kpis() -> dict:
+    return kpis_to_json(kpi_frames_cache.get())
+
+def _build_customer_ranking() -> dict:
+    kpis = kpi_frames_cache.get()
+    spending = kpis["customer_spending"]
+    # Both KPI frames list customers in the same (sorted customer_id) order.
+    ranking = {
+        "customer_id": spending['customer_id'].to_numpy(dtype=object),
+        "total_spent": spending['total_spent'].to_numpy(),
+        "order_count": kpis["orders_per_customer"]['order_count'].to_numpy()
+    }
+    for by, column in RANK_METRICS.items():
+        ranking[by] = Ranking(ranking[column])
+    return ranking
+
+customer_ranking_cache = FrameCache(_build_customer_ranking, source_files)
+
+@timed_stage('rank_customers')
+def top_customers(by: str = 'spend', limit: int = 10, cursor: str = None) -> dict:
+    if by not in RANK_METRICS:
+        raise ValueError(f"Cannot rank customers by {by}")
+    version = data_version()
+    offset = decode_cursor(cursor, version, by) if cursor else 0
+    ranking = customer_ranking_cache.get()
+    positions = ranking[by].page(offset, limit)
+    next_offset = offset + len(positions)
+    total_customers = len(ranking["customer_id"])
+    return {
+        "customers": {
+            "rank": list(range(offset + 1, next_offset + 1)),
+            "customer_id": ranking["customer_id"][positions].tolist(),
+            "total_spent": ranking["total_spent"][positions].tolist(),
+            "order_count": ranking["order_count"][positions].tolist()
+        },
+        "total_customers": total_customers,
+        "next_cursor": encode_cursor(version, by, next_offset) if next_offset < total_customers else None
+    }
+
+def data_version() -> str:
+    return kpi_frames_cache.version()
+
+def _build_daily_rollup() -> DataFrame:
+    if incremental_mode():
+        return kpi_state_cache.get().rollup()
+    version = data_version()
+    rollup_dir = os.path.join(snapshot_dir(), 'rollups')
+    rollup = read_rollup(rollup_dir, version)
+    if rollup is None:
+        if streaming_mode():
+            rollup = streamed_data_cache.get()[1]
+        else:
+            df_full = get_prepared_data()
+            with stage_timer('rollup'):
+                rollup = build_daily_rollup(df_full)
+        if os.path.isdir(base_path):
+            write_rollup(rollup, rollup_dir, version)
+    return rollup
+
+daily_rollup_cache = FrameCache(_build_daily_rollup, source_files)
+
+def get_daily_rollup() -> DataFrame:
+    return daily_rollup_cache.get()
+
+def _build_daily_sketches():
+    version = data_version()
+    sketch_dir = os.path.join(snapshot_dir(), 'rollups')
+    sketches = read_sketches(sketch_dir, version, HLL_PRECISION)
+    if sketches is None:
+        if incremental_mode():
+            orders = kpi_state_cache.get().attributed_orders()
+        elif streaming_mode():
+            orders = streamed_data_cache.get()[2]
+        else:
+            orders = get_prepared_data()
+        with stage_timer('sketches'):
+            sketches = build_daily_sketches(orders['order_id'], orders['customer_id'],
+                                            orders['order_purchase_timestamp'], HLL_PRECISION)
+        if os.path.isdir(base_path):
+            write_sketches(sketches, sketch_dir, version)
+    return sketches
+
+daily_sketches_cache = FrameCache(_build_daily_sketches, source_files)
+
+def approximate_kpis(start_date: str = None, end_date: str = None, precision: int = None) -> dict:
+    precision = precision or HLL_PRECISION
+    if not MIN_PRECISION <= precision <= HLL_PRECISION:
+        raise ValueError(f"precision must be between {MIN_PRECISION} and {HLL_PRECISION}")
+    bounds = date_bounds(start_date, end_date) if start_date and end_date else (None, None)
+    sketches = daily_sketches_cache.get()
+    orders, customers = sketches.merged(*slice_bounds(sketches.days.to_numpy(), *bounds))
+    rollup = get_daily_rollup()
+    lo, hi = slice_bounds(rollup.index.to_numpy(), *bounds)
+    total_revenue = float(rollup['revenue'].iloc[lo:hi].sum())
+
+    order_volume = estimate(fold(orders, HLL_PRECISION, precision))
+    distinct_customers = estimate(fold(customers, HLL_PRECISION, precision))
+    error = relative_error(precision)
+    return {
+        "approximate": True,
+        "precision": precision,
+        "relative_error": error,
+        "order_volume": round(order_volume),
+        "distinct_customers": round(distinct_customers),
+        # Roughly 95% of estimates land within two standard errors.
+        "order_volume_interval": [round(order_volume * (1 - 2 * error)), round(order_volume * (1 + 2 * error))],
+        "distinct_customers_interval": [round(distinct_customers * (1 - 2 * error)),
+                                        round(distinct_customers * (1 + 2 * error))],
+        "total_revenue": total_revenue,
+        "avg_customer_order": total_revenue / order_volume if order_volume else 0
+    }
+
+def clear_caches():
+    prepared_data_cache.clear()
+    streamed_data_cache.clear()
+    kpi_state_cache.clear()
+    kpi_frames_cache.clear()
+    customer_ranking_cache.clear()
+    daily_rollup_cache.clear()
+    daily_sketches_cache.clear()
+
+def date_bounds(start_date: str, end_date: str) -> tuple[pd.Timestamp, pd.Timestamp]:
+    # A date-only end_date covers that whole day.
+    start = pd.to_datetime(start_date)
+    end = pd.to_datetime(end_date)
+    if end == end.normalize():
+        return start, end + pd.Timedelta(days=1)
+    return start, end + pd.Timedelta(1, unit='ns')
+
+@timed_stage('kpis')
 def compute_kpis(df_full: DataFrame):
     try:
-        order_volume = df_full['order_id'].nunique()
-        total_revenue = df_full['revenue'].sum()
-        customer_spending = df_full.groupby('customer_id')['revenue'].sum().reset_index(name='total_spent')
-        orders_per_customer = df_full.groupby('customer_id')['order_id'].nunique().reset_index(name='order_count')
-        avg_customer_order = total_revenue / order_volume if order_volume else 0
-        return {
-            "order_volume": order_volume,
-            "total_revenue": total_revenue,
-            "customer_spending": customer_spending,
-            "orders_per_customer": orders_per_customer,
-            "avg_customer_order": avg_customer_order
-        }
+        return compute_kpi_frames(df_full)
     except Exception as e:
         raise LookupError(f"Column not found or computation error: {e}")
 
-def compute_weekly_monthly_revenue(df_full: DataFrame):
+@timed_stage('revenue_rebucket')
+def compute_weekly_monthly_revenue(df_full: DataFrame = None, rollup: DataFrame = None):
     try:
-        weekly_revenue = df_full.groupby(pd.Grouper(key='order_purchase_timestamp', freq='W'))['revenue'].sum().reset_index()
+        if rollup is None:
+            rollup = build_daily_rollup(df_full)
+        weekly_revenue = rebucket(rollup, 'W')['revenue'].reset_index()
         weekly_revenue.columns = ['week_end_date', 'weekly_revenue']
-        monthly_revenue = df_full.groupby(pd.Grouper(key='order_purchase_timestamp', freq='M'))['revenue'].sum().reset_index()
+        monthly_revenue = rebucket(rollup, 'M')['revenue'].reset_index()
         monthly_revenue.columns = ['month_end_date', 'monthly_revenue']
         return weekly_revenue, monthly_revenue
     except Exception as e:
         raise ValueError(f"Error computing revenue aggregations: {e}")
 
+def revenue_rows(bounds: tuple = (None, None)) -> tuple:
+    """Purchase times and line revenue for bucketing below a day, sorted by time.
+
+    The resident prepared frame is used when it is already built. Otherwise a
+    bounded request reads only the month partitions it overlaps, when they
+    are current, and anything else needs the full frame (memory mode only).
+    """
+    df_full = prepared_data_cache.peek()
+    if df_full is None and bounds[0] is not None and partitions_current():
+        with stage_timer('read_partitions'):
+            df_full = read_partitions(partition_root(), *bounds, columns=['order_purchase_timestamp', 'revenue'])
+    elif df_full is None:
+        if ANALYSIS_MODE != 'memory':
+            raise ValueError(f"Intraday buckets and time-of-day ranges are not available in {ANALYSIS_MODE} mode")
+        df_full = get_prepared_data()
+    return df_full['order_purchase_timestamp'].to_numpy(), df_full['revenue'].to_numpy()
+
+@timed_stage('revenue_batch')
+def revenue_batch_table(timestamps, values, freq: str, offset: int, limit: int,
+                        bounds: tuple = (None, None)) -> dict:
+    lo, hi = slice_bounds(timestamps, *bounds)
+    revenue = window_buckets(timestamps[lo:hi], values[lo:hi], freq, offset, limit)
+    batch_data = revenue.rename_axis('date').reset_index(name='revenue')
+    return {"data": frame_columns(batch_data)}
+
 def revenue_chart_data_batch(freq: str = 'W', offset: int = 0, limit: int = 10,
                              start_date: str = None, end_date: str = None) -> dict:
     try:
-        df_order_items, df_orders, df_customers = load_data()
-        df_full = prepare_data(df_order_items, df_orders, df_customers)
-        if start_date and end_date:
-            mask = (
-                (df_full['order_purchase_timestamp'] >= pd.to_datetime(start_date)) & 
-                (df_full['order_purchase_timestamp'] <= pd.to_datetime(end_date))
-            )
-            df_full = df_full.loc[mask]
-        revenue_df = df_full.groupby(pd.Grouper(key='order_purchase_timestamp', freq=freq))['revenue'].sum().reset_index()
-        revenue_df.columns = ['date', 'revenue']
-        revenue_df.sort_values(by='date', inplace=True)
-        batch_data = revenue_df.iloc[offset:offset+limit]
-        return {"data": batch_data.to_dict(orient="records")}
+        bounds = date_bounds(start_date, end_date) if start_date and end_date else (None, None)
+        day_aligned = all(bound is None or bound == bound.normalize() for bound in bounds)
+        if serves_freq(freq) and day_aligned:
+            rollup = get_daily_rollup()
+            timestamps = rollup.index.to_numpy()
+            values = rollup['revenue'].to_numpy()
+        else:
+            timestamps, values = revenue_rows(bounds)
+        return revenue_batch_table(timestamps, values, freq, offset, limit, bounds)
     except Exception as e:
         raise ValueError(f"Error in revenue_chart_data_batch: {e}")
+
+def series_freqs(freqs: list[str]) -> list[str]:
+    freqs = list(dict.fromkeys(freq.strip() for freq in freqs if freq and freq.strip()))
+    if not freqs:
+        raise ValueError("At least one frequency is required")
+    if len(freqs) > MAX_SERIES:
+        raise ValueError(f"At most {MAX_SERIES} frequencies can be requested together")
+    for freq in freqs:
+        to_offset(freq)
+    return freqs
+
+@timed_stage('revenue_series')
+def revenue_series_tables(buckets: DataFrame, freqs: list[str], cumulative: bool = False,
+                          moving_average: int = None) -> dict:
+    # buckets hold revenue at a unit nesting inside every freq, so each series
+    # resamples those totals rather than regrouping the rows.
+    if moving_average is not None and moving_average < 1:
+        raise ValueError("moving_average must be at least 1")
+    result = {}
+    for freq in freqs:
+        revenue = buckets['revenue'].resample(freq).sum()
+        series = pd.DataFrame({'revenue': revenue})
+        if cumulative:
+            series['cumulative_revenue'] = revenue.cumsum()
+        if moving_average:
+            # Trailing mean; the first buckets of the range average over what exists.
+            series['moving_average'] = revenue.rolling(moving_average, min_periods=1).mean()
+        result[freq] = frame_columns(series.rename_axis('date').reset_index())
+    return result
+
+def revenue_series(freqs: list[str], start_date: str = None, end_date: str = None, cumulative: bool = False,
+                   moving_average: int = None) -> dict:
+    try:
+        freqs = series_freqs(freqs)
+        bounds = date_bounds(start_date, end_date) if start_date and end_date else (None, None)
+        day_aligned = all(bound is None or bound == bound.normalize() for bound in bounds)
+        unit = finest_unit(freqs)
+        if unit == 'day' and day_aligned:
+            rollup = get_daily_rollup()
+            lo, hi = slice_bounds(rollup.index.to_numpy(), *bounds)
+            buckets = rollup.iloc[lo:hi]
+        else:
+            timestamps, values = revenue_rows(bounds)
+            lo, hi = slice_bounds(timestamps, *bounds)
+            window = pd.Series(values[lo:hi], index=pd.DatetimeIndex(timestamps[lo:hi]))
+            buckets = window.groupby(window.index.floor(FLOOR_FREQS[unit])).sum().to_frame('revenue')
+        return revenue_series_tables(buckets, freqs, cumulative, moving_average)
+    except Exception as e:
+        raise ValueError(f"Error in revenue_series: {e}")
+
+def revenue_all(rollup: DataFrame = None) -> dict:
+    weekly, monthly = compute_weekly_monthly_revenue(rollup=get_daily_rollup() if rollup is None else rollup)
+    return {
+        "weekly_revenue": frame_columns(weekly),
+        "monthly_revenue": frame_columns(monthly)
+    }
+
+def _append_csv(path: str, frame: DataFrame):
+    if os.path.isfile(path):
+        # Keep the export's column order; columns the batch lacks are left empty.
+        header = pd.read_csv(path, nrows=0).columns
+        frame.reindex(columns=header).to_csv(path, mode='a', header=False, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+def partition_data(data_path: str = None) -> dict:
+    with file_lock(append_lock_path(data_path)):
+        df_full = prepare_data(*load_data(data_path))
+        return write_partitions(df_full, partition_root(data_path), data_files_version(data_path))
+
+def _batch_lookup(order_ids: list, data_path: str = None) -> tuple[DataFrame, DataFrame]:
+    # Every row of those orders and their customers' rows, batches included; only matching rows are read.
+    snapshot_path = snapshot_dir(data_path)
+    if snapshots_available(snapshot_path):
+        orders_file, _, customers_file = snapshot_files(snapshot_path)
+        orders = read_snapshot_rows(orders_file, 'order_id', order_ids,
+                                    ['order_id', 'customer_id', 'order_purchase_timestamp'])
+        customers = read_snapshot_rows(customers_file, 'customer_id', orders['customer_id'].dropna().unique().tolist(),
+                                       ['customer_id'])
+        return orders, customers
+    # Without snapshots the exports have to be scanned.
+    orders_file, _, customers_file = csv_files(data_path)
+    orders = pd.read_csv(orders_file, **ORDERS_SCHEMA)
+    orders = orders[orders['order_id'].isin(order_ids)]
+    customers = pd.read_csv(customers_file, **CUSTOMERS_SCHEMA)
+    return orders, customers[customers['customer_id'].isin(orders['customer_id'])]
+
+def _append_partitions(order_items: DataFrame = None, orders: DataFrame = None, customers: DataFrame = None,
+                       data_path: str = None):
+    # Called once the batch is in the exports and snapshots, so prepare_data over just the lines
+    # it touches attributes them the way a full rebuild would.
+    root = partition_root(data_path)
+    lines = [pd.DataFrame({'order_id': order_items['order_id'].to_numpy(dtype=object),
+                           'revenue': line_revenue(order_items).to_numpy()})] if order_items is not None else []
+    batch_lines = len(lines[0]) if lines else 0
+    undated = None
+    if orders is not None or customers is not None:
+        # New orders and customers can only attribute lines that were unattributed, and those are all undated.
+        undated = read_partition(root, UNDATED)
+        candidates = undated['customer_id'].isna().to_numpy()
+        lines.append(undated.loc[candidates, ['order_id', 'revenue']].astype({'order_id': object}))
+    lines = pd.concat(lines, ignore_index=True) if lines else None
+    if lines is None or not len(lines):
+        append_partitions(None, root, data_files_version(data_path))
+        return
+    df_lines = prepare_data(lines, *_batch_lookup(lines['order_id'].dropna().unique().tolist(), data_path))
+    df_lines = df_lines.astype({'order_id': object, 'customer_id': object})
+    frames, replace = [df_lines.iloc[:batch_lines]], []
+    if undated is not None:
+        attributed = df_lines['customer_id'].iloc[batch_lines:].notna().to_numpy()
+        moved = np.zeros(len(undated), dtype=bool)
+        moved[np.flatnonzero(candidates)] = attributed
+        if moved.any():
+            frames += [df_lines.iloc[batch_lines:][attributed],
+                       undated.loc[~moved].astype({'order_id': object, 'customer_id': object})]
+            replace.append(UNDATED)
+    append_partitions(pd.concat(frames, ignore_index=True), root, data_files_version(data_path), replace)
+
+def _rebuild_kpi_state(data_path: str = None) -> KpiState:
+    state = KpiState.from_frames(*load_data(data_path))
+    write_state(state, kpi_state_root(data_path))
+    return state
+
+def rebuild_kpi_state(data_path: str = None) -> KpiState:
+    with file_lock(append_lock_path(data_path)):
+        return _rebuild_kpi_state(data_path)
+
+def append_batch(order_items: DataFrame = None, orders: DataFrame = None, customers: DataFrame = None,
+                 data_path: str = None) -> dict:
+    """Append a batch to the exports and to everything kept current from them.
+
+    The work follows the size of the batch: the exports and snapshots get it
+    appended, the KPI state records it as a delta, and the month partitions
+    get new part files (rewriting only the undated month when the batch
+    attributes lines already there). Appends to one data path hold a file
+    lock, so concurrent callers take turns. Returns the KPI state manifest.
+    """
+    with file_lock(append_lock_path(data_path)):
+        root = kpi_state_root(data_path)
+        if read_state_manifest(root) is None:
+            if all(os.path.isfile(path) for path in csv_files(data_path)):
+                _rebuild_kpi_state(data_path)
+            else:
+                write_state(KpiState(), root)
+
+        partitioned = partitions_current(data_path)
+        # The exports stay the source of truth, so a full rebuild sees every batch too.
+        orders_file, order_items_file, customers_file = csv_files(data_path)
+        for path, frame in [(orders_file, orders), (order_items_file, order_items), (customers_file, customers)]:
+            if frame is not None:
+                _append_csv(path, frame)
+        if snapshots_available(snapshot_dir(data_path)):
+            append_snapshots(order_items, orders, customers, snapshot_dir(data_path))
+        manifest = append_state(root, order_items, orders, customers)
+        if partitioned:
+            _append_partitions(order_items, orders, customers, data_path)
+        return manifest
+
+def verify_kpi_state(data_path: str = None) -> dict:
+    state = read_state(kpi_state_root(data_path))
+    df_full = prepare_data(*load_data(data_path))
+    mismatches = compare_state(state, compute_kpis(df_full), build_daily_rollup(df_full))
+    return {"consistent": not mismatches, "mismatches": mismatches, "batches": state.batches}
+
+def cache_stats() -> dict:
+    return {
+        "pid": os.getpid(),
+        "prepared_data": prepared_data_cache.stats(),
+        "streamed_data": streamed_data_cache.stats(),
+        "kpi_frames": kpi_frames_cache.stats(),
+        "customer_ranking": customer_ranking_cache.stats(),
+        "daily_rollup": daily_rollup_cache.stats(),
+        "daily_sketches": daily_sketches_cache.stats()
+    }
@@ -1,43 +1,126 @@
-from fastapi import APIRouter, Depends, Request, HTTPException
-from .pipeline import load_data,prepare_data,compute_kpis, revenue_chart_data_batch, compute_weekly_monthly_revenue
+from typing import Literal
+from fastapi import APIRouter, Depends, Request, HTTPException, Query
+from .pipeline import cache_stats, series_freqs
+from .backends import get_backend
+from .executor import analytics_executor, AnalyticsBusy
+from .result_cache import result_cache
+from .encoding import negotiate, encode_result
+from .ranking import InvalidCursor
 from ..authentication.utils import get_current_user
 from ..schema import UserResponse
 
 pipeline_router=APIRouter(prefix="/analytics",tags=["analytics"])
 
+async def cached_result(route: str, user_id, params: dict, compute):
+    backend = get_backend()
+    version = await backend.data_version(user_id)
+    return await result_cache.get_or_compute(f'{backend.name}:{route}', user_id, version, params, compute)
+
 @pipeline_router.get('/kpis')
-def get_kpis(current_user: dict = Depends(get_current_user)):
+async def get_kpis(request: Request, table: str = None, approximate: bool = False, start_date: str = None,
+                   end_date: str = None, precision: int = None, current_user: dict = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=401, detail="Unauthorized")
+    if not approximate and (start_date or end_date or precision):
+        raise HTTPException(status_code=400, detail="Date ranges and precision need approximate=true")
+    media_type = negotiate(request.headers.get('accept'))
     try:
-        df_order_items, df_orders, df_customers = load_data()
-        df_full = prepare_data(df_order_items, df_orders, df_customers)
-        result = compute_kpis(df_full)
-        return result
+        user_id = current_user["user_id"]
+        if approximate:
+            params = {"start_date": start_date, "end_date": end_date, "precision": precision}
+            result = await cached_result('kpis_approximate', user_id, params,
+                                         lambda: get_backend().approximate_kpis(user_id, start_date, end_date, precision))
+        else:
+            result = await cached_result('kpis', user_id, {}, lambda: get_backend().kpis(user_id))
+    except AnalyticsBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return encode_result(result, media_type, table)
     
 @pipeline_router.get('/revenue_batch')
-def get_revenue_batch(freq: str = 'W', offset: int = 0, limit: int = 10, start_date: str = None, end_date: str = None,current_user: dict = Depends(get_current_user)):
+async def get_revenue_batch(request: Request, freq: str = 'W', offset: int = 0, limit: int = 10, start_date: str = None, end_date: str = None,current_user: dict = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=401, detail="Unauthorized")
+    media_type = negotiate(request.headers.get('accept'))
     try:
-        result = revenue_chart_data_batch(freq=freq, offset=offset, limit=limit, start_date=start_date, end_date=end_date)
-        return result
+        user_id = current_user["user_id"]
+        params = {"freq": freq, "offset": offset, "limit": limit, "start_date": start_date, "end_date": end_date}
+        result = await cached_result('revenue_batch', user_id, params,
+                                     lambda: get_backend().revenue_batch(user_id, freq, offset, limit, start_date, end_date))
+    except AnalyticsBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return encode_result(result, media_type)
 
 @pipeline_router.get('/revenue_all')
-def get_revenue_all(current_user: dict = Depends(get_current_user)):
+async def get_revenue_all(request: Request, table: str = None, current_user: dict = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    media_type = negotiate(request.headers.get('accept'))
+    try:
+        user_id = current_user["user_id"]
+        result = await cached_result('revenue_all', user_id, {}, lambda: get_backend().revenue_all(user_id))
+    except AnalyticsBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return encode_result(result, media_type, table)
+
+@pipeline_router.get('/revenue_series')
+async def get_revenue_series(request: Request, freq: list[str] = Query(['D', 'W', 'M', 'Q']), start_date: str = None,
+                             end_date: str = None, cumulative: bool = False,
+                             moving_average: int = Query(None, ge=1, le=366), table: str = None,
+                             current_user: dict = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    try:
+        freqs = series_freqs(freq)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    media_type = negotiate(request.headers.get('accept'))
+    try:
+        user_id = current_user["user_id"]
+        params = {"freq": ','.join(freqs), "start_date": start_date, "end_date": end_date,
+                  "cumulative": cumulative, "moving_average": moving_average}
+        result = await cached_result('revenue_series', user_id, params,
+                                     lambda: get_backend().revenue_series(user_id, freqs, start_date, end_date,
+                                                                          cumulative, moving_average))
+    except AnalyticsBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return encode_result(result, media_type, table)
+
+@pipeline_router.get('/customers/top')
+async def get_top_customers(request: Request, by: Literal['spend', 'orders'] = 'spend', limit: int = Query(10, ge=1, le=1000),
+                            cursor: str = None, current_user: dict = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=401, detail="Unauthorized")
+    media_type = negotiate(request.headers.get('accept'))
     try:
-        df_order_items, df_orders, df_customers = load_data()
-        df_full = prepare_data(df_order_items, df_orders, df_customers)
-        weekly, monthly = compute_weekly_monthly_revenue(df_full)
-        return {
-            "weekly_revenue": weekly.to_dict(orient='records'),
-            "monthly_revenue": monthly.to_dict(orient='records')
-        }
+        user_id = current_user["user_id"]
+        params = {"by": by, "limit": limit, "cursor": cursor}
+        result = await cached_result('customers_top', user_id, params,
+                                     lambda: get_backend().top_customers(user_id, by, limit, cursor))
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except AnalyticsBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    return encode_result(result, media_type)
+
+@pipeline_router.get('/cache_stats')
+async def get_cache_stats(current_user: dict = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    try:
+        # Caches live in the worker processes; this reports the worker that served the call.
+        result = await analytics_executor.run(cache_stats)
+        result["executor"] = analytics_executor.stats()
+        result["result_cache"] = result_cache.stats()
+        return result
+    except AnalyticsBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
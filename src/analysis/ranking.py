@@ -0,0 +1,70 @@
+import base64
+import binascii
+import json
+import numpy as np
+
+# Query value -> column of the KPI frames it ranks by.
+RANK_METRICS = {'spend': 'total_spent', 'orders': 'order_count'}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def top_positions(values: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k largest values, largest first.
+
+    Ties are broken by position, which is customer_id order for the KPI
+    frames, so pages are stable between calls.
+    """
+    n = len(values)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        # Selection is O(n); only the values at or above the k-th largest get sorted,
+        # including every row tied with it so the tie-break is applied correctly.
+        threshold = values[np.argpartition(values, n - k)[n - k]]
+        candidates = np.flatnonzero(values >= threshold)
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -values[candidates]))
+    return candidates[order][:k]
+
+
+class Ranking:
+    """Lazily ranked prefix of a metric, grown as deeper pages are requested."""
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+        self._prefix = np.empty(0, dtype=np.int64)
+
+    @property
+    def ranked(self) -> int:
+        return len(self._prefix)
+
+    def page(self, offset: int, limit: int) -> np.ndarray:
+        needed = offset + limit
+        if needed > len(self._prefix) and len(self._prefix) < len(self.values):
+            # Doubling keeps the number of re-selections logarithmic in the depth paged to.
+            self._prefix = top_positions(self.values, max(needed, 2 * len(self._prefix)))
+        return self._prefix[offset:needed]
+
+
+def encode_cursor(version: str, by: str, offset: int) -> str:
+    payload = json.dumps({"v": version, "by": by, "o": offset}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str, version: str, by: str) -> int:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        offset = int(payload["o"])
+        cursor_version, cursor_by = payload["v"], payload["by"]
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Malformed cursor: {e}")
+    if cursor_version != version:
+        raise InvalidCursor("Cursor is from an older version of the data, restart from the first page")
+    if cursor_by != by or offset < 0:
+        raise InvalidCursor("Cursor does not belong to this ranking")
+    return offset
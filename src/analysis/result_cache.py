@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import json
+import os
+import secrets
+import time
+from typing import Any, Awaitable, Callable
+from fastapi.encoders import jsonable_encoder
+from redis.exceptions import RedisError
+from ..redis_client import redis_client
+
+ANALYTICS_CACHE_ENABLED = os.getenv('ANALYTICS_CACHE', '1') == '1'
+# Entries older than the soft TTL are recomputed by one caller while the rest
+# keep serving the old value; Redis drops them outright at the hard TTL.
+ANALYTICS_CACHE_SOFT_TTL = int(os.getenv('ANALYTICS_CACHE_SOFT_TTL', '60'))
+ANALYTICS_CACHE_HARD_TTL = int(os.getenv('ANALYTICS_CACHE_HARD_TTL', '600'))
+ANALYTICS_CACHE_LOCK_TTL = int(os.getenv('ANALYTICS_CACHE_LOCK_TTL', '30'))
+ANALYTICS_CACHE_WAIT = float(os.getenv('ANALYTICS_CACHE_WAIT', '5'))
+# Compare-and-delete in one round trip, so a lock that expired and was taken
+# by another worker between a GET and a DEL is never dropped.
+RELEASE_LOCK_SCRIPT = "if redis.call('get',KEYS[1])==ARGV[1] then return redis.call('del',KEYS[1]) end return 0"
+
+
+def normalise_params(params: dict) -> str:
+    # Omitted and None parameters mean the same query, and key order must not matter.
+    present = {name: str(value).strip() for name, value in params.items() if value is not None}
+    return json.dumps(present, sort_keys=True, separators=(',', ':'))
+
+def cache_key(route: str, user_id, version: str, params: dict) -> str:
+    digest = hashlib.sha1(normalise_params(params).encode()).hexdigest()
+    return f'analytics:{route}:{user_id}:{version}:{digest}'
+
+
+class ResultCache:
+    def __init__(self, client=redis_client, soft_ttl: int = ANALYTICS_CACHE_SOFT_TTL,
+                 hard_ttl: int = ANALYTICS_CACHE_HARD_TTL, lock_ttl: int = ANALYTICS_CACHE_LOCK_TTL,
+                 wait_timeout: float = ANALYTICS_CACHE_WAIT, poll_interval: float = 0.05,
+                 enabled: bool = ANALYTICS_CACHE_ENABLED):
+        self.client = client
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.enabled = enabled
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._errors = 0
+        self._recomputes = 0
+        self._recompute_seconds = 0.0
+        self._last_recompute_seconds = 0.0
+
+    async def _read(self, key: str) -> dict | None:
+        raw = await self.client.get(key)
+        return json.loads(raw) if raw else None
+
+    async def _compute(self, compute: Callable[[], Awaitable[Any]]) -> Any:
+        start = time.perf_counter()
+        value = jsonable_encoder(await compute())
+        elapsed = time.perf_counter() - start
+        self._recomputes += 1
+        self._recompute_seconds += elapsed
+        self._last_recompute_seconds = elapsed
+        return value
+
+    async def _refresh(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value = await self._compute(compute)
+        entry = json.dumps({"computed_at": time.time(), "value": value})
+        try:
+            await self.client.set(key, entry, ex=self.hard_ttl)
+        except RedisError:
+            self._errors += 1
+        return value
+
+    async def _release(self, lock_key: str, token: str):
+        # The value is already computed; failing to release only leaves the lock to expire.
+        try:
+            await self.client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except RedisError:
+            self._errors += 1
+
+    async def get_or_compute(self, route: str, user_id, version: str, params: dict,
+                             compute: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await self._compute(compute)
+        key = cache_key(route, user_id, version, params)
+        lock_key = f'{key}:lock'
+        try:
+            entry = await self._read(key)
+            if entry is not None and time.time() - entry["computed_at"] < self.soft_ttl:
+                self._hits += 1
+                return entry["value"]
+
+            token = secrets.token_hex(8)
+            if await self.client.set(lock_key, token, nx=True, ex=self.lock_ttl):
+                self._misses += 1
+                try:
+                    return await self._refresh(key, compute)
+                finally:
+                    await self._release(lock_key, token)
+
+            if entry is not None:
+                self._stale_hits += 1
+                return entry["value"]
+
+            # Nothing to serve yet: wait for the worker holding the lock.
+            self._waits += 1
+            deadline = time.monotonic() + self.wait_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.poll_interval)
+                entry = await self._read(key)
+                if entry is not None:
+                    self._hits += 1
+                    return entry["value"]
+        except RedisError:
+            # Redis being down must not take the dashboards with it.
+            self._errors += 1
+        self._misses += 1
+        return await self._compute(compute)
+
+    async def user_data_version(self, user_id) -> str:
+        # Database-backed data has no file fingerprint; writers bump this counter instead.
+        try:
+            version = await self.client.get(f'analytics:data_version:{user_id}')
+        except RedisError:
+            return '0'
+        return (version.decode() if isinstance(version, bytes) else str(version)) if version else '0'
+
+    async def bump_user_data_version(self, user_id):
+        try:
+            await self.client.incr(f'analytics:data_version:{user_id}')
+        except RedisError:
+            self._errors += 1
+
+    def stats(self) -> dict:
+        served = self._hits + self._stale_hits + self._misses
+        return {
+            "hits": self._hits,
+            "stale_hits": self._stale_hits,
+            "misses": self._misses,
+            "waits": self._waits,
+            "errors": self._errors,
+            "hit_ratio": (self._hits + self._stale_hits) / served if served else 0.0,
+            "recomputes": self._recomputes,
+            "avg_recompute_seconds": self._recompute_seconds / self._recomputes if self._recomputes else 0.0,
+            "last_recompute_seconds": self._last_recompute_seconds
+        }
+
+
+result_cache = ResultCache()
@@ -0,0 +1,81 @@
+import glob
+import os
+import pandas as pd
+from pandas.core.frame import DataFrame
+from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import Tick
+
+DAY_NANOS = 24 * 3600 * 10**9
+
+def build_daily_rollup(df_full: DataFrame) -> DataFrame:
+    try:
+        day = df_full['order_purchase_timestamp'].dt.floor('D').rename('date')
+        grouped = df_full.groupby(day)
+        rollup = pd.DataFrame({
+            'revenue': grouped['revenue'].sum(),
+            'order_count': grouped['order_id'].nunique(),
+            'item_count': grouped.size()
+        })
+        return rollup.sort_index()
+    except Exception as e:
+        raise ValueError(f"Error building daily rollup: {e}")
+
+def serves_freq(freq: str) -> bool:
+    # Anchored offsets (W, M, Q, ...) and whole-day ticks bin on day boundaries,
+    # so they can be answered from daily totals. Intraday buckets cannot.
+    offset = to_offset(freq)
+    return not isinstance(offset, Tick) or offset.nanos % DAY_NANOS == 0
+
+# date_trunc units from coarsest to finest, with the pandas floor frequency for each.
+TRUNC_UNITS = [
+    ('day', 24 * 3600 * 10**9),
+    ('hour', 3600 * 10**9),
+    ('minute', 60 * 10**9),
+    ('second', 10**9)
+]
+FLOOR_FREQS = {'day': 'D', 'hour': 'h', 'minute': 'min', 'second': 's', 'microseconds': 'us'}
+
+def trunc_unit(freq: str) -> str:
+    # The coarsest date_trunc unit whose buckets nest exactly inside freq's buckets.
+    offset = to_offset(freq)
+    if not isinstance(offset, Tick):
+        return 'day'
+    for unit, nanos in TRUNC_UNITS:
+        if offset.nanos % nanos == 0:
+            return unit
+    return 'microseconds'
+
+def finest_unit(freqs: list[str]) -> str:
+    # One unit whose buckets nest inside every requested frequency's buckets.
+    units = list(FLOOR_FREQS)
+    return max((trunc_unit(freq) for freq in freqs), key=units.index)
+
+def rebucket(rollup: DataFrame, freq: str) -> DataFrame:
+    # resample uses the same bin edges as pd.Grouper on the raw timestamps.
+    return rollup.resample(freq).sum()
+
+def rollup_path(rollup_dir: str, version: str) -> str:
+    return os.path.join(rollup_dir, f'daily_rollup_{version}.parquet')
+
+def read_rollup(rollup_dir: str, version: str) -> DataFrame | None:
+    path = rollup_path(rollup_dir, version)
+    if not os.path.isfile(path):
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception:
+        return None
+
+def write_rollup(rollup: DataFrame, rollup_dir: str, version: str):
+    path = rollup_path(rollup_dir, version)
+    try:
+        os.makedirs(rollup_dir, exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        rollup.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+        for stale in glob.glob(os.path.join(rollup_dir, 'daily_rollup_*.parquet')):
+            if stale != path:
+                os.remove(stale)
+    except (OSError, ImportError):
+        # Persisting is an optimisation; the in-memory rollup is still served.
+        pass
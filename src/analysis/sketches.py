@@ -0,0 +1,145 @@
+import glob
+import os
+import numpy as np
+import pandas as pd
+
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+HASH_BITS = 64
+
+
+def bit_length(values: np.ndarray) -> np.ndarray:
+    # Exact for all 64 bits, unlike log2 on float64 which rounds above 2**53.
+    values = values.astype(np.uint64, copy=True)
+    lengths = np.zeros(len(values), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        upper = values >> np.uint64(shift)
+        has_upper = upper != 0
+        lengths[has_upper] += shift
+        values = np.where(has_upper, upper, values)
+    lengths += (values != 0).astype(np.uint8)
+    return lengths
+
+def hash_values(values: pd.Series) -> np.ndarray:
+    # Categoricals hash their categories once and broadcast through the codes.
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+def register_updates(hashes: np.ndarray, precision: int) -> tuple[np.ndarray, np.ndarray]:
+    index = (hashes >> np.uint64(HASH_BITS - precision)).astype(np.int64)
+    remainder = hashes & np.uint64((1 << (HASH_BITS - precision)) - 1)
+    rank = (HASH_BITS - precision) - bit_length(remainder).astype(np.int64) + 1
+    return index, rank.astype(np.uint8)
+
+def relative_error(precision: int) -> float:
+    return 1.04 / np.sqrt(1 << precision)
+
+def _alpha(m: int) -> float:
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / m)
+
+def estimate(registers: np.ndarray) -> float:
+    m = len(registers)
+    raw = _alpha(m) * m * m / np.sum(np.exp2(-registers.astype(np.float64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if raw <= 2.5 * m and zeros:
+        # Linear counting is more accurate while many registers are still empty.
+        return m * np.log(m / zeros)
+    return float(raw)
+
+def fold(registers: np.ndarray, precision: int, target: int) -> np.ndarray:
+    """Re-express a sketch at a lower precision, as if it had been built there."""
+    if target == precision:
+        return registers
+    dropped = precision - target
+    positions = np.arange(len(registers), dtype=np.uint64)
+    # The dropped index bits become the leading bits of the remainder.
+    low_bits = positions & np.uint64((1 << dropped) - 1)
+    ranks = np.where(
+        low_bits != 0,
+        dropped - bit_length(low_bits).astype(np.int64) + 1,
+        registers.astype(np.int64) + dropped
+    )
+    ranks[registers == 0] = 0
+    return ranks.reshape(1 << target, 1 << dropped).max(axis=1).astype(np.uint8)
+
+
+class DailySketches:
+    """Per-day HyperLogLog registers for distinct orders and customers.
+
+    Days are sorted; any range of days merges by a register-wise max, so the
+    memory for a range query is one sketch regardless of its length.
+    """
+
+    def __init__(self, days: pd.DatetimeIndex, orders: np.ndarray, customers: np.ndarray, precision: int):
+        self.days = days
+        self.orders = orders
+        self.customers = customers
+        self.precision = precision
+
+    def merged(self, lo: int, hi: int) -> tuple[np.ndarray, np.ndarray]:
+        m = 1 << self.precision
+        if hi <= lo:
+            return np.zeros(m, dtype=np.uint8), np.zeros(m, dtype=np.uint8)
+        return self.orders[lo:hi].max(axis=0), self.customers[lo:hi].max(axis=0)
+
+
+def _daily_registers(day_codes: np.ndarray, ids: pd.Series, n_days: int, precision: int) -> np.ndarray:
+    m = 1 << precision
+    registers = np.zeros((n_days, m), dtype=np.uint8)
+    known = ids.notna().to_numpy() & (day_codes >= 0)
+    if not known.any():
+        return registers
+    index, rank = register_updates(hash_values(ids[known]), precision)
+    cells = day_codes[known].astype(np.int64) * m + index
+    best = pd.Series(rank).groupby(cells).max()
+    registers.reshape(-1)[best.index.to_numpy()] = best.to_numpy()
+    return registers
+
+def build_daily_sketches(order_ids: pd.Series, customer_ids: pd.Series, timestamps: pd.Series,
+                         precision: int) -> DailySketches:
+    if not MIN_PRECISION <= precision <= MAX_PRECISION:
+        raise ValueError(f"HyperLogLog precision must be between {MIN_PRECISION} and {MAX_PRECISION}")
+    try:
+        day_codes, days = pd.factorize(pd.to_datetime(timestamps).dt.floor('D'), sort=True)
+        return DailySketches(
+            pd.DatetimeIndex(days, name='date'),
+            _daily_registers(day_codes, order_ids.reset_index(drop=True), len(days), precision),
+            _daily_registers(day_codes, customer_ids.reset_index(drop=True), len(days), precision),
+            precision
+        )
+    except Exception as e:
+        raise ValueError(f"Error building daily sketches: {e}")
+
+def sketches_path(sketch_dir: str, version: str, precision: int) -> str:
+    return os.path.join(sketch_dir, f'daily_sketches_{version}_p{precision}.npz')
+
+def read_sketches(sketch_dir: str, version: str, precision: int) -> DailySketches | None:
+    path = sketches_path(sketch_dir, version, precision)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with np.load(path) as stored:
+            return DailySketches(pd.DatetimeIndex(stored['days'], name='date'),
+                                 stored['orders'], stored['customers'], precision)
+    except (OSError, ValueError, KeyError):
+        return None
+
+def write_sketches(sketches: DailySketches, sketch_dir: str, version: str):
+    path = sketches_path(sketch_dir, version, sketches.precision)
+    try:
+        os.makedirs(sketch_dir, exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, days=sketches.days.to_numpy(), orders=sketches.orders, customers=sketches.customers)
+        os.replace(tmp_path, path)
+        for stale in glob.glob(os.path.join(sketch_dir, 'daily_sketches_*.npz')):
+            if stale != path:
+                os.remove(stale)
+    except OSError:
+        # Persisting is an optimisation; the in-memory sketches are still served.
+        pass
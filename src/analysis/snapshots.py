@@ -0,0 +1,157 @@
+import os
+import shutil
+import pandas as pd
+from pandas.core.frame import DataFrame
+
+try:
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+ORDERS_SNAPSHOT = 'orders.parquet'
+ORDER_ITEMS_SNAPSHOT = 'order_items.parquet'
+CUSTOMERS_SNAPSHOT = 'customers.parquet'
+SNAPSHOT_MAX_PARTS = int(os.getenv('ANALYSIS_SNAPSHOT_MAX_PARTS', '32'))
+
+# Columns the pipeline reads back; everything else stays on disk.
+ORDERS_COLUMNS = ['order_id', 'customer_id', 'order_purchase_timestamp', 'order_approved_at']
+ORDER_ITEMS_COLUMNS = ['order_id', 'revenue']
+CUSTOMERS_COLUMNS = ['customer_id']
+
+def snapshot_files(snapshot_path: str) -> list[str]:
+    return [
+        os.path.join(snapshot_path, ORDERS_SNAPSHOT),
+        os.path.join(snapshot_path, ORDER_ITEMS_SNAPSHOT),
+        os.path.join(snapshot_path, CUSTOMERS_SNAPSHOT)
+    ]
+
+def snapshots_available(snapshot_path: str) -> bool:
+    return HAS_PYARROW and all(os.path.isfile(path) for path in snapshot_files(snapshot_path))
+
+def parts_dir(snapshot_file: str) -> str:
+    # Batches appended since the snapshot was written, one Parquet file each (orders.parts/...).
+    return f'{os.path.splitext(snapshot_file)[0]}.parts'
+
+def snapshot_parts(snapshot_file: str) -> list[str]:
+    """The snapshot file followed by its appended parts, in append order."""
+    directory = parts_dir(snapshot_file)
+    if not os.path.isdir(directory):
+        return [snapshot_file]
+    parts = sorted(name for name in os.listdir(directory) if name.endswith('.parquet'))
+    return [snapshot_file, *(os.path.join(directory, name) for name in parts)]
+
+def read_snapshot(snapshot_file: str, columns: list[str] = None) -> DataFrame:
+    frames = [pd.read_parquet(path, columns=columns, memory_map=True) for path in snapshot_parts(snapshot_file)]
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+def _plain_schema(schema):
+    import pyarrow as pa
+    return pa.schema([pa.field(field.name, field.type.value_type) if pa.types.is_dictionary(field.type) else field
+                      for field in schema])
+
+def read_snapshot_rows(snapshot_file: str, column: str, values: list, columns: list[str] = None) -> DataFrame:
+    """Rows of the snapshot and its parts whose column holds one of values, in append order.
+
+    The filter is pushed down to the Parquet reader, so only matching rows are
+    materialised.
+    """
+    values = list(values)
+    if not values:
+        # pyarrow rejects an empty 'in' filter; nothing can match it anyway.
+        schema = _plain_schema(pq.read_schema(snapshot_file))
+        return schema.empty_table().select(columns or schema.names).to_pandas()
+    filters = [(column, 'in', values)]
+    frames = []
+    for path in snapshot_parts(snapshot_file):
+        table = pq.read_table(path, columns=columns, filters=filters)
+        # As categoricals, the few matching rows would carry the whole dictionary of the file.
+        frames.append(table.cast(_plain_schema(table.schema)).to_pandas())
+    return pd.concat(frames, ignore_index=True)
+
+def _write_parquet(df: DataFrame, path: str):
+    # Write next to the target and swap it in, so readers never see a partial file.
+    tmp_path = f'{path}.tmp'
+    df.to_parquet(tmp_path, engine='pyarrow', index=False)
+    os.replace(tmp_path, path)
+
+def _snapshot_frames(df_order_items: DataFrame = None, df_orders: DataFrame = None,
+                     df_customers: DataFrame = None) -> list[DataFrame | None]:
+    try:
+        if df_orders is not None:
+            df_orders = df_orders.copy()
+            for column in ['order_purchase_timestamp', 'order_approved_at']:
+                if column in df_orders.columns:
+                    df_orders[column] = pd.to_datetime(df_orders[column])
+        if df_order_items is not None:
+            df_order_items = df_order_items.copy()
+            df_order_items['revenue'] = df_order_items['price'] + df_order_items['shipping_charges']
+    except Exception as e:
+        raise ValueError(f"Cannot convert data to snapshots: {e}")
+    return [df_orders, df_order_items, df_customers]
+
+def write_snapshots(df_order_items: DataFrame, df_orders: DataFrame, df_customers: DataFrame,
+                    snapshot_path: str) -> list[str]:
+    if not HAS_PYARROW:
+        raise ImportError("pyarrow is required to write columnar snapshots")
+    frames = _snapshot_frames(df_order_items, df_orders, df_customers)
+
+    os.makedirs(snapshot_path, exist_ok=True)
+    files = snapshot_files(snapshot_path)
+    for frame, path in zip(frames, files):
+        _write_parquet(frame, path)
+        # The new snapshot already holds every appended batch.
+        shutil.rmtree(parts_dir(path), ignore_errors=True)
+    return files
+
+def next_part(snapshot_file: str) -> str:
+    # Numbered so a directory listing sorts in append order; callers serialise appends.
+    parts = snapshot_parts(snapshot_file)[1:]
+    number = int(os.path.basename(parts[-1])[5:-8]) + 1 if parts else 0
+    return os.path.join(parts_dir(snapshot_file), f'part-{number:06d}.parquet')
+
+def append_snapshots(df_order_items: DataFrame = None, df_orders: DataFrame = None, df_customers: DataFrame = None,
+                     snapshot_path: str = None) -> list[str]:
+    """Add a batch to the snapshots as one new part file per frame given.
+
+    Parts follow the snapshot's column types so every reader can concatenate
+    them. Past ANALYSIS_SNAPSHOT_MAX_PARTS parts a snapshot is folded back
+    into one file. Returns the snapshot files the batch touched.
+    """
+    import pyarrow as pa
+    touched = []
+    frames = _snapshot_frames(df_order_items, df_orders, df_customers)
+    for frame, path in zip(frames, snapshot_files(snapshot_path)):
+        if frame is None:
+            continue
+        try:
+            # The snapshot's dictionary index widths fit its own categories, not the batch's.
+            schema = _plain_schema(pq.read_schema(path))
+            table = pa.Table.from_pandas(frame.reindex(columns=schema.names), schema=schema, preserve_index=False)
+        except Exception as e:
+            raise ValueError(f"Cannot convert batch to the snapshot in {path}: {e}")
+        part = next_part(path)
+        os.makedirs(os.path.dirname(part), exist_ok=True)
+        tmp_path = f'{part}.tmp'
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, part)
+        if len(snapshot_parts(path)) > SNAPSHOT_MAX_PARTS:
+            compact_snapshot(path)
+        touched.append(path)
+    return touched
+
+def compact_snapshot(snapshot_file: str):
+    """Fold a snapshot's appended parts back into the snapshot file."""
+    parts = snapshot_parts(snapshot_file)
+    if len(parts) == 1:
+        return
+    _write_parquet(read_snapshot(snapshot_file), snapshot_file)
+    for path in parts[1:]:
+        os.remove(path)
+
+def read_snapshots(snapshot_path: str) -> tuple[DataFrame, DataFrame, DataFrame]:
+    orders_file, order_items_file, customers_file = snapshot_files(snapshot_path)
+    df_orders = read_snapshot(orders_file, ORDERS_COLUMNS)
+    df_order_items = read_snapshot(order_items_file, ORDER_ITEMS_COLUMNS)
+    df_customers = read_snapshot(customers_file, CUSTOMERS_COLUMNS)
+    return df_order_items, df_orders, df_customers
@@ -0,0 +1,175 @@
+from uuid import UUID
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func, distinct, literal_column
+from ..db.utils import readonly_session
+from ..db.db_schema import Customer, Order, OrderItem
+from .kpis import kpis_to_json
+from .pipeline import date_bounds, revenue_batch_table, revenue_all, revenue_series_tables, series_freqs
+from .rollup import trunc_unit, finest_unit
+from .result_cache import result_cache
+from .ranking import RANK_METRICS, encode_cursor, decode_cursor
+
+def _line_revenue():
+    return OrderItem.price * func.coalesce(OrderItem.quantity, 1)
+
+def _tenant(user_id) -> UUID:
+    return user_id if isinstance(user_id, UUID) else UUID(str(user_id))
+
+
+class SqlBackend:
+    name = 'sql'
+
+    def _attributed_items(self, user_id):
+        # Mirrors prepare_data: line items only get a customer and a purchase time
+        # through an order whose customer exists.
+        return (
+            select()
+            .select_from(OrderItem)
+            .join(Order, Order.id == OrderItem.order_id)
+            .join(Customer, Customer.id == Order.customer_id)
+            .where(OrderItem.user_id == user_id, Order.user_id == user_id, Customer.user_id == user_id)
+        )
+
+    async def data_version(self, user_id) -> str:
+        return await result_cache.user_data_version(user_id)
+
+    async def kpis(self, user_id) -> dict:
+        user_id = _tenant(user_id)
+        revenue = _line_revenue()
+        async with readonly_session() as session:
+            totals = (await session.execute(
+                select(func.count(distinct(OrderItem.order_id)), func.coalesce(func.sum(revenue), 0))
+                .where(OrderItem.user_id == user_id)
+            )).one()
+            per_customer = (await session.execute(
+                self._attributed_items(user_id)
+                .add_columns(Customer.id, func.sum(revenue), func.count(distinct(Order.id)))
+                .group_by(Customer.id)
+                # Byte order, to match pandas' sorted group keys.
+                .order_by(Customer.id.collate('C'))
+            )).all()
+
+        order_volume = int(totals[0])
+        total_revenue = float(totals[1])
+        customer_ids = [row[0] for row in per_customer]
+        return kpis_to_json({
+            "order_volume": order_volume,
+            "total_revenue": total_revenue,
+            "customer_spending": pd.DataFrame({
+                'customer_id': customer_ids,
+                'total_spent': np.array([float(row[1] or 0) for row in per_customer])
+            }),
+            "orders_per_customer": pd.DataFrame({
+                'customer_id': customer_ids,
+                'order_count': np.array([int(row[2]) for row in per_customer], dtype=np.int64)
+            }),
+            "avg_customer_order": total_revenue / order_volume if order_volume else 0
+        })
+
+    async def approximate_kpis(self, user_id, start_date: str = None, end_date: str = None,
+                               precision: int = None) -> dict:
+        # Postgres counts distinct values over an indexed range directly, so this
+        # backend answers exactly and reports zero error in the same shape.
+        bounds = date_bounds(start_date, end_date) if start_date and end_date else (None, None)
+        statement = self._attributed_items(_tenant(user_id)).add_columns(
+            func.count(distinct(Order.id)), func.count(distinct(Customer.id)),
+            func.coalesce(func.sum(_line_revenue()), 0)
+        ).where(Order.created_at.is_not(None))
+        if bounds[0] is not None:
+            statement = statement.where(Order.created_at >= bounds[0].to_pydatetime(),
+                                        Order.created_at < bounds[1].to_pydatetime())
+        async with readonly_session() as session:
+            order_volume, distinct_customers, total_revenue = (await session.execute(statement)).one()
+        total_revenue = float(total_revenue)
+        return {
+            "approximate": False,
+            "precision": None,
+            "relative_error": 0.0,
+            "order_volume": int(order_volume),
+            "distinct_customers": int(distinct_customers),
+            "order_volume_interval": [int(order_volume), int(order_volume)],
+            "distinct_customers_interval": [int(distinct_customers), int(distinct_customers)],
+            "total_revenue": total_revenue,
+            "avg_customer_order": total_revenue / order_volume if order_volume else 0
+        }
+
+    async def top_customers(self, user_id, by: str = 'spend', limit: int = 10, cursor: str = None) -> dict:
+        if by not in RANK_METRICS:
+            raise ValueError(f"Cannot rank customers by {by}")
+        version = await self.data_version(user_id)
+        offset = decode_cursor(cursor, version, by) if cursor else 0
+        user_id = _tenant(user_id)
+        total_spent = func.sum(_line_revenue()).label('total_spent')
+        order_count = func.count(distinct(Order.id)).label('order_count')
+        metric = total_spent if by == 'spend' else order_count
+        # The window runs after GROUP BY, so it counts ranked customers, not lines.
+        total_customers = func.count().over().label('total_customers')
+        async with readonly_session() as session:
+            # ORDER BY ... LIMIT lets Postgres keep a bounded top-N heap instead of sorting every customer.
+            rows = (await session.execute(
+                self._attributed_items(user_id)
+                .add_columns(Customer.id, total_spent, order_count, total_customers)
+                .group_by(Customer.id)
+                .order_by(metric.desc(), Customer.id.collate('C'))
+                .offset(offset)
+                .limit(limit + 1)
+            )).all()
+        page = rows[:limit]
+        next_offset = offset + len(page)
+        return {
+            "customers": {
+                "rank": list(range(offset + 1, next_offset + 1)),
+                "customer_id": [row[0] for row in page],
+                "total_spent": [float(row[1] or 0) for row in page],
+                "order_count": [int(row[2]) for row in page]
+            },
+            "total_customers": int(rows[0][3]) if rows else None,
+            "next_cursor": encode_cursor(version, by, next_offset) if len(rows) > limit else None
+        }
+
+    async def _bucket_totals(self, user_id, unit: str, start: pd.Timestamp = None,
+                             end: pd.Timestamp = None) -> pd.DataFrame:
+        # The unit is inlined (it comes from TRUNC_UNITS) so SELECT and GROUP BY
+        # compare as the same expression rather than two separate bind parameters.
+        bucket = func.date_trunc(literal_column(f"'{unit}'"), Order.created_at).label('bucket')
+        statement = (
+            self._attributed_items(_tenant(user_id))
+            .add_columns(bucket, func.sum(_line_revenue()))
+            .where(Order.created_at.is_not(None))
+        )
+        if start is not None:
+            statement = statement.where(Order.created_at >= start.to_pydatetime())
+        if end is not None:
+            statement = statement.where(Order.created_at < end.to_pydatetime())
+        statement = statement.group_by(bucket).order_by(bucket)
+        async with readonly_session() as session:
+            rows = (await session.execute(statement)).all()
+        return pd.DataFrame(
+            {'revenue': np.array([float(row[1] or 0) for row in rows])},
+            index=pd.DatetimeIndex([row[0] for row in rows], name='date')
+        )
+
+    async def revenue_batch(self, user_id, freq: str = 'W', offset: int = 0, limit: int = 10,
+                            start_date: str = None, end_date: str = None) -> dict:
+        try:
+            bounds = date_bounds(start_date, end_date) if start_date and end_date else (None, None)
+            buckets = await self._bucket_totals(user_id, trunc_unit(freq), *bounds)
+            return revenue_batch_table(buckets.index.to_numpy(), buckets['revenue'].to_numpy(),
+                                         freq, offset, limit)
+        except Exception as e:
+            raise ValueError(f"Error in revenue_batch: {e}")
+
+    async def revenue_series(self, user_id, freqs: list[str], start_date: str = None, end_date: str = None,
+                             cumulative: bool = False, moving_average: int = None) -> dict:
+        try:
+            freqs = series_freqs(freqs)
+            bounds = date_bounds(start_date, end_date) if start_date and end_date else (None, None)
+            buckets = await self._bucket_totals(user_id, finest_unit(freqs), *bounds)
+            return revenue_series_tables(buckets, freqs, cumulative, moving_average)
+        except Exception as e:
+            raise ValueError(f"Error in revenue_series: {e}")
+
+    async def revenue_all(self, user_id) -> dict:
+        buckets = await self._bucket_totals(user_id, 'day')
+        return revenue_all(rollup=buckets)
@@ -0,0 +1,108 @@
+from typing import Iterator
+import numpy as np
+import pandas as pd
+from pandas.core.frame import DataFrame
+from .snapshots import read_snapshot, snapshot_parts
+
+def _read_columns(path: str, columns: list[str]) -> DataFrame:
+    if path.endswith('.parquet'):
+        return read_snapshot(path, columns)
+    return pd.read_csv(path, usecols=columns)
+
+def _iter_order_items(path: str, chunk_size: int) -> Iterator[DataFrame]:
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for part in snapshot_parts(path):
+            for batch in pq.ParquetFile(part, memory_map=True).iter_batches(
+                    batch_size=chunk_size, columns=['order_id', 'revenue']):
+                yield batch.to_pandas()
+        return
+    for chunk in pd.read_csv(path, usecols=['order_id', 'price', 'shipping_charges'], chunksize=chunk_size):
+        chunk['revenue'] = chunk['price'] + chunk['shipping_charges']
+        yield chunk
+
+def build_order_lookup(orders_file: str, customers_file: str) -> dict:
+    customers = _read_columns(customers_file, ['customer_id'])['customer_id']
+    orders = _read_columns(orders_file, ['order_id', 'customer_id', 'order_purchase_timestamp'])
+    # Like prepare_data, the first row of a duplicated order wins; the index below needs unique ids.
+    orders = orders.drop_duplicates('order_id', keep='first')
+    # Same inner-join semantics as prepare_data: orders without a known customer drop out.
+    orders = orders.loc[orders['customer_id'].isin(customers)]
+    customer_codes, customer_ids = pd.factorize(orders['customer_id'], sort=True)
+    days = pd.to_datetime(orders['order_purchase_timestamp']).dt.floor('D')
+    day_codes, day_values = pd.factorize(days, sort=True)
+    return {
+        "order_index": pd.Index(orders['order_id']),
+        "customer_codes": customer_codes.astype(np.int32),
+        "customer_ids": customer_ids,
+        "day_codes": day_codes.astype(np.int32),
+        "days": day_values
+    }
+
+def stream_aggregates(orders_file: str, order_items_file: str, customers_file: str,
+                      chunk_size: int) -> tuple[dict, DataFrame, DataFrame]:
+    try:
+        lookup = build_order_lookup(orders_file, customers_file)
+        order_index = lookup["order_index"]
+        customer_codes = lookup["customer_codes"]
+        day_codes = lookup["day_codes"]
+        n_customers = len(lookup["customer_ids"])
+        n_days = len(lookup["days"])
+
+        seen_orders = np.zeros(len(order_index), dtype=bool)
+        unmatched_orders = set()
+        total_revenue = 0.0
+        customer_spend = np.zeros(n_customers)
+        customer_items = np.zeros(n_customers, dtype=np.int64)
+        day_revenue = np.zeros(n_days)
+        day_items = np.zeros(n_days, dtype=np.int64)
+
+        for chunk in _iter_order_items(order_items_file, chunk_size):
+            revenue = chunk['revenue'].to_numpy(dtype=np.float64)
+            positions = order_index.get_indexer(chunk['order_id'])
+            known = positions >= 0
+            total_revenue += chunk['revenue'].sum()
+            if not known.all():
+                unmatched_orders.update(chunk['order_id'][~known].dropna())
+
+            positions = positions[known]
+            revenue = revenue[known]
+            seen_orders[positions] = True
+            customers = customer_codes[positions]
+            customer_spend += np.bincount(customers, weights=revenue, minlength=n_customers)
+            customer_items += np.bincount(customers, minlength=n_customers)
+            days = day_codes[positions]
+            dated = days >= 0
+            day_revenue += np.bincount(days[dated], weights=revenue[dated], minlength=n_days)
+            day_items += np.bincount(days[dated], minlength=n_days)
+
+        order_volume = int(seen_orders.sum()) + len(unmatched_orders)
+        customer_orders = np.bincount(customer_codes[seen_orders], minlength=n_customers)
+        active = customer_items > 0
+        customer_ids = lookup["customer_ids"][active]
+        kpis = {
+            "order_volume": order_volume,
+            "total_revenue": total_revenue,
+            "customer_spending": pd.DataFrame({'customer_id': customer_ids, 'total_spent': customer_spend[active]}),
+            "orders_per_customer": pd.DataFrame({'customer_id': customer_ids, 'order_count': customer_orders[active]}),
+            "avg_customer_order": total_revenue / order_volume if order_volume else 0
+        }
+
+        seen_days = day_codes[seen_orders]
+        active_days = day_items > 0
+        rollup = pd.DataFrame({
+            'revenue': day_revenue[active_days],
+            'order_count': np.bincount(seen_days[seen_days >= 0], minlength=n_days)[active_days],
+            'item_count': day_items[active_days]
+        }, index=pd.DatetimeIndex(lookup["days"][active_days], name='date'))
+
+        # Orders that had items, one row each: enough for distinct-count sketches.
+        order_days = day_codes[seen_orders]
+        orders = pd.DataFrame({
+            'order_id': order_index[seen_orders],
+            'customer_id': lookup["customer_ids"][customer_codes[seen_orders]],
+            'order_purchase_timestamp': pd.DatetimeIndex(lookup["days"]).take(order_days, allow_fill=True, fill_value=pd.NaT)
+        })
+        return kpis, rollup, orders
+    except Exception as e:
+        raise ValueError(f"Error streaming order items: {e}")
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import Tick
+from pandas.errors import OutOfBoundsDatetime, OutOfBoundsTimedelta
+
+ONE_DAY = pd.Timedelta(days=1)
+OUT_OF_RANGE = (OverflowError, OutOfBoundsDatetime, OutOfBoundsTimedelta)
+
+def valid_length(timestamps: np.ndarray) -> int:
+    # Frames are sorted with NaT last, and NaT sorts after every timestamp.
+    return int(np.searchsorted(timestamps, np.datetime64('NaT'), side='left'))
+
+def slice_bounds(timestamps: np.ndarray, start: pd.Timestamp = None, end: pd.Timestamp = None) -> tuple[int, int]:
+    lo = 0 if start is None else int(np.searchsorted(timestamps, start.to_datetime64(), side='left'))
+    hi = valid_length(timestamps) if end is None else int(np.searchsorted(timestamps, end.to_datetime64(), side='left'))
+    return lo, max(lo, hi)
+
+def _first_label(timestamp: pd.Timestamp, freq: str) -> pd.Timestamp:
+    return pd.Series([0.0], index=pd.DatetimeIndex([timestamp])).resample(freq).sum().index[0]
+
+def window_buckets(timestamps: np.ndarray, values: np.ndarray, freq: str,
+                   offset: int, limit: int) -> pd.Series:
+    """Sum values into freq buckets, computing only buckets offset..offset+limit.
+
+    timestamps must be sorted and free of NaT. Bucket labels and edges match
+    pd.Grouper(freq=freq) over the same rows, so the result equals
+    grouping everything and taking .iloc[offset:offset+limit].
+    """
+    empty = pd.Series([], index=pd.DatetimeIndex([]), dtype='float64')
+    if len(timestamps) == 0 or limit <= 0:
+        return empty
+
+    step = to_offset(freq)
+    closed_right = pd.Grouper(freq=freq).closed == 'right'
+    first_label = _first_label(pd.Timestamp(timestamps[0]), freq)
+    last = pd.Timestamp(timestamps[-1])
+
+    # Offsets past the representable range are necessarily past the data as well.
+    try:
+        window_start = first_label + step * offset
+    except OUT_OF_RANGE:
+        return empty
+    try:
+        labels = pd.date_range(window_start, periods=limit, freq=step)
+    except OUT_OF_RANGE:
+        labels = pd.date_range(window_start, end=last + step, freq=step)[:limit]
+    if closed_right:
+        # Right-closed calendar bins (W, M, Q, Y) cover whole days up to and including the label.
+        starts = (labels - step) + ONE_DAY
+        ends = labels + ONE_DAY
+    else:
+        starts = labels
+        ends = labels + step
+    in_range = starts <= last
+    labels, starts, ends = labels[in_range], starts[in_range], ends[in_range]
+    if len(labels) == 0:
+        return empty
+
+    lo, hi = slice_bounds(timestamps, starts[0], ends[-1])
+    window = pd.Series(values[lo:hi], index=pd.DatetimeIndex(timestamps[lo:hi]))
+    if isinstance(step, Tick):
+        # Tick bins are anchored on the data's first bucket, not on the slice.
+        return window.resample(freq, origin=first_label).sum().reindex(labels, fill_value=0.0)
+
+    # Multi-period calendar bins (2W, 3M) take their phase from the first row of
+    # the whole series, so sum single periods and fold them n at a time.
+    base = step.base
+    first_base = labels[0] - base * (step.n - 1) if closed_right else labels[0]
+    base_labels = pd.date_range(first_base, periods=len(labels) * step.n, freq=base)
+    base_sums = window.resample(base).sum().reindex(base_labels, fill_value=0.0)
+    folded = base_sums.to_numpy().reshape(len(labels), step.n).sum(axis=1)
+    return pd.Series(folded, index=labels)
@@ -0,0 +1,75 @@
+import os
+from typing import Iterable
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.metrics import DB_QUERY_SECONDS
+
+# Staged rows merged into the target table per INSERT ... ON CONFLICT statement.
+BULK_BATCH_SIZE = int(os.getenv('DB_BULK_BATCH_SIZE', '50000'))
+SEQUENCE_COLUMN = '_bulk_seq'
+
+
+def staging_name(model) -> str:
+    return f'bulk_staging_{model.__tablename__}'
+
+def model_columns(model) -> list[str]:
+    return [column.name for column in model.__table__.columns]
+
+def staging_ddl(model) -> list[str]:
+    staging = staging_name(model)
+    # LIKE copies column types and NOT NULLs but no keys, so duplicates can land in staging.
+    return [
+        f'DROP TABLE IF EXISTS {staging}',
+        f'CREATE TEMP TABLE {staging} (LIKE {model.__tablename__}) ON COMMIT DROP',
+        f'ALTER TABLE {staging} ADD COLUMN {SEQUENCE_COLUMN} bigint NOT NULL'
+    ]
+
+def merge_sql(model, columns: list[str] = None) -> str:
+    """Upsert one _bulk_seq range of the staging table into the model's table.
+
+    DISTINCT ON keeps the last staged copy of each key, since one INSERT
+    ... ON CONFLICT cannot update the same row twice.
+    """
+    columns = columns or model_columns(model)
+    keys = [column.name for column in model.__table__.primary_key]
+    column_list = ', '.join(columns)
+    key_list = ', '.join(keys)
+    updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns if column not in keys)
+    return (
+        f'INSERT INTO {model.__tablename__} ({column_list}) '
+        f'SELECT DISTINCT ON ({key_list}) {column_list} FROM {staging_name(model)} '
+        f'WHERE {SEQUENCE_COLUMN} >= :low AND {SEQUENCE_COLUMN} < :high '
+        f'ORDER BY {key_list}, {SEQUENCE_COLUMN} DESC '
+        f'ON CONFLICT ({key_list}) DO UPDATE SET {updates}'
+    )
+
+def staged_records(rows: Iterable[dict], columns: list[str], counter: list) -> Iterable[tuple]:
+    # Numbered as they stream past, so the rows themselves are never held in memory.
+    for sequence, row in enumerate(rows):
+        counter[0] = sequence + 1
+        yield (*(row.get(column) for column in columns), sequence)
+
+async def bulk_upsert(session: AsyncSession, model, rows: Iterable[dict], batch_size: int = BULK_BATCH_SIZE) -> int:
+    """Upsert rows into model's table via a binary COPY into a temporary staging table.
+
+    Runs inside the session's transaction; the caller commits. Columns a row
+    leaves out are written as NULL. Returns the number of rows staged.
+    """
+    columns = model_columns(model)
+    try:
+        for statement in staging_ddl(model):
+            await session.execute(text(statement))
+        connection = await session.connection()
+        raw = await connection.get_raw_connection()
+        counter = [0]
+        with DB_QUERY_SECONDS.time(operation='COPY'):
+            await raw.driver_connection.copy_records_to_table(
+                staging_name(model), records=staged_records(rows, columns, counter),
+                columns=[*columns, SEQUENCE_COLUMN]
+            )
+        merge = text(merge_sql(model, columns))
+        for low in range(0, counter[0], batch_size):
+            await session.execute(merge, {'low': low, 'high': low + batch_size})
+    except Exception as e:
+        raise ValueError(f"Bulk upsert into {model.__tablename__} failed: {e}")
+    return counter[0]
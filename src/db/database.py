@@ -1,11 +1,12 @@
 import os
+import time
 from dotenv import load_dotenv
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy_utils import database_exists
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
-from sqlalchemy import create_engine
+from src.metrics import DB_QUERY_SECONDS, DB_SESSION_SECONDS
 
 load_dotenv()
 
@@ -33,10 +34,32 @@ validate_database_exists()
 engine = create_async_engine(ASYNC_DATABASE_URL, echo=False)
 SessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+QUERY_OPERATIONS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'COPY'}
+
+def query_operation(statement: str) -> str:
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement and statement.strip() else ''
+    return operation if operation in QUERY_OPERATIONS else 'OTHER'
+
+@event.listens_for(engine.sync_engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(engine.sync_engine, 'after_cursor_execute')
+def _record_query_time(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    DB_QUERY_SECONDS.observe(time.perf_counter() - started, operation=query_operation(statement))
+
+@event.listens_for(engine.sync_engine, 'handle_error')
+def _drop_query_timer(exception_context):
+    if exception_context.connection is not None and exception_context.connection.info.get('query_started'):
+        exception_context.connection.info['query_started'].pop()
+
 @asynccontextmanager
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
+    started = time.perf_counter()
     async with SessionLocal() as session:
         try:
             yield session
         finally:
             await session.close()
+            DB_SESSION_SECONDS.observe(time.perf_counter() - started)
@@ -1,5 +1,8 @@
 from .base import Base
 from .userModel import User
 from .integrations import Integrations
+from .customerModel import Customer
+from .orderModel import Order, OrderItem
+from .productModel import Product, Variant
 
-__all__ = ["Base", "User","Integrations"]
\ No newline at end of file
+__all__ = ["Base", "User","Integrations","Customer","Order","OrderItem","Product","Variant"]
\ No newline at end of file
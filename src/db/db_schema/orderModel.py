@@ -1,14 +1,15 @@
 from .base import Base
-from sqlalchemy import Column, String, Integer, DECIMAL, TIMESTAMP, ForeignKey
+from sqlalchemy import Column, String, Integer, DECIMAL, TIMESTAMP, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (Index("ix_orders_user_id_created_at", "user_id", "created_at"),)
     
     id = Column(String, primary_key=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     platform = Column(String, nullable=False)
-    customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id"))
+    customer_id = Column(String, ForeignKey("customers.id"))
     email = Column(String)
     financial_status = Column(String)
     fulfillment_status = Column(String)
@@ -20,12 +21,13 @@ class Order(Base):
 
 class OrderItem(Base):
     __tablename__ = "order_items"
+    __table_args__ = (Index("ix_order_items_user_id_order_id", "user_id", "order_id"),)
 
     id = Column(String, nullable=False,primary_key=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    order_id = Column(UUID(as_uuid=True), ForeignKey("orders.id"))
-    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id"))
-    variant_id = Column(UUID(as_uuid=True), ForeignKey("variants.id"))
+    order_id = Column(String, ForeignKey("orders.id"))
+    product_id = Column(String, ForeignKey("products.id"))
+    variant_id = Column(String, ForeignKey("variants.id"))
     quantity = Column(Integer)
     price = Column(DECIMAL(10, 2))
     title = Column(String)
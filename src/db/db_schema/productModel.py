@@ -21,7 +21,7 @@ class Variant(Base):
     __tablename__ = "variants"
 
     id = Column(String, nullable=False,primary_key=True)
-    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id"))
+    product_id = Column(String, ForeignKey("products.id"))
     platform = Column(String, nullable=False)
     title = Column(String)
     sku = Column(String)
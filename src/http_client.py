@@ -0,0 +1,48 @@
+import asyncio
+import os
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+# One client for every outbound integration call, so connections (and their
+# TLS sessions) are reused across requests. httpx keeps a pool per origin;
+# these limits apply across all of them.
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', '100'))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('HTTP_MAX_KEEPALIVE_CONNECTIONS', '20'))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '60'))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '30'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+# HTTP/2 multiplexes concurrent requests to one shop over a single connection; needs the h2 package.
+HTTP2_ENABLED = os.getenv('HTTP2_ENABLED', '1') == '1' and HAS_H2
+
+_client = None
+_client_loop = None
+
+def build_client(**options) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=HTTP2_ENABLED,
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        **options
+    )
+
+def http_client() -> httpx.AsyncClient:
+    # Opened by the app's lifespan; scripts outside the app get one on first use.
+    # Pooled connections belong to the event loop that opened them, so a new loop gets a new client.
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client, _client_loop = build_client(), loop
+    return _client
+
+async def close_http_client():
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+        _client, _client_loop = None, None
@@ -18,6 +18,7 @@ from ..db.db_schema import Integrations
 from ..db.utils import writable_session
 from .utils import generate_code_challenge,generate_code_verifier
 from src.redis_client import add_key_value_redis, get_value_redis, delete_key_redis
+from src.http_client import http_client
 
 CLIENT_ID=os.getenv("SHOPIFY_CLIENT_ID")
 CLIENT_SECRET=os.getenv("SHOPIFY_CLIENT_SECRET")
@@ -123,20 +124,19 @@ async def shopify_callback(request: Request, session: AsyncSession = Depends(wri
         raise HTTPException(status_code=401, detail="Invalid state - possible CSRF attack")
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f'https://{shop}.myshopify.com/admin/oauth/access_token',
-                json={
-                    'grant_type' : 'authorization_code',
-                    'code': code,
-                    'redirect_uri' : REDIRECT_URI,
-                    'client_id': CLIENT_ID,
-                    'code_verifier': code_verifier,
-                },
-                timeout=10.0
-            )
-            response.raise_for_status()
-            token_data = response.json()
+        response = await http_client().post(
+            f'https://{shop}.myshopify.com/admin/oauth/access_token',
+            json={
+                'grant_type' : 'authorization_code',
+                'code': code,
+                'redirect_uri' : REDIRECT_URI,
+                'client_id': CLIENT_ID,
+                'code_verifier': code_verifier,
+            },
+            timeout=10.0
+        )
+        response.raise_for_status()
+        token_data = response.json()
     except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="Timeout while connecting to Shopify")
     except httpx.HTTPStatusError as e:
@@ -0,0 +1,463 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import AsyncIterator, Awaitable, Callable
+import httpx
+from sqlalchemy import or_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.bulk import bulk_upsert
+from ..db.db_schema import Customer, Integrations, Order, OrderItem, Product, Variant
+from ..analysis.result_cache import result_cache
+from ..metrics import SHOPIFY_SYNC_RECORDS, SHOPIFY_SYNC_SECONDS, SHOPIFY_SYNC_RECORDS_PER_SECOND, SHOPIFY_THROTTLED
+from ..http_client import http_client
+from .throttle import CostLimiter, MAX_RETRIES, backoff_delay
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+SHOPIFY_API_VERSION = os.getenv('SHOPIFY_API_VERSION', '2024-10')
+# Rows buffered across all tables before they are written and committed.
+SYNC_BATCH_SIZE = int(os.getenv('SHOPIFY_SYNC_BATCH_SIZE', '5000'))
+# Batches go through asyncpg's binary COPY; '0' falls back to multi-row INSERT ... ON CONFLICT.
+SYNC_BULK_COPY = os.getenv('SHOPIFY_SYNC_BULK_COPY', '1') == '1'
+BULK_POLL_SECONDS = float(os.getenv('SHOPIFY_BULK_POLL_SECONDS', '2'))
+BULK_TIMEOUT_SECONDS = float(os.getenv('SHOPIFY_BULK_TIMEOUT_SECONDS', '3600'))
+# Export storage can pause mid-stream for a while on large files.
+BULK_DOWNLOAD_TIMEOUT = httpx.Timeout(30.0, read=300.0)
+# Incremental syncs page through the regular connections instead of a bulk export.
+# SYNC_PAGE_SIZE is an upper bound: pages shrink so each query stays under MAX_QUERY_COST.
+SYNC_PAGE_SIZE = int(os.getenv('SHOPIFY_SYNC_PAGE_SIZE', '250'))
+# Children fetched with each parent; the rest are paged per parent.
+CHILD_PAGE_SIZE = int(os.getenv('SHOPIFY_SYNC_CHILD_PAGE_SIZE', '10'))
+# Shopify rejects any single query whose requested cost is above this, whatever the bucket holds.
+MAX_QUERY_COST = int(os.getenv('SHOPIFY_MAX_QUERY_COST', '1000'))
+MAX_CONNECTION_SIZE = 250
+# The next sync starts this far before the last one did, so clock skew
+# between us and Shopify cannot drop an update.
+SYNC_OVERLAP_SECONDS = int(os.getenv('SHOPIFY_SYNC_OVERLAP_SECONDS', '300'))
+PLATFORM = 'shopify'
+
+CUSTOMER_FIELDS = "id email firstName lastName numberOfOrders amountSpent { amount } createdAt updatedAt"
+PRODUCT_FIELDS = "id title description vendor productType createdAt updatedAt"
+VARIANT_FIELDS = "id title sku price inventoryQuantity"
+ORDER_FIELDS = ("id email displayFinancialStatus displayFulfillmentStatus currencyCode createdAt updatedAt "
+                "totalPriceSet { shopMoney { amount } } customer { id }")
+LINE_ITEM_FIELDS = ("id quantity title sku originalUnitPriceSet { shopMoney { amount } } "
+                    "product { id } variant { id }")
+# Top-level connections in foreign-key order, each with its nested child connection.
+RESOURCES = {
+    'customers': (CUSTOMER_FIELDS, None),
+    'products': (PRODUCT_FIELDS, ('variants', VARIANT_FIELDS)),
+    'orders': (ORDER_FIELDS, ('lineItems', LINE_ITEM_FIELDS))
+}
+NODE_TYPES = {'customers': 'Customer', 'products': 'Product', 'orders': 'Order'}
+# Parents are written before children when a batch is flushed.
+WRITE_ORDER = [Customer, Product, Variant, Order, OrderItem]
+
+RUN_BULK_QUERY = """mutation($query: String!) {
+    bulkOperationRunQuery(query: $query) { bulkOperation { id status } userErrors { field message } }
+}"""
+BULK_OPERATION_STATUS = """query($id: ID!) {
+    node(id: $id) { ... on BulkOperation { id status errorCode objectCount url } }
+}"""
+
+Writer = Callable[[type, list[dict]], Awaitable[None]]
+# Called once a batch is written, with the newest updatedAt it completes (None when it completes none).
+Checkpoint = Callable[[datetime | None], Awaitable[None]]
+
+
+def bulk_query(resource: str, search: str = None) -> str:
+    fields, child = RESOURCES[resource]
+    nested = f" {child[0]} {{ edges {{ node {{ {child[1]} }} }} }}" if child else ''
+    arguments = f"(query: {json.dumps(search)})" if search else ''
+    return f"{{ {resource}{arguments} {{ edges {{ node {{ {fields}{nested} }} }} }} }}"
+
+def _node_cost(fields: str) -> int:
+    # Shopify charges a point per object: the node itself and every nested selection in it.
+    return 1 + fields.count('{')
+
+def _connection_cost(first: int, node_cost: int) -> int:
+    # Two points for the connection and one for its pageInfo, plus every node it may return.
+    return 3 + first * node_cost
+
+def nested_page_size(resource: str) -> int:
+    """Children fetched with each parent, at most CHILD_PAGE_SIZE and few enough for a one-parent page."""
+    fields, child = RESOURCES[resource]
+    fits = (MAX_QUERY_COST - 2 * _connection_cost(0, 0) - _node_cost(fields)) // _node_cost(child[1])
+    return max(1, min(CHILD_PAGE_SIZE, MAX_CONNECTION_SIZE, fits))
+
+def _parent_cost(resource: str) -> int:
+    fields, child = RESOURCES[resource]
+    return _node_cost(fields) + (_connection_cost(nested_page_size(resource), _node_cost(child[1])) if child else 0)
+
+def page_size(resource: str) -> int:
+    """Parents per page, so that a page with all its nested children stays under MAX_QUERY_COST."""
+    fits = (MAX_QUERY_COST - _connection_cost(0, 0)) // _parent_cost(resource)
+    return max(1, min(SYNC_PAGE_SIZE, MAX_CONNECTION_SIZE, fits))
+
+def child_page_size(resource: str) -> int:
+    child = RESOURCES[resource][1]
+    fits = (MAX_QUERY_COST - 1 - _connection_cost(0, 0)) // _node_cost(child[1])
+    return max(1, min(MAX_CONNECTION_SIZE, fits))
+
+def page_query(resource: str) -> str:
+    fields, child = RESOURCES[resource]
+    nested = (f" {child[0]}(first: {nested_page_size(resource)}) {{ pageInfo {{ hasNextPage endCursor }} "
+              f"edges {{ node {{ {child[1]} }} }} }}") if child else ''
+    return f"""query($first: Int!, $after: String, $query: String) {{
+    {resource}(first: $first, after: $after, query: $query, sortKey: UPDATED_AT) {{
+        pageInfo {{ hasNextPage endCursor }}
+        edges {{ node {{ {fields}{nested} }} }}
+    }}
+}}"""
+
+def child_query(resource: str) -> str:
+    """The children of one parent past those its page carried."""
+    child = RESOURCES[resource][1]
+    return f"""query($id: ID!, $first: Int!, $after: String) {{
+    node(id: $id) {{ ... on {NODE_TYPES[resource]} {{
+        {child[0]}(first: $first, after: $after) {{
+            pageInfo {{ hasNextPage endCursor }}
+            edges {{ node {{ {child[1]} }} }}
+        }}
+    }} }}
+}}"""
+
+def updated_since(watermark: datetime) -> str:
+    return f"updated_at:>'{watermark.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}'"
+
+def graphql_url(shop: str) -> str:
+    host = shop if '.' in shop else f'{shop}.myshopify.com'
+    return f'https://{host}/admin/api/{SHOPIFY_API_VERSION}/graphql.json'
+
+def legacy_id(gid: str | None) -> str | None:
+    # gid://shopify/Order/450789469 -> 450789469
+    return gid.rsplit('/', 1)[-1] if gid else None
+
+def gid_type(gid: str) -> str:
+    return gid.split('/')[3]
+
+def _timestamp(value: str | None) -> datetime | None:
+    # The tables hold naive UTC timestamps.
+    if not value:
+        return None
+    return datetime.fromisoformat(value).astimezone(timezone.utc).replace(tzinfo=None)
+
+def _updated_at(record: dict) -> datetime | None:
+    value = record.get('updatedAt')
+    return datetime.fromisoformat(value).astimezone(timezone.utc) if value else None
+
+def _latest(*values: datetime | None) -> datetime | None:
+    present = [value for value in values if value is not None]
+    return max(present) if present else None
+
+def _money(value) -> Decimal | None:
+    if isinstance(value, dict):
+        value = (value.get('shopMoney') or value).get('amount')
+    return None if value is None else Decimal(str(value))
+
+def _customer(record: dict, user_id) -> dict:
+    return {
+        'id': legacy_id(record['id']), 'user_id': user_id, 'platform': PLATFORM,
+        'email': record.get('email'), 'first_name': record.get('firstName'), 'last_name': record.get('lastName'),
+        'orders_count': int(record['numberOfOrders']) if record.get('numberOfOrders') is not None else None,
+        'total_spent': _money(record.get('amountSpent')),
+        'created_at': _timestamp(record.get('createdAt')), 'updated_at': _timestamp(record.get('updatedAt'))
+    }
+
+def _product(record: dict, user_id) -> dict:
+    return {
+        'id': legacy_id(record['id']), 'user_id': user_id, 'platform': PLATFORM,
+        'title': record.get('title'), 'description': record.get('description'), 'vendor': record.get('vendor'),
+        'product_type': record.get('productType'),
+        'created_at': _timestamp(record.get('createdAt')), 'updated_at': _timestamp(record.get('updatedAt'))
+    }
+
+def _variant(record: dict, user_id) -> dict:
+    return {
+        'id': legacy_id(record['id']), 'product_id': legacy_id(record.get('__parentId')), 'platform': PLATFORM,
+        'title': record.get('title'), 'sku': record.get('sku'), 'price': _money(record.get('price')),
+        'inventory_quantity': record.get('inventoryQuantity')
+    }
+
+def _order(record: dict, user_id) -> dict:
+    return {
+        'id': legacy_id(record['id']), 'user_id': user_id, 'platform': PLATFORM,
+        'customer_id': legacy_id((record.get('customer') or {}).get('id')), 'email': record.get('email'),
+        'financial_status': record.get('displayFinancialStatus'),
+        'fulfillment_status': record.get('displayFulfillmentStatus'),
+        'total_price': _money(record.get('totalPriceSet')), 'currency': record.get('currencyCode'),
+        'created_at': _timestamp(record.get('createdAt')), 'updated_at': _timestamp(record.get('updatedAt'))
+    }
+
+def _order_item(record: dict, user_id) -> dict:
+    return {
+        'id': legacy_id(record['id']), 'user_id': user_id, 'platform': PLATFORM,
+        'order_id': legacy_id(record.get('__parentId')),
+        'product_id': legacy_id((record.get('product') or {}).get('id')),
+        'variant_id': legacy_id((record.get('variant') or {}).get('id')),
+        'quantity': record.get('quantity'), 'price': _money(record.get('originalUnitPriceSet')),
+        'title': record.get('title'), 'sku': record.get('sku')
+    }
+
+MAPPERS = {
+    'Customer': (Customer, _customer),
+    'Product': (Product, _product),
+    'ProductVariant': (Variant, _variant),
+    'Order': (Order, _order),
+    'LineItem': (OrderItem, _order_item)
+}
+
+def map_record(record: dict, user_id) -> tuple[type, dict] | None:
+    mapper = MAPPERS.get(gid_type(record['id']))
+    if mapper is None:
+        return None
+    model, to_row = mapper
+    return model, to_row(record, user_id)
+
+
+def _throttled(payload: dict) -> bool:
+    return any((error.get('extensions') or {}).get('code') == 'THROTTLED' for error in payload.get('errors') or [])
+
+async def graphql(client: httpx.AsyncClient, endpoint: str, access_token: str, query: str,
+                  variables: dict = None, limiter: CostLimiter = None) -> dict:
+    """One Admin API call, paced by the shop's limiter and retried with backoff while throttled."""
+    for attempt in range(MAX_RETRIES + 1):
+        if limiter is not None:
+            await limiter.acquire(limiter.expected_cost(query))
+        try:
+            response = await client.post(endpoint, json={'query': query, 'variables': variables or {}},
+                                         headers={'X-Shopify-Access-Token': access_token})
+            if response.status_code == 429:
+                payload = None
+            else:
+                response.raise_for_status()
+                payload = response.json()
+        except httpx.HTTPError as e:
+            raise ValueError(f"Shopify API error: {e}")
+        if limiter is not None:
+            limiter.observe(query, (payload or {}).get('extensions', {}).get('cost'),
+                            response.headers.get('X-Shopify-Shop-Api-Call-Limit'))
+        if payload is not None and not _throttled(payload):
+            break
+        SHOPIFY_THROTTLED.inc(endpoint=endpoint)
+        if limiter is not None and payload is None:
+            limiter.drain()
+        if attempt == MAX_RETRIES:
+            raise ValueError(f"Shopify API still throttled after {MAX_RETRIES} retries")
+        await asyncio.sleep(backoff_delay(attempt, response.headers.get('Retry-After')))
+    if payload.get('errors'):
+        raise ValueError(f"Shopify API error: {payload['errors']}")
+    return payload['data']
+
+async def run_bulk_query(client: httpx.AsyncClient, endpoint: str, access_token: str, query: str,
+                         limiter: CostLimiter = None) -> str | None:
+    """Start a bulk export and wait for it; returns the JSONL URL, or None when nothing matched."""
+    started = await graphql(client, endpoint, access_token, RUN_BULK_QUERY, {'query': query}, limiter)
+    result = started['bulkOperationRunQuery']
+    if result['userErrors']:
+        raise ValueError(f"Cannot start Shopify bulk operation: {result['userErrors']}")
+    operation_id = result['bulkOperation']['id']
+
+    deadline = asyncio.get_running_loop().time() + BULK_TIMEOUT_SECONDS
+    while True:
+        operation = (await graphql(client, endpoint, access_token, BULK_OPERATION_STATUS, {'id': operation_id},
+                                   limiter))['node']
+        if operation['status'] == 'COMPLETED':
+            return operation.get('url')
+        if operation['status'] in ('FAILED', 'CANCELED', 'EXPIRED'):
+            raise ValueError(f"Shopify bulk operation {operation_id} {operation['status'].lower()}: "
+                             f"{operation.get('errorCode')}")
+        if asyncio.get_running_loop().time() > deadline:
+            raise ValueError(f"Shopify bulk operation {operation_id} did not finish in {BULK_TIMEOUT_SECONDS}s")
+        await asyncio.sleep(BULK_POLL_SECONDS)
+
+async def iter_jsonl(client: httpx.AsyncClient, url: str) -> AsyncIterator[dict]:
+    # The export can run to gigabytes, so it is parsed as it arrives rather than downloaded first.
+    try:
+        async with client.stream('GET', url, timeout=BULK_DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.strip():
+                    yield loads(line)
+    except httpx.HTTPError as e:
+        raise ValueError(f"Cannot download Shopify bulk export: {e}")
+
+async def iter_pages(client: httpx.AsyncClient, endpoint: str, access_token: str, resource: str,
+                     search: str = None, limiter: CostLimiter = None) -> AsyncIterator[dict]:
+    """Records of one connection, page by page, flattened like bulk export lines."""
+    query = page_query(resource)
+    child = RESOURCES[resource][1]
+    cursor = None
+    while True:
+        data = await graphql(client, endpoint, access_token, query,
+                             {'first': page_size(resource), 'after': cursor, 'query': search}, limiter)
+        connection = data[resource]
+        for edge in connection['edges']:
+            node = edge['node']
+            children = node.pop(child[0], None) if child else None
+            yield node
+            while children:
+                for child_edge in children['edges']:
+                    yield {**child_edge['node'], '__parentId': node['id']}
+                if not children['pageInfo']['hasNextPage']:
+                    break
+                # Still before the next parent, so ingest sees every child of a parent before moving on.
+                children = (await graphql(client, endpoint, access_token, child_query(resource),
+                                          {'id': node['id'], 'first': child_page_size(resource),
+                                           'after': children['pageInfo']['endCursor']}, limiter))['node'][child[0]]
+        if not connection['pageInfo']['hasNextPage']:
+            return
+        cursor = connection['pageInfo']['endCursor']
+
+async def ingest(records: AsyncIterator[dict], user_id, write: Writer, batch_size: int = SYNC_BATCH_SIZE,
+                 checkpoint: Checkpoint = None) -> dict:
+    """Map records onto the models and hand them to write in batches; returns rows written per table.
+
+    After each batch, checkpoint gets the newest updatedAt among the parent
+    records written so far whose children are all written too.
+    """
+    buffers = {model: [] for model in WRITE_ORDER}
+    counts = {model.__tablename__: 0 for model in WRITE_ORDER}
+    buffered = 0
+    # A parent's children follow it, so it is complete once the next parent arrives.
+    complete, current = None, None
+
+    async def flush(latest: datetime | None):
+        nonlocal buffered
+        if not buffered:
+            return
+        for model in WRITE_ORDER:
+            if buffers[model]:
+                await write(model, buffers[model])
+                counts[model.__tablename__] += len(buffers[model])
+                buffers[model] = []
+        buffered = 0
+        if checkpoint is not None:
+            await checkpoint(latest)
+
+    async for record in records:
+        if '__parentId' not in record:
+            complete, current = _latest(complete, current), _updated_at(record)
+        mapped = map_record(record, user_id)
+        if mapped is None:
+            continue
+        model, row = mapped
+        buffers[model].append(row)
+        buffered += 1
+        if buffered >= batch_size:
+            await flush(complete)
+    await flush(_latest(complete, current))
+    return counts
+
+def upsert_statement(model: type):
+    statement = insert(model)
+    updates = {column.name: statement.excluded[column.name] for column in model.__table__.columns
+               if not column.primary_key}
+    return statement.on_conflict_do_update(index_elements=[column.name for column in model.__table__.primary_key],
+                                           set_=updates)
+
+def session_writer(session: AsyncSession) -> Writer:
+    async def write(model: type, rows: list[dict]):
+        # COPY through a staging table unless switched off; the caller commits once the batch is written.
+        if SYNC_BULK_COPY:
+            await bulk_upsert(session, model, rows)
+        else:
+            await session.execute(upsert_statement(model), rows)
+    return write
+
+async def sync_shopify(shop: str, access_token: str, user_id, write: Writer, client: httpx.AsyncClient = None,
+                       endpoint: str = None, batch_size: int = SYNC_BATCH_SIZE, since: datetime = None,
+                       limiter: CostLimiter = None, commit: Checkpoint = None) -> dict:
+    """Sync a shop's customers, products and orders; returns rows written per table.
+
+    Without a watermark everything comes through bulk exports; with one, only
+    records updated after it are paged through the regular connections.
+    commit is awaited after every batch with the watermark that batch makes
+    safe, or None when it makes none safe.
+    """
+    endpoint = endpoint or graphql_url(shop)
+    client = client or http_client()
+    counts = {model.__tablename__: 0 for model in WRITE_ORDER}
+    last = list(RESOURCES)[-1]
+    for resource in RESOURCES:
+        async def checkpoint(latest: datetime | None, resource: str = resource):
+            # Pages come oldest update first, so every change up to latest is written. One watermark
+            # covers all resources, so it can only move while paging the last, once the others are
+            # done. Bulk exports come in no particular order and never move it.
+            await commit(latest if since is not None and resource == last else None)
+
+        if since is None:
+            url = await run_bulk_query(client, endpoint, access_token, bulk_query(resource), limiter)
+            if url is None:
+                continue
+            records = iter_jsonl(client, url)
+        else:
+            records = iter_pages(client, endpoint, access_token, resource, updated_since(since), limiter)
+        written = await ingest(records, user_id, write, batch_size, checkpoint if commit else None)
+        for table, rows in written.items():
+            counts[table] += rows
+    return counts
+
+async def advance_watermark(session: AsyncSession, integration_id, watermark: datetime):
+    # Conditional, so an overlapping older sync can never move the watermark back.
+    # Runs in the caller's transaction, alongside the rows it vouches for.
+    await session.execute(
+        update(Integrations)
+        .where(Integrations.id == integration_id,
+               or_(Integrations.last_synced_at.is_(None), Integrations.last_synced_at < watermark))
+        .values(last_synced_at=watermark)
+    )
+
+async def sync_integration(integration, session: AsyncSession, client: httpx.AsyncClient = None,
+                           endpoint: str = None, limiter: CostLimiter = None,
+                           batch_size: int = SYNC_BATCH_SIZE) -> dict:
+    """Sync one integration from its watermark and report what it cost."""
+    started_at = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    since = integration.last_synced_at
+    mode = 'full' if since is None else 'incremental'
+    overlap = timedelta(seconds=SYNC_OVERLAP_SECONDS)
+
+    async def commit(latest: datetime | None):
+        # Each batch commits together with the watermark it makes safe, so a sync that fails
+        # part way resumes after its last committed batch.
+        if latest is not None:
+            await advance_watermark(session, integration.id, min(latest, started_at) - overlap)
+        await session.commit()
+
+    counts = await sync_shopify(integration.shop_url, integration.refresh_token, integration.user_id,
+                                session_writer(session), client, endpoint, batch_size, since, limiter, commit)
+    # Every resource is complete, so nothing updated before the sync started can still be missing.
+    watermark = started_at - overlap
+    await advance_watermark(session, integration.id, watermark)
+    await session.commit()
+    seconds = time.perf_counter() - started
+
+    records = sum(counts.values())
+    labels = {'integration': str(integration.id), 'mode': mode}
+    for table, rows in counts.items():
+        if rows:
+            SHOPIFY_SYNC_RECORDS.inc(rows, table=table, **labels)
+    SHOPIFY_SYNC_SECONDS.observe(seconds, **labels)
+    SHOPIFY_SYNC_RECORDS_PER_SECOND.set(records / seconds if seconds else 0.0, **labels)
+    if records:
+        await result_cache.bump_user_data_version(integration.user_id)
+    return {
+        "integration_id": str(integration.id),
+        "mode": mode,
+        "since": since.isoformat() if since else None,
+        "watermark": watermark.isoformat(),
+        "records": counts,
+        "total_records": records,
+        "seconds": seconds,
+        "records_per_second": records / seconds if seconds else 0.0
+    }
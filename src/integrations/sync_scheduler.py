@@ -0,0 +1,93 @@
+import asyncio
+import os
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable
+from sqlalchemy import select
+
+from ..db import get_session
+from ..db.db_schema import Integrations
+from .shopify_sync import sync_integration
+from .throttle import CostLimiter
+
+# Shops synced at once across all tenants; each shop is also paced by its own cost bucket.
+SYNC_CONCURRENCY = int(os.getenv('SHOPIFY_SYNC_CONCURRENCY', '8'))
+
+Sync = Callable[[Integrations, CostLimiter], Awaitable[dict]]
+
+
+async def sync_with_session(integration: Integrations, limiter: CostLimiter) -> dict:
+    # A session per sync: sessions must not be shared between concurrent tasks.
+    async with get_session() as session:
+        return await sync_integration(integration, session, limiter=limiter)
+
+async def active_integrations() -> list[Integrations]:
+    async with get_session() as session:
+        result = await session.execute(
+            select(Integrations)
+            .where(Integrations.platform == 'shopify', Integrations.is_active.is_(True))
+            .order_by(Integrations.last_synced_at.asc().nulls_first())
+        )
+        return list(result.scalars())
+
+
+class SyncScheduler:
+    """Runs integration syncs concurrently under a global cap.
+
+    Pending syncs are queued per tenant (user) and handed out round-robin,
+    so one tenant with many shops cannot starve the others. Limiters are
+    kept per shop across runs, so a shop throttled in one run starts the
+    next with the bucket it left behind.
+    """
+
+    def __init__(self, sync: Sync = sync_with_session, concurrency: int = SYNC_CONCURRENCY):
+        self.sync = sync
+        self.concurrency = max(concurrency, 1)
+        self.limiters = {}
+
+    def limiter(self, shop: str) -> CostLimiter:
+        if shop not in self.limiters:
+            self.limiters[shop] = CostLimiter()
+        return self.limiters[shop]
+
+    @staticmethod
+    def round_robin(integrations: list) -> list:
+        queues = OrderedDict()
+        for integration in integrations:
+            queues.setdefault(integration.user_id, deque()).append(integration)
+        order = []
+        while queues:
+            tenant, queue = queues.popitem(last=False)
+            order.append(queue.popleft())
+            if queue:
+                queues[tenant] = queue
+        return order
+
+    async def _run_one(self, integration) -> dict:
+        try:
+            report = await self.sync(integration, self.limiter(integration.shop_url))
+        except Exception as e:
+            # One shop failing must not stop the others; its watermark stays put.
+            return {"integration_id": str(integration.id), "error": str(e)}
+        return report
+
+    async def run(self, integrations: list) -> list[dict]:
+        """Sync every integration once; reports come back in dispatch order."""
+        pending = deque(self.round_robin(integrations))
+        reports = {}
+
+        async def worker():
+            while pending:
+                integration = pending.popleft()
+                reports[id(integration)] = await self._run_one(integration)
+
+        dispatched = list(pending)
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(pending)))))
+        return [reports[id(integration)] for integration in dispatched]
+
+    async def run_forever(self, interval: float):
+        while True:
+            await self.run(await active_integrations())
+            await asyncio.sleep(interval)
+
+async def sync_all_integrations(concurrency: int = SYNC_CONCURRENCY) -> list[dict]:
+    return await SyncScheduler(concurrency=concurrency).run(await active_integrations())
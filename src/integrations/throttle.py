@@ -0,0 +1,85 @@
+import asyncio
+import os
+import random
+import time
+
+# Shopify's GraphQL Admin API meters each shop with a leaky bucket of query
+# cost points; standard plans hold 1000 points and restore 50 a second.
+DEFAULT_CAPACITY = 1000.0
+DEFAULT_RESTORE_RATE = 50.0
+DEFAULT_QUERY_COST = float(os.getenv('SHOPIFY_DEFAULT_QUERY_COST', '50'))
+# REST responses report "used/limit" and leak 2 calls a second.
+REST_LEAK_RATE = 2.0
+MAX_RETRIES = int(os.getenv('SHOPIFY_MAX_RETRIES', '6'))
+BACKOFF_BASE_SECONDS = float(os.getenv('SHOPIFY_BACKOFF_BASE_SECONDS', '0.5'))
+BACKOFF_MAX_SECONDS = float(os.getenv('SHOPIFY_BACKOFF_MAX_SECONDS', '30'))
+
+
+class CostLimiter:
+    """Client-side copy of one shop's cost bucket.
+
+    Requests wait until the bucket can cover their expected cost; every
+    response then replaces the estimate with what Shopify reports, so the
+    limiter follows the shop's real plan limits.
+    """
+
+    def __init__(self, capacity: float = DEFAULT_CAPACITY, restore_rate: float = DEFAULT_RESTORE_RATE):
+        self.capacity = capacity
+        self.restore_rate = restore_rate
+        self.available = capacity
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self._costs = {}
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.restore_rate)
+        self.updated = now
+
+    def expected_cost(self, query: str) -> float:
+        return self._costs.get(query, DEFAULT_QUERY_COST)
+
+    async def acquire(self, cost: float):
+        # Held while sleeping, so requests to one shop queue up in order.
+        async with self._lock:
+            cost = min(cost, self.capacity)
+            self._refill()
+            if self.available < cost:
+                delay = (cost - self.available) / self.restore_rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+                self._refill()
+            self.available -= cost
+
+    def observe(self, query: str = None, cost: dict = None, call_limit: str = None):
+        """Sync with the cost extension of a GraphQL response or an X-Shopify-Shop-Api-Call-Limit header."""
+        if cost:
+            if query is not None and cost.get('requestedQueryCost') is not None:
+                self._costs[query] = float(cost['requestedQueryCost'])
+            status = cost.get('throttleStatus') or {}
+            if status:
+                self.capacity = float(status['maximumAvailable'])
+                self.restore_rate = float(status['restoreRate'])
+                self.available = float(status['currentlyAvailable'])
+                self.updated = time.monotonic()
+        elif call_limit:
+            used, limit = (float(part) for part in call_limit.split('/'))
+            self.capacity, self.restore_rate = limit, REST_LEAK_RATE
+            self.available = limit - used
+            self.updated = time.monotonic()
+
+    def drain(self):
+        # A throttled response means the bucket is empty whatever our estimate says.
+        self.available = 0.0
+        self.updated = time.monotonic()
+
+def backoff_delay(attempt: int, retry_after: str = None) -> float:
+    """Full-jitter exponential backoff; a Retry-After header sets the floor."""
+    delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+    if retry_after:
+        try:
+            return max(float(retry_after), delay)
+        except ValueError:
+            pass
+    return delay
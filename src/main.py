@@ -1,16 +1,33 @@
-from fastapi import FastAPI,HTTPException,status,Depends
+from fastapi import FastAPI,HTTPException,status,Depends,Request
+from fastapi.responses import Response
 from typing import Annotated
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware 
 from src.authentication.router import router
 from src.authentication.utils import get_current_user
 from starlette.middleware.sessions import SessionMiddleware
 import os
+import time
 from src.authentication.utils import verify_password,DeleteUserRequest
 from src.db import writable_session, User
 from src.schema import UserResponse
 from src.integrations.integrations_router import integrations_router
 from src.analysis.pipeline_router import pipeline_router
-app = FastAPI()
+from src.analysis.executor import analytics_executor
+from src.analysis.result_cache import result_cache
+from src.http_client import http_client, close_http_client
+from src.metrics import registry, HTTP_REQUEST_SECONDS, RESULT_CACHE, ANALYTICS_EXECUTOR, PROCESS_MAX_RSS, PROMETHEUS_MEDIA_TYPE, max_rss_bytes
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    analytics_executor.start()
+    await analytics_executor.warm_up()
+    http_client()
+    yield
+    await close_http_client()
+    analytics_executor.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(router)
 
@@ -31,6 +48,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # The route template, not the raw path, so path parameters don't explode the label set.
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=request.method,
+                                     route=getattr(route, "path", "unmatched"), status=str(status_code))
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    for name, value in result_cache.stats().items():
+        RESULT_CACHE.set(value, stat=name)
+    for name, value in analytics_executor.stats().items():
+        ANALYTICS_EXECUTOR.set(value, stat=name)
+    peak = max_rss_bytes()
+    if peak is not None:
+        PROCESS_MAX_RSS.set(peak)
+    return Response(content=registry.render(), media_type=PROMETHEUS_MEDIA_TYPE)
+
 user_dependency = Annotated[dict,Depends(get_current_user)]
 
 @app.get("/",status_code=status.HTTP_200_OK)
@@ -0,0 +1,263 @@
+import bisect
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak memory is simply not reported there.
+    resource = None
+
+PROMETHEUS_MEDIA_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SYNC_BUCKETS = (1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 7200.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + '}'
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+    def _samples(self, key: tuple, value) -> list[str]:
+        return [f'{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}']
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f'# HELP {self.name} {_escape(self.documentation)}', f'# TYPE {self.name} {self.kind}']
+        for key, value in values:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def drain(self) -> dict:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def merge(self, values: dict):
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def merge(self, values: dict):
+        with self._lock:
+            self._values.update(values)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # [per-bucket counts (last one is +Inf), sum]
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def merge(self, values: dict):
+        with self._lock:
+            for key, (counts, total) in values.items():
+                entry = self._values.get(key)
+                if entry is None:
+                    self._values[key] = [list(counts), total]
+                    continue
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+
+    def get(self, **labels) -> tuple[int, float] | None:
+        # (observation count, sum of observed values)
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return None if entry is None else (sum(entry[0]), entry[1])
+
+    def drain(self) -> dict:
+        with self._lock:
+            values, self._values = self._values, {}
+        return {key: (counts, total) for key, (counts, total) in values.items()}
+
+    def _samples(self, key: tuple, value) -> list[str]:
+        counts, total = value
+        labels = dict(zip(self.labelnames, key))
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{_format_labels({**labels, "le": _format_value(float(bound))})} {cumulative}')
+        lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(total)}')
+        lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+class Registry:
+    """Metrics kept in process memory and rendered in the Prometheus text format.
+
+    Analytics workers run in separate processes: they drain what they have
+    recorded after each call and the parent merges it into its own registry.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def drain(self) -> dict:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: values for metric in metrics if (values := metric.drain())}
+
+    def merge(self, deltas: dict):
+        for name, values in deltas.items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(values)
+
+
+registry = Registry()
+
+PIPELINE_STAGE_SECONDS = registry.histogram(
+    'storesight_pipeline_stage_seconds', 'Time spent in each analysis pipeline stage.', ('stage',))
+PIPELINE_STAGE_ERRORS = registry.counter(
+    'storesight_pipeline_stage_errors_total', 'Analysis pipeline stages that raised.', ('stage',))
+PIPELINE_STAGE_MAX_RSS = registry.gauge(
+    'storesight_pipeline_stage_max_rss_bytes',
+    'Peak resident memory of the process that ran the stage, sampled when the stage finished.', ('stage',))
+PROCESS_MAX_RSS = registry.gauge('storesight_process_max_rss_bytes', 'Peak resident memory of the API process.')
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'storesight_http_request_seconds', 'API request latency by route.', ('method', 'route', 'status'))
+DB_QUERY_SECONDS = registry.histogram(
+    'storesight_db_query_seconds', 'Database statement execution time.', ('operation',))
+DB_SESSION_SECONDS = registry.histogram('storesight_db_session_seconds', 'Time database sessions are held open.')
+REDIS_COMMAND_SECONDS = registry.histogram(
+    'storesight_redis_command_seconds', 'Redis command round-trip time.', ('command',))
+RESULT_CACHE = registry.gauge('storesight_result_cache', 'Analytics result cache counters.', ('stat',))
+ANALYTICS_EXECUTOR = registry.gauge('storesight_analytics_executor', 'Analytics worker pool state.', ('stat',))
+SHOPIFY_SYNC_RECORDS = registry.counter(
+    'storesight_shopify_sync_records_total', 'Rows written by Shopify syncs.', ('integration', 'mode', 'table'))
+SHOPIFY_SYNC_SECONDS = registry.histogram(
+    'storesight_shopify_sync_seconds', 'Duration of Shopify syncs.', ('integration', 'mode'), SYNC_BUCKETS)
+SHOPIFY_SYNC_RECORDS_PER_SECOND = registry.gauge(
+    'storesight_shopify_sync_records_per_second', 'Throughput of the last Shopify sync.', ('integration', 'mode'))
+SHOPIFY_THROTTLED = registry.counter(
+    'storesight_shopify_throttled_total', 'Shopify API calls rejected as throttled and retried.', ('endpoint',))
+
+
+def max_rss_bytes() -> int | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+@contextmanager
+def stage_timer(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        PIPELINE_STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        PIPELINE_STAGE_SECONDS.observe(time.perf_counter() - started, stage=name)
+        peak = max_rss_bytes()
+        if peak is not None:
+            PIPELINE_STAGE_MAX_RSS.set(peak, stage=name)
+
+def timed_stage(name: str):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -3,8 +3,15 @@ import json
 import redis.asyncio as redis
 from kombu.utils.url import safequote
 
+from src.metrics import REDIS_COMMAND_SECONDS
+
+class TimedRedis(redis.Redis):
+    async def execute_command(self, *args, **options):
+        with REDIS_COMMAND_SECONDS.time(command=str(args[0]).lower()):
+            return await super().execute_command(*args, **options)
+
 redis_host = safequote(os.environ.get('REDIS_HOST', 'localhost'))
-redis_client = redis.Redis(host=redis_host, port=6379, db=0)
+redis_client = TimedRedis(host=redis_host, port=6379, db=0)
 
 async def add_key_value_redis(key, value, expire=None):
     value = json.dumps(value)
@@ -1,10 +1,70 @@
-from db.utils import create_all_tables
 import argparse
+import os
+import sys
+
+# The analysis package imports its siblings (metrics, db) through src, so the repo root must be importable.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 parser = argparse.ArgumentParser()
-parser.add_argument("command",choices=["init-db"])
+parser.add_argument("command",choices=["init-db","snapshot-data","memory-report","append-batch","rebuild-state","verify-state","partition-data","sync-shops"])
+parser.add_argument("--data-path",default=None)
+parser.add_argument("--orders",default=None)
+parser.add_argument("--order-items",default=None)
+parser.add_argument("--customers",default=None)
+parser.add_argument("--concurrency",type=int,default=None)
 
 args = parser.parse_args()
 
 if args.command == "init-db":
-    create_all_tables()
\ No newline at end of file
+    from src.db.utils import create_all_tables
+    create_all_tables()
+
+if args.command == "snapshot-data":
+    from src.analysis.pipeline import convert_to_snapshots
+    for path in convert_to_snapshots(args.data_path):
+        print(f"Snapshot written: {path}")
+
+if args.command == "memory-report":
+    from src.analysis.pipeline import dtype_memory_report
+    for name, report in dtype_memory_report(args.data_path).items():
+        print(f"== {name} ==")
+        print(report.to_string(index=False))
+
+if args.command == "partition-data":
+    from src.analysis.pipeline import partition_data
+    manifest = partition_data(args.data_path)
+    for month, entries in sorted(manifest["partitions"].items()):
+        print(f"month={month}: {sum(entry['rows'] for entry in entries)} rows")
+
+if args.command == "append-batch":
+    import pandas as pd
+    from src.analysis.pipeline import append_batch
+    batch = {name: pd.read_csv(path) if path else None
+             for name, path in [("orders", args.orders), ("order_items", args.order_items), ("customers", args.customers)]}
+    manifest = append_batch(data_path=args.data_path, **batch)
+    print(f"KPI state updated: {manifest['batches']} batches, {len(manifest['deltas'])} since the last checkpoint")
+
+if args.command == "rebuild-state":
+    from src.analysis.pipeline import rebuild_kpi_state
+    state = rebuild_kpi_state(args.data_path)
+    print(f"KPI state rebuilt: {len(state.order_items)} orders")
+
+if args.command == "verify-state":
+    from src.analysis.pipeline import verify_kpi_state
+    result = verify_kpi_state(args.data_path)
+    if result["consistent"]:
+        print(f"KPI state matches a full rebuild ({result['batches']} batches)")
+    else:
+        for mismatch in result["mismatches"]:
+            print(f"Mismatch: {mismatch}")
+        raise SystemExit(1)
+
+if args.command == "sync-shops":
+    import asyncio
+    from src.integrations.sync_scheduler import SYNC_CONCURRENCY, sync_all_integrations
+    for report in asyncio.run(sync_all_integrations(args.concurrency or SYNC_CONCURRENCY)):
+        if "error" in report:
+            print(f"{report['integration_id']}: failed: {report['error']}")
+        else:
+            print(f"{report['integration_id']}: {report['mode']} sync, {report['total_records']} records "
+                  f"in {report['seconds']:.1f}s ({report['records_per_second']:.0f}/s)")
@@ -0,0 +1,190 @@
+import uuid
+from datetime import datetime
+import pytest
+import pytest_asyncio
+import pandas as pd
+from src.analysis import pipeline
+from src.analysis.backends import PandasBackend, get_backend
+from src.analysis.executor import AnalyticsExecutor
+from src.analysis.rollup import trunc_unit, finest_unit
+
+ORDERS = [
+    ('o1', 'c1', '2023-01-01 09:30:00'),
+    ('o2', 'c2', '2023-01-01 18:00:00'),
+    ('o3', 'c1', '2023-01-09 12:15:00'),
+    ('o4', 'c3', '2023-02-14 08:00:00')
+]
+ITEMS = [('i1', 'o1', 100.0), ('i2', 'o1', 50.0), ('i3', 'o2', 20.0), ('i4', 'o3', 70.0), ('i5', 'o4', 5.5)]
+CUSTOMERS = ['c1', 'c2', 'c3']
+# The exports may repeat an order (the first row wins) or a customer; the database's keys rule both out,
+# so every backend must give the same answers as without them.
+REPEATED_ORDERS = [('o1', 'c2', '2023-02-20 10:00:00')]
+REPEATED_CUSTOMERS = ['c1']
+
+@pytest.fixture
+def pandas_backend(tmp_path, monkeypatch):
+    exported_orders = ORDERS + REPEATED_ORDERS
+    pd.DataFrame({
+        'order_id': [order[0] for order in exported_orders],
+        'customer_id': [order[1] for order in exported_orders],
+        'order_purchase_timestamp': [order[2] for order in exported_orders],
+        'order_approved_at': [order[2] for order in exported_orders]
+    }).to_csv(tmp_path / 'df_Orders.csv', index=False)
+    # Shipping is zero so CSV revenue matches the SQL line revenue (price * quantity).
+    pd.DataFrame({
+        'order_id': [item[1] for item in ITEMS],
+        'price': [item[2] for item in ITEMS],
+        'shipping_charges': [0.0] * len(ITEMS)
+    }).to_csv(tmp_path / 'df_OrderItems.csv', index=False)
+    pd.DataFrame({'customer_id': CUSTOMERS + REPEATED_CUSTOMERS}).to_csv(tmp_path / 'df_Customers.csv', index=False)
+    monkeypatch.setattr(pipeline, 'base_path', str(tmp_path))
+    pipeline.clear_caches()
+    yield PandasBackend(AnalyticsExecutor(workers=0)), None
+    pipeline.clear_caches()
+
+@pytest.fixture
+def duckdb_backend(pandas_backend):
+    pytest.importorskip('duckdb')
+    from src.analysis.duckdb_backend import DuckDbBackend
+    return DuckDbBackend(AnalyticsExecutor(workers=0)), None
+
+@pytest_asyncio.fixture
+async def sql_backend():
+    from sqlalchemy import text, delete
+    try:
+        # src.db connects at import time and raises when no database is configured.
+        from src.db.utils import readonly_session, writable_session
+        from src.db.db_schema import User, Customer, Order, OrderItem
+        from src.analysis.sql_backend import SqlBackend
+        async with readonly_session() as session:
+            await session.execute(text('SELECT 1'))
+    except Exception:
+        pytest.skip("database not available")
+
+    user_id = uuid.uuid4()
+    async with writable_session() as session:
+        session.add(User(id=user_id, email=f'{user_id}@example.com'))
+        await session.flush()
+        session.add_all([Customer(id=customer, user_id=user_id, platform='test') for customer in CUSTOMERS])
+        await session.flush()
+        session.add_all([
+            Order(id=order_id, user_id=user_id, platform='test', customer_id=customer,
+                  created_at=datetime.fromisoformat(created_at))
+            for order_id, customer, created_at in ORDERS
+        ])
+        await session.flush()
+        session.add_all([
+            OrderItem(id=item_id, user_id=user_id, order_id=order_id, quantity=1, price=price, platform='test')
+            for item_id, order_id, price in ITEMS
+        ])
+    yield SqlBackend(), user_id
+    async with writable_session() as session:
+        await session.execute(delete(User).where(User.id == user_id))
+
+@pytest.fixture(params=['pandas_backend', 'duckdb_backend', 'sql_backend'])
+def backend(request):
+    return request.getfixturevalue(request.param)
+
+@pytest.mark.asyncio
+async def test_backend_kpis(backend):
+    backend, user_id = backend
+    kpis = await backend.kpis(user_id)
+    assert kpis["order_volume"] == 4
+    assert kpis["total_revenue"] == pytest.approx(245.5)
+    assert kpis["avg_customer_order"] == pytest.approx(245.5 / 4)
+    assert kpis["customer_spending"] == {
+        "customer_id": ['c1', 'c2', 'c3'],
+        "total_spent": pytest.approx([220.0, 20.0, 5.5])
+    }
+    assert kpis["orders_per_customer"] == {"customer_id": ['c1', 'c2', 'c3'], "order_count": [2, 1, 1]}
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('freq,start_date,end_date', [
+    ('W', None, None),
+    ('M', None, None),
+    ('D', '2023-01-01', '2023-01-09'),
+    ('6h', None, None)
+])
+async def test_backend_revenue_batch_matches_pipeline(backend, pandas_backend, freq, start_date, end_date):
+    backend, user_id = backend
+    expected = await pandas_backend[0].revenue_batch(None, freq, 0, 50, start_date, end_date)
+    result = await backend.revenue_batch(user_id, freq, 0, 50, start_date, end_date)
+    assert result['data']['date'] == expected['data']['date']
+    assert result['data']['revenue'] == pytest.approx(expected['data']['revenue'])
+
+@pytest.mark.asyncio
+async def test_backend_revenue_all(backend):
+    backend, user_id = backend
+    result = await backend.revenue_all(user_id)
+    assert result['monthly_revenue']['month_end_date'] == ['2023-01-31T00:00:00', '2023-02-28T00:00:00']
+    assert result['monthly_revenue']['monthly_revenue'] == pytest.approx([240.0, 5.5])
+    assert sum(result['weekly_revenue']['weekly_revenue']) == pytest.approx(245.5)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('freqs,start_date,end_date', [
+    (['D', 'W', 'M'], None, None),
+    (['6h', 'W'], None, None),
+    (['D', 'M'], '2023-01-01', '2023-01-09')
+])
+async def test_backend_revenue_series_matches_revenue_batch(backend, pandas_backend, freqs, start_date, end_date):
+    backend, user_id = backend
+    result = await backend.revenue_series(user_id, freqs, start_date, end_date)
+    assert list(result) == freqs
+    for freq in freqs:
+        expected = await pandas_backend[0].revenue_batch(None, freq, 0, 1000, start_date, end_date)
+        assert result[freq]['date'] == expected['data']['date']
+        assert result[freq]['revenue'] == pytest.approx(expected['data']['revenue'])
+
+@pytest.mark.asyncio
+async def test_backend_revenue_series_running_columns(backend):
+    backend, user_id = backend
+    result = await backend.revenue_series(user_id, ['M'], cumulative=True, moving_average=2)
+    assert result['M']['revenue'] == pytest.approx([240.0, 5.5])
+    assert result['M']['cumulative_revenue'] == pytest.approx([240.0, 245.5])
+    assert result['M']['moving_average'] == pytest.approx([240.0, 122.75])
+
+def test_series_freqs():
+    assert pipeline.series_freqs(['D', ' W', 'D', '']) == ['D', 'W']
+    with pytest.raises(ValueError):
+        pipeline.series_freqs([])
+    with pytest.raises(ValueError):
+        pipeline.series_freqs(['fortnightly'])
+
+def test_finest_unit():
+    assert finest_unit(['W', 'M']) == 'day'
+    assert finest_unit(['W', '6h', '90min']) == 'minute'
+
+def test_trunc_unit():
+    assert trunc_unit('W') == 'day'
+    assert trunc_unit('3D') == 'day'
+    assert trunc_unit('6h') == 'hour'
+    assert trunc_unit('90min') == 'minute'
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        get_backend('spark')
+
+@pytest.mark.asyncio
+async def test_backend_top_customers_pages(backend):
+    backend, user_id = backend
+    first = await backend.top_customers(user_id, 'spend', 2)
+    assert first["customers"]["customer_id"] == ['c1', 'c2']
+    assert first["customers"]["rank"] == [1, 2]
+    assert first["total_customers"] == 3
+    second = await backend.top_customers(user_id, 'spend', 2, first["next_cursor"])
+    assert second["customers"]["customer_id"] == ['c3']
+    assert second["customers"]["total_spent"] == pytest.approx([5.5])
+    assert second["next_cursor"] is None
+    assert second["total_customers"] == 3
+    # c2 and c3 tie on order count and fall back to customer_id order.
+    by_orders = await backend.top_customers(user_id, 'orders', 3)
+    assert by_orders["customers"]["customer_id"] == ['c1', 'c2', 'c3']
+    assert by_orders["customers"]["order_count"] == [2, 1, 1]
+
+@pytest.mark.asyncio
+async def test_backend_approximate_kpis(backend):
+    backend, user_id = backend
+    result = await backend.approximate_kpis(user_id, '2023-01-01', '2023-01-31')
+    assert result["order_volume"] == 3
+    assert result["distinct_customers"] == 2
+    assert result["total_revenue"] == pytest.approx(240.0)
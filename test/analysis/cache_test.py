@@ -0,0 +1,72 @@
+import os
+import threading
+import pandas as pd
+from src.analysis.cache import FrameCache, file_fingerprint
+
+def write_file(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+
+def test_file_fingerprint_missing_file(tmp_path):
+    missing = str(tmp_path / 'missing.csv')
+    assert file_fingerprint([missing]) == ((missing, None, None),)
+
+def test_frame_cache_hits_until_file_changes(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    write_file(path, 'a\n1\n')
+    builds = []
+
+    def build():
+        builds.append(1)
+        return pd.read_csv(path)
+
+    cache = FrameCache(build, lambda: [path])
+    first = cache.get()
+    second = cache.get()
+    assert first is second
+    assert len(builds) == 1
+
+    write_file(path, 'a\n1\n2\n')
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+    third = cache.get()
+    assert len(third) == 2
+    assert len(builds) == 2
+
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
+    assert stats['rebuilds'] == 2
+
+def test_frame_cache_builds_once_under_concurrency(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    write_file(path, 'a\n1\n')
+    builds = []
+    release = threading.Event()
+
+    def build():
+        builds.append(1)
+        release.wait(timeout=5)
+        return pd.read_csv(path)
+
+    cache = FrameCache(build, lambda: [path])
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert all(result is results[0] for result in results)
+    assert cache.stats()['rebuilds'] == 1
+
+def test_frame_cache_clear(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    write_file(path, 'a\n1\n')
+    cache = FrameCache(lambda: pd.read_csv(path), lambda: [path])
+    cache.get()
+    cache.clear()
+    assert cache.stats()['cached'] is False
+    cache.get()
+    assert cache.stats()['rebuilds'] == 2
@@ -0,0 +1,60 @@
+import pandas as pd
+from src.analysis.dtypes import downcast_frame, memory_report
+from src.analysis.pipeline import load_csv_data, prepare_data, compute_kpis, dtype_memory_report
+
+def write_dataset(path):
+    pd.DataFrame({
+        'order_id': ['order1', 'order2', 'order3'],
+        'customer_id': ['cust1', 'cust1', 'cust2'],
+        'order_status': ['delivered', 'delivered', 'shipped'],
+        'order_purchase_timestamp': ['2023-01-01 10:00:00', '2023-01-03 10:00:00', '2023-01-09 10:00:00'],
+        'order_approved_at': ['2023-01-01 11:00:00', '2023-01-03 11:00:00', '2023-01-09 11:00:00']
+    }).to_csv(path / 'df_Orders.csv', index=False)
+    pd.DataFrame({
+        'order_id': ['order1', 'order2', 'order2', 'order3'],
+        'product_id': ['p1', 'p2', 'p3', 'p1'],
+        'price': [10.5, 20.25, 5.0, 100.0],
+        'shipping_charges': [1.0, 2.0, 0.5, 10.0]
+    }).to_csv(path / 'df_OrderItems.csv', index=False)
+    pd.DataFrame({
+        'customer_id': ['cust1', 'cust2', 'cust3'],
+        'customer_city': ['Sao Paulo', 'Rio', 'Recife']
+    }).to_csv(path / 'df_Customers.csv', index=False)
+    return str(path)
+
+def test_load_csv_data_applies_schema(tmp_path):
+    df_order_items, df_orders, df_customers = load_csv_data(write_dataset(tmp_path))
+    assert list(df_order_items.columns) == ['order_id', 'price', 'shipping_charges']
+    assert 'order_status' not in df_orders.columns
+    assert list(df_customers.columns) == ['customer_id']
+    assert isinstance(df_orders['customer_id'].dtype, pd.CategoricalDtype)
+    assert df_order_items['price'].dtype == 'float64'
+
+def test_prepared_frame_is_downcast_and_kpis_unchanged(tmp_path):
+    data_path = write_dataset(tmp_path)
+    df_full = prepare_data(*load_csv_data(data_path))
+    assert isinstance(df_full['order_id'].dtype, pd.CategoricalDtype)
+    assert isinstance(df_full['customer_id'].dtype, pd.CategoricalDtype)
+
+    expected = compute_kpis(prepare_data(*load_csv_data(data_path, use_schema=False)))
+    result = compute_kpis(df_full)
+    assert result['order_volume'] == expected['order_volume'] == 3
+    assert result['total_revenue'] == expected['total_revenue']
+    assert list(result['customer_spending']['total_spent']) == list(expected['customer_spending']['total_spent'])
+    assert list(result['orders_per_customer']['order_count']) == [2, 1]
+
+def test_downcast_frame_shrinks_integers():
+    df = downcast_frame(pd.DataFrame({'order_id': ['a', 'b'], 'quantity': [1, 2]}))
+    assert df['quantity'].dtype == 'int8'
+    assert isinstance(df['order_id'].dtype, pd.CategoricalDtype)
+
+def test_memory_report(tmp_path):
+    report = dtype_memory_report(write_dataset(tmp_path))
+    assert set(report) == {'order_items', 'orders', 'customers', 'df_full'}
+    orders = report['orders'].set_index('column')
+    assert orders.loc['order_status', 'after_bytes'] == 0
+    assert orders.loc['total', 'saved_bytes'] > 0
+
+    before = pd.DataFrame({'a': [1, 2]})
+    simple = memory_report(before, before).set_index('column')
+    assert simple.loc['a', 'saved_bytes'] == 0
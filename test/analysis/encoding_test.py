@@ -0,0 +1,65 @@
+import json
+import pytest
+import pandas as pd
+import pyarrow as pa
+from fastapi import HTTPException
+from src.analysis.encoding import (
+    JSON_MEDIA_TYPE,
+    COLUMNAR_MEDIA_TYPE,
+    ARROW_MEDIA_TYPE,
+    frame_columns,
+    negotiate,
+    encode_result
+)
+
+@pytest.fixture
+def revenue_all_result():
+    weekly = pd.DataFrame({
+        'week_end_date': pd.to_datetime(['2023-01-01', '2023-01-08']),
+        'weekly_revenue': [10.0, 12.5]
+    })
+    monthly = pd.DataFrame({'month_end_date': pd.to_datetime(['2023-01-31']), 'monthly_revenue': [22.5]})
+    return {"weekly_revenue": frame_columns(weekly), "monthly_revenue": frame_columns(monthly)}
+
+def test_negotiate():
+    assert negotiate(None) == JSON_MEDIA_TYPE
+    assert negotiate('*/*') == JSON_MEDIA_TYPE
+    assert negotiate(f'{ARROW_MEDIA_TYPE}, application/json;q=0.5') == ARROW_MEDIA_TYPE
+    assert negotiate(f'{COLUMNAR_MEDIA_TYPE};q=0, application/json') == JSON_MEDIA_TYPE
+    assert negotiate(f'{COLUMNAR_MEDIA_TYPE}; q=0.00, application/json') == JSON_MEDIA_TYPE
+    assert negotiate(f'{ARROW_MEDIA_TYPE};q=0.0, {COLUMNAR_MEDIA_TYPE};q=0.001') == COLUMNAR_MEDIA_TYPE
+    with pytest.raises(HTTPException) as error:
+        negotiate('text/csv')
+    assert error.value.status_code == 406
+
+def test_json_keeps_record_shape(revenue_all_result):
+    response = encode_result(revenue_all_result, JSON_MEDIA_TYPE)
+    body = json.loads(response.body)
+    assert body['weekly_revenue'] == [
+        {'week_end_date': '2023-01-01T00:00:00', 'weekly_revenue': 10.0},
+        {'week_end_date': '2023-01-08T00:00:00', 'weekly_revenue': 12.5}
+    ]
+
+def test_columnar_json(revenue_all_result):
+    response = encode_result(revenue_all_result, COLUMNAR_MEDIA_TYPE)
+    assert response.media_type == COLUMNAR_MEDIA_TYPE
+    assert json.loads(response.body) == revenue_all_result
+
+def test_arrow_stream_round_trip(revenue_all_result):
+    response = encode_result(revenue_all_result, ARROW_MEDIA_TYPE, table='weekly_revenue')
+    table = pa.ipc.open_stream(response.body).read_all()
+    assert table.schema.field('week_end_date').type == pa.timestamp('ns')
+    frame = table.to_pandas()
+    assert list(frame['week_end_date']) == list(pd.to_datetime(['2023-01-01', '2023-01-08']))
+    assert list(frame['weekly_revenue']) == [10.0, 12.5]
+
+def test_arrow_carries_scalars_as_metadata():
+    result = {"order_volume": 3, "customer_spending": {"customer_id": ['a', 'b'], "total_spent": [1.0, 2.0]}}
+    table = pa.ipc.open_stream(encode_result(result, ARROW_MEDIA_TYPE).body).read_all()
+    assert json.loads(table.schema.metadata[b'storesight']) == {"order_volume": 3}
+    assert table.column('customer_id').to_pylist() == ['a', 'b']
+
+def test_arrow_needs_a_table_choice(revenue_all_result):
+    with pytest.raises(HTTPException) as error:
+        encode_result(revenue_all_result, ARROW_MEDIA_TYPE)
+    assert error.value.status_code == 406
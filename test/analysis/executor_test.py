@@ -0,0 +1,55 @@
+import asyncio
+import os
+import time
+import numpy as np
+import pytest
+from src.analysis.executor import AnalyticsExecutor, AnalyticsBusy
+
+@pytest.mark.asyncio
+async def test_inline_executor_runs_in_threadpool():
+    executor = AnalyticsExecutor(workers=0, max_queue=4)
+    assert await executor.run(sum, [1, 2, 3]) == 6
+    assert executor.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_process_pool_runs_in_worker_processes():
+    executor = AnalyticsExecutor(workers=2, max_queue=4)
+    try:
+        pids = await executor.warm_up(hold_seconds=0.5)
+        assert len(set(pids)) == 2
+        assert os.getpid() not in pids
+        assert await executor.run(os.getpid) in pids
+    finally:
+        executor.shutdown()
+
+@pytest.mark.asyncio
+async def test_executor_rejects_when_queue_is_full():
+    executor = AnalyticsExecutor(workers=0, max_queue=1)
+    slow = [asyncio.create_task(executor.run(time.sleep, 0.3)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    with pytest.raises(AnalyticsBusy):
+        await executor.run(time.sleep, 0)
+    await asyncio.gather(*slow)
+    assert executor.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_worker_errors_propagate():
+    executor = AnalyticsExecutor(workers=1, max_queue=1)
+    try:
+        with pytest.raises(ValueError):
+            await executor.run(int, 'not a number')
+    finally:
+        executor.shutdown()
+
+@pytest.mark.asyncio
+async def test_worker_metrics_are_merged_into_the_parent():
+    from src.analysis.pipeline import revenue_batch_table
+    from src.metrics import PIPELINE_STAGE_SECONDS
+    before = PIPELINE_STAGE_SECONDS.get(stage='revenue_batch') or (0, 0.0)
+    timestamps = np.array(['2024-01-01', '2024-01-02'], dtype='datetime64[ns]')
+    executor = AnalyticsExecutor(workers=1, max_queue=1)
+    try:
+        await executor.run(revenue_batch_table, timestamps, np.array([1.0, 2.0]), 'D', 0, 5)
+    finally:
+        executor.shutdown()
+    assert PIPELINE_STAGE_SECONDS.get(stage='revenue_batch')[0] == before[0] + 1
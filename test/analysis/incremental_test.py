@@ -0,0 +1,138 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from src.analysis import incremental, pipeline, snapshots
+from src.analysis.incremental import KpiState, compare_state, read_state, read_state_manifest
+from src.analysis.pipeline import (prepare_data, compute_kpis, append_batch, verify_kpi_state, clear_caches,
+                                   convert_to_snapshots, kpi_state_root, snapshot_dir)
+from src.analysis.rollup import build_daily_rollup
+
+@pytest.fixture
+def exports():
+    rng = np.random.default_rng(21)
+    n_orders, n_items = 600, 2400
+    order_ids = [f'order{i}' for i in range(n_orders)]
+    timestamps = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 120 * 86400, n_orders), unit='s')
+    orders = pd.DataFrame({
+        'order_id': order_ids,
+        'customer_id': [f'cust{i}' for i in rng.integers(0, 150, n_orders)],
+        'order_purchase_timestamp': timestamps.strftime('%Y-%m-%d %H:%M:%S'),
+        'order_approved_at': timestamps.strftime('%Y-%m-%d %H:%M:%S')
+    })
+    orders.loc[5, 'order_purchase_timestamp'] = None
+    item_orders = [order_ids[i] for i in rng.integers(0, n_orders, n_items)]
+    item_orders[:3] = ['unknown1', 'unknown1', 'unknown2']
+    order_items = pd.DataFrame({
+        'order_id': item_orders,
+        'price': rng.gamma(2.0, 50.0, n_items).round(2),
+        'shipping_charges': rng.gamma(2.0, 5.0, n_items).round(2)
+    })
+    # cust149 never gets a customer record.
+    customers = pd.DataFrame({'customer_id': [f'cust{i}' for i in range(149)]})
+    return order_items, orders, customers
+
+def full_recompute(order_items, orders, customers):
+    df_full = prepare_data(order_items.copy(), orders.copy(), customers.copy())
+    return compute_kpis(df_full), build_daily_rollup(df_full)
+
+def test_batches_in_any_arrival_order_match_full_recompute(exports):
+    order_items, orders, customers = exports
+    state = KpiState()
+    # Items arrive before their orders, and orders before their customers.
+    state.append(order_items=order_items.iloc[:1200])
+    state.append(orders=orders.iloc[:300])
+    state.append(customers=customers.iloc[:70], order_items=order_items.iloc[1200:2000])
+    state.append(orders=orders.iloc[300:], customers=customers.iloc[70:])
+    state.append(order_items=order_items.iloc[2000:])
+    assert compare_state(state, *full_recompute(order_items, orders, customers)) == []
+
+def test_state_detects_divergence(exports):
+    order_items, orders, customers = exports
+    state = KpiState.from_frames(order_items.iloc[:-10], orders, customers)
+    assert compare_state(state, *full_recompute(order_items, orders, customers)) != []
+
+def test_state_round_trip(exports, tmp_path):
+    state = KpiState.from_frames(*exports)
+    state.save(str(tmp_path / 'state.pkl'))
+    restored = KpiState.load(str(tmp_path / 'state.pkl'))
+    pd.testing.assert_frame_equal(restored.rollup(), state.rollup())
+    assert restored.kpi_frames()['order_volume'] == state.kpi_frames()['order_volume']
+
+def test_append_batch_updates_exports_and_serves_incremental_mode(monkeypatch, tmp_path, exports):
+    order_items, orders, customers = exports
+    order_items.iloc[:1500].to_csv(tmp_path / 'df_OrderItems.csv', index=False)
+    orders.iloc[:400].to_csv(tmp_path / 'df_Orders.csv', index=False)
+    customers.iloc[:100].to_csv(tmp_path / 'df_Customers.csv', index=False)
+
+    manifest = append_batch(order_items.iloc[1500:], orders.iloc[400:], customers.iloc[100:], data_path=str(tmp_path))
+    assert manifest["batches"] == 2
+    assert len(manifest["deltas"]) == 1
+    assert verify_kpi_state(str(tmp_path))["consistent"]
+
+    monkeypatch.setattr(pipeline, 'base_path', str(tmp_path))
+    monkeypatch.setattr(pipeline, 'ANALYSIS_MODE', 'incremental')
+    clear_caches()
+    try:
+        expected_kpis, expected_rollup = full_recompute(order_items, orders, customers)
+        assert pipeline.current_kpis()['order_volume'] == expected_kpis['order_volume']
+        assert list(pipeline.get_daily_rollup().index) == list(expected_rollup.index)
+        with pytest.raises(ValueError):
+            pipeline.revenue_chart_data_batch(freq='h')
+    finally:
+        clear_caches()
+
+def write_exports(path, order_items, orders, customers):
+    order_items.to_csv(path / 'df_OrderItems.csv', index=False)
+    orders.to_csv(path / 'df_Orders.csv', index=False)
+    customers.to_csv(path / 'df_Customers.csv', index=False)
+
+def test_append_batch_records_deltas_and_compacts(monkeypatch, tmp_path, exports):
+    monkeypatch.setattr(incremental, 'KPI_STATE_MAX_DELTAS', 3)
+    monkeypatch.setattr(snapshots, 'SNAPSHOT_MAX_PARTS', 3)
+    order_items, orders, customers = exports
+    write_exports(tmp_path, order_items.iloc[:1000], orders.iloc[:300], customers.iloc[:80])
+    convert_to_snapshots(str(tmp_path))
+    snapshot_file = os.path.join(snapshot_dir(str(tmp_path)), 'order_items.parquet')
+    written = os.stat(snapshot_file).st_mtime_ns
+
+    root = kpi_state_root(str(tmp_path))
+    item_batches = np.array_split(np.arange(1000, len(order_items)), 4)
+    for i, positions in enumerate(item_batches[:2]):
+        manifest = append_batch(order_items.iloc[positions], data_path=str(tmp_path))
+        # Each batch only adds a delta and a snapshot part; nothing already written changes.
+        assert len(manifest["deltas"]) == i + 1
+        assert os.stat(snapshot_file).st_mtime_ns == written
+    assert len(snapshots.snapshot_parts(snapshot_file)) == 3
+
+    manifest = append_batch(order_items.iloc[item_batches[2]], orders.iloc[300:], customers.iloc[80:],
+                            data_path=str(tmp_path))
+    assert manifest["deltas"] == [] and manifest["batches"] == 4
+    assert sorted(os.listdir(root)) == [manifest["checkpoint"], 'manifest.json']
+    assert snapshots.snapshot_parts(snapshot_file) == [snapshot_file]
+
+    append_batch(order_items.iloc[item_batches[3]], data_path=str(tmp_path))
+    assert read_state(root).batches == 5
+    assert verify_kpi_state(str(tmp_path))["consistent"]
+
+def test_concurrent_appends_keep_every_batch(tmp_path, exports):
+    order_items, orders, customers = exports
+    write_exports(tmp_path, order_items.iloc[:1000], orders, customers)
+    errors = []
+
+    def append(positions):
+        try:
+            append_batch(order_items.iloc[positions], data_path=str(tmp_path))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=append, args=(positions,))
+               for positions in np.array_split(np.arange(1000, len(order_items)), 6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert read_state_manifest(kpi_state_root(str(tmp_path)))["batches"] == 7
+    assert verify_kpi_state(str(tmp_path))["consistent"]
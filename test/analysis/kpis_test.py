@@ -0,0 +1,54 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from src.analysis.kpis import compute_kpi_frames, kpis_to_json
+from src.analysis.dtypes import downcast_frame
+
+def legacy_compute_kpis(df_full):
+    order_volume = df_full['order_id'].nunique()
+    total_revenue = df_full['revenue'].sum()
+    customer_spending = df_full.groupby('customer_id')['revenue'].sum().reset_index(name='total_spent')
+    orders_per_customer = df_full.groupby('customer_id')['order_id'].nunique().reset_index(name='order_count')
+    return order_volume, total_revenue, customer_spending, orders_per_customer
+
+@pytest.fixture
+def full_frame():
+    rng = np.random.default_rng(11)
+    n = 20000
+    order_ids = rng.integers(0, 6000, n)
+    df = pd.DataFrame({
+        'order_id': [f'order{i}' for i in order_ids],
+        'customer_id': [f'cust{i % 900}' for i in order_ids],
+        'revenue': rng.gamma(2.0, 40.0, n)
+    })
+    # Items whose order had no matching customer carry NaN ids after the merge.
+    df.loc[rng.choice(n, 200, replace=False), 'customer_id'] = np.nan
+    return df
+
+@pytest.mark.parametrize('categorical', [False, True])
+def test_compute_kpi_frames_matches_legacy(full_frame, categorical):
+    order_volume, total_revenue, spending, orders = legacy_compute_kpis(full_frame)
+    frame = downcast_frame(full_frame.copy()) if categorical else full_frame
+    result = compute_kpi_frames(frame)
+
+    assert result['order_volume'] == order_volume
+    assert result['total_revenue'] == total_revenue
+    assert result['customer_spending']['customer_id'].tolist() == spending['customer_id'].tolist()
+    assert result['customer_spending']['total_spent'].tolist() == spending['total_spent'].tolist()
+    assert result['orders_per_customer']['order_count'].tolist() == orders['order_count'].tolist()
+    assert result['avg_customer_order'] == total_revenue / order_volume
+
+def test_kpis_to_json_is_serialisable(full_frame):
+    result = kpis_to_json(compute_kpi_frames(full_frame))
+    encoded = json.loads(json.dumps(result))
+    assert encoded['order_volume'] == result['order_volume']
+    assert set(encoded['customer_spending']) == {'customer_id', 'total_spent'}
+    assert set(encoded['orders_per_customer']) == {'customer_id', 'order_count'}
+    assert len(encoded['customer_spending']['customer_id']) == len(encoded['customer_spending']['total_spent'])
+
+def test_compute_kpi_frames_empty_input():
+    result = compute_kpi_frames(pd.DataFrame({'order_id': [], 'customer_id': [], 'revenue': []}))
+    assert result['order_volume'] == 0
+    assert result['avg_customer_order'] == 0
+    assert result['customer_spending'].empty
@@ -0,0 +1,142 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from src.analysis import pipeline
+from src.analysis.partitions import read_manifest, read_partitions, select_files, write_partitions
+from src.analysis.pipeline import append_batch, partition_data, partition_root, partitions_current, prepare_data
+
+def make_exports(first_order: int, n_orders: int, start: str, days: int, seed: int):
+    rng = np.random.default_rng(seed)
+    order_ids = [f'order{i}' for i in range(first_order, first_order + n_orders)]
+    customer_ids = [f'cust{i}' for i in range(first_order, first_order + n_orders // 4)]
+    timestamps = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days * 86400, n_orders), unit='s')
+    orders = pd.DataFrame({
+        'order_id': order_ids,
+        'customer_id': rng.choice(customer_ids, n_orders),
+        'order_purchase_timestamp': timestamps.strftime('%Y-%m-%d %H:%M:%S'),
+        'order_approved_at': timestamps.strftime('%Y-%m-%d %H:%M:%S')
+    })
+    order_items = pd.DataFrame({
+        'order_id': rng.choice(order_ids, n_orders * 3),
+        'price': rng.gamma(2.0, 50.0, n_orders * 3).round(2),
+        'shipping_charges': rng.gamma(2.0, 5.0, n_orders * 3).round(2)
+    })
+    return order_items, orders, pd.DataFrame({'customer_id': customer_ids})
+
+@pytest.fixture
+def dataset(tmp_path):
+    order_items, orders, customers = make_exports(0, 400, '2023-01-01', 90, 3)
+    # One line with no known order lands in the undated partition.
+    order_items.loc[0, 'order_id'] = 'unknown'
+    order_items.to_csv(tmp_path / 'df_OrderItems.csv', index=False)
+    orders.to_csv(tmp_path / 'df_Orders.csv', index=False)
+    customers.to_csv(tmp_path / 'df_Customers.csv', index=False)
+    return str(tmp_path)
+
+@pytest.fixture(params=['csv', 'snapshots'])
+def appended(request, dataset):
+    if request.param == 'snapshots':
+        # Appends then look earlier orders and customers up in the snapshots instead of the exports.
+        pipeline.convert_to_snapshots(dataset)
+    return dataset
+
+def rows(frame: pd.DataFrame) -> pd.DataFrame:
+    frame = frame[['order_id', 'order_purchase_timestamp', 'revenue']].astype({'order_id': str})
+    return frame.sort_values(['order_purchase_timestamp', 'order_id', 'revenue'], ignore_index=True)
+
+def test_manifest_prunes_to_overlapping_months(dataset):
+    manifest = partition_data(dataset)
+    assert sorted(manifest["partitions"]) == ['2023-01', '2023-02', '2023-03', 'undated']
+    assert os.path.isdir(os.path.join(partition_root(dataset), 'month=2023-02'))
+    assert sum(entry["rows"] for entries in manifest["partitions"].values() for entry in entries) == 1200
+
+    files = select_files(manifest, pd.Timestamp('2023-02-10'), pd.Timestamp('2023-02-20'))
+    assert [os.path.dirname(file) for file in files] == ['month=2023-02']
+    assert len(select_files(manifest)) == 4
+
+    ranged = read_partitions(partition_root(dataset), pd.Timestamp('2023-02-10'), pd.Timestamp('2023-02-20'))
+    assert ranged['order_purchase_timestamp'].is_monotonic_increasing
+    assert (ranged['order_purchase_timestamp'].dt.month == 2).all()
+
+def test_new_month_batch_appends_without_rewriting(appended):
+    partition_data(appended)
+    root = partition_root(appended)
+    before = {file: os.stat(os.path.join(root, file)).st_mtime_ns
+              for file in select_files(read_manifest(root))}
+
+    append_batch(*make_exports(1000, 100, '2023-04-01', 20, 4), data_path=appended)
+    manifest = read_manifest(root)
+    assert '2023-04' in manifest["partitions"]
+    assert partitions_current(appended)
+    for file, mtime in before.items():
+        assert os.stat(os.path.join(root, file)).st_mtime_ns == mtime
+
+    expected = prepare_data(*pipeline.load_data(appended))
+    assert rows(read_partitions(root)).equals(rows(expected))
+
+def test_batch_touching_old_orders_appends_parts(appended):
+    partition_data(appended)
+    root = partition_root(appended)
+    old_files = set(select_files(read_manifest(root)))
+
+    extra_items = pd.DataFrame({'order_id': ['order1', 'order2'], 'price': [10.0, 20.0], 'shipping_charges': [1.0, 2.0]})
+    append_batch(order_items=extra_items, data_path=appended)
+    assert partitions_current(appended)
+    assert old_files < set(select_files(read_manifest(root)))
+    expected = prepare_data(*pipeline.load_data(appended))
+    assert rows(read_partitions(root)).equals(rows(expected))
+
+def test_late_order_moves_lines_out_of_undated_only(appended):
+    partition_data(appended)
+    root = partition_root(appended)
+    dated = {file for file in select_files(read_manifest(root)) if not file.startswith('month=undated')}
+
+    # The order (and its customer) behind the line that landed in the undated partition.
+    late_order = pd.DataFrame({'order_id': ['unknown'], 'customer_id': ['late'],
+                               'order_purchase_timestamp': ['2023-02-03 10:00:00'],
+                               'order_approved_at': ['2023-02-03 10:00:00']})
+    append_batch(orders=late_order, customers=pd.DataFrame({'customer_id': ['late']}), data_path=appended)
+    manifest = read_manifest(root)
+    assert 'undated' not in manifest["partitions"]
+    assert dated < set(select_files(manifest))
+    expected = prepare_data(*pipeline.load_data(appended))
+    assert rows(read_partitions(root)).equals(rows(expected))
+
+def test_items_before_their_orders_match_a_full_rebuild(appended):
+    partition_data(appended)
+    root = partition_root(appended)
+    order_items, orders, customers = make_exports(2000, 20, '2023-03-01', 10, 5)
+
+    # Lines whose orders are not exported yet stay unattributed until the orders arrive.
+    append_batch(order_items=order_items, data_path=appended)
+    assert partitions_current(appended)
+    append_batch(orders=orders, customers=customers, data_path=appended)
+    assert partitions_current(appended)
+    expected = prepare_data(*pipeline.load_data(appended))
+    assert rows(read_partitions(root)).equals(rows(expected))
+
+def test_bounded_intraday_requests_read_partitions(monkeypatch, dataset):
+    partition_data(dataset)
+    monkeypatch.setattr(pipeline, 'base_path', dataset)
+    pipeline.clear_caches()
+    try:
+        expected = pipeline.revenue_chart_data_batch('h', 0, 48, '2023-02-01', '2023-02-02')
+        pipeline.clear_caches()
+        # Streaming mode has no resident frame to fall back on, so this must come from the partitions.
+        monkeypatch.setattr(pipeline, 'ANALYSIS_MODE', 'streaming')
+        result = pipeline.revenue_chart_data_batch('h', 0, 48, '2023-02-01', '2023-02-02')
+        assert result['data']['date'] == expected['data']['date']
+        assert result['data']['revenue'] == pytest.approx(expected['data']['revenue'])
+
+        # Stale partitions are ignored once the exports change underneath them.
+        with open(os.path.join(dataset, 'df_Customers.csv'), 'a') as f:
+            f.write('late_customer\n')
+        with pytest.raises(ValueError):
+            pipeline.revenue_chart_data_batch('h', 0, 48, '2023-02-01', '2023-02-02')
+    finally:
+        pipeline.clear_caches()
+
+def test_write_partitions_requires_columns(tmp_path):
+    with pytest.raises(ValueError):
+        write_partitions(pd.DataFrame({'order_id': ['a']}), str(tmp_path / 'partitioned'), 'v1')
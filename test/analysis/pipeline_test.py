@@ -6,9 +6,16 @@ from src.analysis.pipeline import (
     prepare_data,
     compute_kpis,
     compute_weekly_monthly_revenue,
-    revenue_chart_data_batch
+    revenue_chart_data_batch,
+    clear_caches
 )
 
+@pytest.fixture(autouse=True)
+def clear_pipeline_caches():
+    clear_caches()
+    yield
+    clear_caches()
+
 @pytest.fixture
 def sample_data():
     orders_data = {
@@ -63,6 +70,33 @@ def test_prepare_data(sample_data):
     assert 'order_id' in result.columns
     assert result['revenue'].sum() == 330.0
 
+def test_prepare_data_leaves_inputs_untouched(sample_data):
+    before = [frame.copy() for frame in sample_data]
+    prepare_data(*sample_data)
+    for frame, original in zip(sample_data, before):
+        assert frame.equals(original)
+
+def test_prepare_data_matches_left_merge():
+    order_items = pd.DataFrame({
+        'order_id': ['o3', 'o1', 'missing', 'o2', 'o1', 'o4'],
+        'price': [5.0, 10.0, 7.0, 20.0, 1.0, 3.0],
+        'shipping_charges': [0.5, 1.0, 0.0, 2.0, 0.0, 0.0]
+    })
+    orders = pd.DataFrame({
+        'order_id': ['o1', 'o2', 'o3', 'o4'],
+        'customer_id': ['c1', 'c2', 'c1', 'stranger'],
+        'order_purchase_timestamp': ['2023-01-03', '2023-01-01', '2023-01-02', '2023-01-04'],
+        'order_approved_at': ['2023-01-03', '2023-01-01', '2023-01-02', '2023-01-04']
+    })
+    customers = pd.DataFrame({'customer_id': ['c2', 'c1']})
+    result = prepare_data(order_items, orders.astype({'order_id': 'category', 'customer_id': 'category'}), customers)
+
+    assert list(result.columns) == ['order_id', 'customer_id', 'order_purchase_timestamp', 'revenue']
+    assert list(result['order_id']) == ['o3', 'o1', 'missing', 'o2', 'o1', 'o4']
+    assert list(result['customer_id'].astype(object).fillna('')) == ['c1', 'c1', '', 'c2', 'c1', '']
+    assert list(result['order_purchase_timestamp'].dt.strftime('%d').fillna('')) == ['02', '03', '', '01', '03', '']
+    assert list(result['revenue']) == [5.5, 11.0, 7.0, 22.0, 1.0, 3.0]
+
 def test_compute_kpis(sample_data):
     df_order_items, df_orders, df_customers = sample_data
     df_full = prepare_data(df_order_items, df_orders, df_customers)
@@ -103,7 +137,7 @@ def test_revenue_chart_data_batch(monkeypatch, sample_data):
     
     assert isinstance(result, dict)
     assert 'data' in result
-    assert len(result['data']) <= 2
+    assert len(result['data']['date']) <= 2
 
 def test_revenue_chart_data_batch_with_dates(monkeypatch, sample_data):
     def mock_load_data():
@@ -125,7 +159,7 @@ def test_revenue_chart_data_batch_with_dates(monkeypatch, sample_data):
     
     assert isinstance(result, dict)
     assert 'data' in result
-    assert len(result['data']) <= 2
+    assert len(result['data']['date']) <= 2
 
 def test_load_data_file_not_found(monkeypatch):
     def mock_read_csv(*args, **kwargs):
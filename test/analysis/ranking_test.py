@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from src.analysis.ranking import Ranking, InvalidCursor, top_positions, encode_cursor, decode_cursor
+
+def full_sort(values):
+    # Reference ordering: value descending, position ascending.
+    return np.lexsort((np.arange(len(values)), -values))
+
+@pytest.mark.parametrize('k', [0, 1, 7, 50, 999, 1000, 5000])
+def test_top_positions_matches_full_sort_with_ties(k):
+    values = np.random.default_rng(3).integers(0, 40, 1000)
+    np.testing.assert_array_equal(top_positions(values, k), full_sort(values)[:k])
+
+def test_top_positions_float_values():
+    values = np.random.default_rng(4).gamma(2.0, 50.0, 10000)
+    np.testing.assert_array_equal(top_positions(values, 25), np.argsort(-values, kind='stable')[:25])
+
+def test_ranking_pages_cover_the_full_order():
+    values = np.random.default_rng(5).integers(0, 15, 503)
+    ranking = Ranking(values)
+    pages = [ranking.page(offset, 50) for offset in range(0, 503, 50)]
+    np.testing.assert_array_equal(np.concatenate(pages), full_sort(values))
+    assert ranking.ranked == 503
+
+def test_ranking_grows_prefix_lazily():
+    ranking = Ranking(np.arange(10000))
+    ranking.page(0, 10)
+    assert ranking.ranked == 10
+    ranking.page(10, 10)
+    assert ranking.ranked == 20
+    ranking.page(20, 5)
+    assert ranking.ranked == 40
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('abc123', 'spend', 40)
+    assert decode_cursor(cursor, 'abc123', 'spend') == 40
+
+@pytest.mark.parametrize('cursor,version,by', [
+    ('not-a-cursor!', 'v1', 'spend'),
+    (encode_cursor('v0', 'spend', 10), 'v1', 'spend'),
+    (encode_cursor('v1', 'orders', 10), 'v1', 'spend'),
+    (encode_cursor('v1', 'spend', -1), 'v1', 'spend')
+])
+def test_invalid_cursors(cursor, version, by):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, version, by)
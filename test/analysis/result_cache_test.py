@@ -0,0 +1,126 @@
+import asyncio
+import pytest
+import pandas as pd
+from redis.exceptions import ConnectionError as RedisConnectionError
+from src.analysis.result_cache import ResultCache, cache_key
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+
+    async def incr(self, key):
+        self.values[key] = str(int(self.values.get(key, b'0')) + 1).encode()
+
+    async def eval(self, script, numkeys, key, token):
+        # Stands in for the lock release script: delete only if the token still matches.
+        if self.values.get(key) == token.encode():
+            del self.values[key]
+            return 1
+        return 0
+
+class FailingAfterComputeRedis(FakeRedis):
+    async def eval(self, *args):
+        raise RedisConnectionError("down")
+
+class DownRedis:
+    async def get(self, key):
+        raise RedisConnectionError("down")
+
+    async def set(self, *args, **kwargs):
+        raise RedisConnectionError("down")
+
+def counting(value, delay=0.0):
+    calls = []
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return value
+    return compute, calls
+
+def test_cache_key_normalises_params():
+    assert cache_key('kpis', 'u1', 'v1', {'a': 1, 'b': None}) == cache_key('kpis', 'u1', 'v1', {'a': '1'})
+    assert cache_key('kpis', 'u1', 'v1', {}) != cache_key('kpis', 'u1', 'v2', {})
+    assert cache_key('kpis', 'u1', 'v1', {}) != cache_key('kpis', 'u2', 'v1', {})
+
+@pytest.mark.asyncio
+async def test_hit_after_first_compute():
+    cache = ResultCache(client=FakeRedis(), soft_ttl=60)
+    compute, calls = counting({"date": pd.Timestamp('2023-01-01'), "revenue": 1.5})
+    first = await cache.get_or_compute('revenue_batch', 'u1', 'v1', {}, compute)
+    second = await cache.get_or_compute('revenue_batch', 'u1', 'v1', {}, compute)
+    assert first == second == {"date": '2023-01-01T00:00:00', "revenue": 1.5}
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["hit_ratio"] == 0.5
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_compute_once():
+    cache = ResultCache(client=FakeRedis(), poll_interval=0.01)
+    compute, calls = counting({"value": 1}, delay=0.1)
+    results = await asyncio.gather(*[cache.get_or_compute('kpis', 'u1', 'v1', {}, compute) for _ in range(10)])
+    assert results == [{"value": 1}] * 10
+    assert len(calls) == 1
+    assert cache.stats()["waits"] == 9
+
+@pytest.mark.asyncio
+async def test_stale_value_served_while_refreshing():
+    cache = ResultCache(client=FakeRedis(), soft_ttl=0)
+    old, _ = counting('old')
+    await cache.get_or_compute('kpis', 'u1', 'v1', {}, old)
+    new, calls = counting('new', delay=0.1)
+    refreshing = asyncio.create_task(cache.get_or_compute('kpis', 'u1', 'v1', {}, new))
+    await asyncio.sleep(0.02)
+    assert await cache.get_or_compute('kpis', 'u1', 'v1', {}, new) == 'old'
+    assert await refreshing == 'new'
+    assert len(calls) == 1
+    assert cache.stats()["stale_hits"] == 1
+
+@pytest.mark.asyncio
+async def test_redis_errors_fall_back_to_computing():
+    cache = ResultCache(client=DownRedis())
+    compute, calls = counting([1, 2])
+    assert await cache.get_or_compute('kpis', 'u1', 'v1', {}, compute) == [1, 2]
+    assert len(calls) == 1
+    assert cache.stats()["errors"] == 1
+    assert await cache.user_data_version('u1') == '0'
+
+@pytest.mark.asyncio
+async def test_user_data_version_bump():
+    cache = ResultCache(client=FakeRedis())
+    assert await cache.user_data_version('u1') == '0'
+    await cache.bump_user_data_version('u1')
+    assert await cache.user_data_version('u1') == '1'
+
+@pytest.mark.asyncio
+async def test_release_keeps_a_lock_taken_by_another_worker():
+    client = FakeRedis()
+    cache = ResultCache(client=client)
+    key = cache_key('kpis', 'u1', 'v1', {})
+
+    async def compute():
+        # Our lock expired mid-compute and another worker now holds it.
+        client.values[f'{key}:lock'] = b'other-worker'
+        return 1
+
+    assert await cache.get_or_compute('kpis', 'u1', 'v1', {}, compute) == 1
+    assert client.values[f'{key}:lock'] == b'other-worker'
+
+@pytest.mark.asyncio
+async def test_failed_release_returns_the_computed_value():
+    cache = ResultCache(client=FailingAfterComputeRedis())
+    compute, calls = counting({"value": 1})
+    assert await cache.get_or_compute('kpis', 'u1', 'v1', {}, compute) == {"value": 1}
+    assert len(calls) == 1
+    assert cache.stats()["errors"] == 1
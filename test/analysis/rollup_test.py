@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.analysis.rollup import build_daily_rollup, rebucket, serves_freq, read_rollup, write_rollup
+from src.analysis import pipeline
+from src.analysis.pipeline import revenue_chart_data_batch, compute_weekly_monthly_revenue, clear_caches
+
+@pytest.fixture
+def random_full_frame():
+    rng = np.random.default_rng(7)
+    n = 5000
+    timestamps = pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 400 * 86400, n), unit='s')
+    return pd.DataFrame({
+        'order_id': rng.integers(0, 1500, n).astype(str),
+        'customer_id': rng.integers(0, 300, n).astype(str),
+        'order_purchase_timestamp': timestamps,
+        'revenue': rng.gamma(2.0, 50.0, n).round(2)
+    })
+
+@pytest.fixture(autouse=True)
+def clear_pipeline_caches():
+    clear_caches()
+    yield
+    clear_caches()
+
+def test_build_daily_rollup(random_full_frame):
+    rollup = build_daily_rollup(random_full_frame)
+    assert list(rollup.columns) == ['revenue', 'order_count', 'item_count']
+    assert rollup['item_count'].sum() == len(random_full_frame)
+    assert rollup['revenue'].sum() == pytest.approx(random_full_frame['revenue'].sum())
+    assert rollup.index.is_monotonic_increasing
+
+@pytest.mark.parametrize('freq', ['D', '3D', 'W', 'M', 'Q', 'MS'])
+def test_rebucket_matches_grouper(random_full_frame, freq):
+    expected = random_full_frame.groupby(pd.Grouper(key='order_purchase_timestamp', freq=freq))['revenue'].sum()
+    result = rebucket(build_daily_rollup(random_full_frame), freq)['revenue']
+    assert list(result.index) == list(expected.index)
+    np.testing.assert_allclose(result.values, expected.values)
+
+def test_serves_freq():
+    assert serves_freq('W')
+    assert serves_freq('M')
+    assert serves_freq('2D')
+    assert not serves_freq('h')
+    assert not serves_freq('36h')
+
+def test_rollup_round_trip(tmp_path, random_full_frame):
+    pytest.importorskip('pyarrow')
+    rollup = build_daily_rollup(random_full_frame)
+    write_rollup(rollup, str(tmp_path), 'v1')
+    write_rollup(rollup, str(tmp_path), 'v2')
+    assert read_rollup(str(tmp_path), 'v1') is None
+    pd.testing.assert_frame_equal(read_rollup(str(tmp_path), 'v2'), rollup, check_freq=False)
+
+@pytest.mark.parametrize('freq', ['W', 'h'])
+def test_revenue_chart_data_batch_paths_agree(monkeypatch, random_full_frame, freq):
+    sorted_frame = random_full_frame.sort_values('order_purchase_timestamp', ignore_index=True)
+    monkeypatch.setattr(pipeline, 'get_prepared_data', lambda: sorted_frame)
+    result = revenue_chart_data_batch(freq=freq, offset=3, limit=5,
+                                      start_date='2022-02-01', end_date='2022-03-31')
+    df = random_full_frame
+    mask = (df['order_purchase_timestamp'] >= '2022-02-01') & (df['order_purchase_timestamp'] < '2022-04-01')
+    expected = df.loc[mask].groupby(pd.Grouper(key='order_purchase_timestamp', freq=freq))['revenue'].sum().iloc[3:8]
+    assert result['data']['date'] == list(expected.index.strftime('%Y-%m-%dT%H:%M:%S'))
+    np.testing.assert_allclose(result['data']['revenue'], expected.values)
+
+def test_compute_weekly_monthly_revenue_from_rollup(random_full_frame):
+    rollup = build_daily_rollup(random_full_frame)
+    weekly, monthly = compute_weekly_monthly_revenue(rollup=rollup)
+    assert weekly['weekly_revenue'].sum() == pytest.approx(random_full_frame['revenue'].sum())
+    assert monthly['monthly_revenue'].sum() == pytest.approx(random_full_frame['revenue'].sum())
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.analysis import pipeline
+from src.analysis.sketches import (
+    bit_length,
+    build_daily_sketches,
+    estimate,
+    fold,
+    relative_error,
+    read_sketches,
+    write_sketches
+)
+
+@pytest.fixture
+def orders():
+    rng = np.random.default_rng(8)
+    n = 60000
+    return pd.DataFrame({
+        'order_id': [f'order{i}' for i in rng.integers(0, 40000, n)],
+        'customer_id': pd.Categorical([f'cust{i}' for i in rng.integers(0, 9000, n)]),
+        'order_purchase_timestamp': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 60 * 86400, n), unit='s')
+    })
+
+def test_bit_length_is_exact_for_64_bit_values():
+    values = np.array([0, 1, 2, 3, 2**53 - 1, 2**53, 2**53 + 1, 2**63, 2**64 - 1], dtype=np.uint64)
+    randoms = np.random.default_rng(1).integers(0, 2**63, 1000, dtype=np.uint64) << np.uint64(1)
+    values = np.concatenate([values, randoms])
+    assert bit_length(values).tolist() == [int(value).bit_length() for value in values]
+
+@pytest.mark.parametrize('precision', [10, 12, 14])
+def test_estimate_within_error_bound(orders, precision):
+    sketches = build_daily_sketches(orders['order_id'], orders['customer_id'],
+                                    orders['order_purchase_timestamp'], precision)
+    order_registers, customer_registers = sketches.merged(0, len(sketches.days))
+    error = relative_error(precision)
+    assert estimate(order_registers) == pytest.approx(orders['order_id'].nunique(), rel=4 * error)
+    assert estimate(customer_registers) == pytest.approx(orders['customer_id'].nunique(), rel=4 * error)
+
+def test_fold_matches_building_at_lower_precision(orders):
+    args = orders['order_id'], orders['customer_id'], orders['order_purchase_timestamp']
+    high = build_daily_sketches(*args, 14)
+    low = build_daily_sketches(*args, 9)
+    np.testing.assert_array_equal(fold(high.merged(0, len(high.days))[0], 14, 9), low.merged(0, len(low.days))[0])
+
+def test_range_merge_matches_range_sketch(orders):
+    sketches = build_daily_sketches(orders['order_id'], orders['customer_id'],
+                                    orders['order_purchase_timestamp'], 12)
+    in_range = orders['order_purchase_timestamp'].between('2023-01-10', '2023-01-20 23:59:59')
+    subset = orders.loc[in_range]
+    expected = build_daily_sketches(subset['order_id'], subset['customer_id'], subset['order_purchase_timestamp'], 12)
+    lo, hi = sketches.days.searchsorted(pd.Timestamp('2023-01-10')), sketches.days.searchsorted(pd.Timestamp('2023-01-21'))
+    merged_orders, merged_customers = sketches.merged(lo, hi)
+    np.testing.assert_array_equal(merged_orders, expected.merged(0, len(expected.days))[0])
+    np.testing.assert_array_equal(merged_customers, expected.merged(0, len(expected.days))[1])
+
+def test_sketches_round_trip_and_prune(orders, tmp_path):
+    sketches = build_daily_sketches(orders['order_id'], orders['customer_id'],
+                                    orders['order_purchase_timestamp'], 8)
+    write_sketches(sketches, str(tmp_path), 'v1')
+    write_sketches(sketches, str(tmp_path), 'v2')
+    assert read_sketches(str(tmp_path), 'v1', 8) is None
+    restored = read_sketches(str(tmp_path), 'v2', 8)
+    assert list(restored.days) == list(sketches.days)
+    np.testing.assert_array_equal(restored.orders, sketches.orders)
+
+def test_precision_out_of_range(orders):
+    with pytest.raises(ValueError):
+        build_daily_sketches(orders['order_id'], orders['customer_id'], orders['order_purchase_timestamp'], 20)
+
+@pytest.mark.parametrize('mode', ['memory', 'streaming'])
+def test_approximate_kpis(monkeypatch, tmp_path, orders, mode):
+    orders.assign(order_approved_at=orders['order_purchase_timestamp']).drop_duplicates('order_id').to_csv(
+        tmp_path / 'df_Orders.csv', index=False)
+    pd.DataFrame({'order_id': orders['order_id'], 'price': 10.0, 'shipping_charges': 1.0}).to_csv(
+        tmp_path / 'df_OrderItems.csv', index=False)
+    pd.DataFrame({'customer_id': orders['customer_id'].unique()}).to_csv(tmp_path / 'df_Customers.csv', index=False)
+    monkeypatch.setattr(pipeline, 'base_path', str(tmp_path))
+    monkeypatch.setattr(pipeline, 'ANALYSIS_MODE', mode)
+    pipeline.clear_caches()
+    try:
+        df_full = pipeline.get_prepared_data()
+        in_range = df_full['order_purchase_timestamp'].between('2023-02-01', '2023-02-14 23:59:59')
+        result = pipeline.approximate_kpis('2023-02-01', '2023-02-14', precision=10)
+        assert result['precision'] == 10
+        assert result['relative_error'] == pytest.approx(relative_error(10))
+        exact = df_full.loc[in_range, 'order_id'].nunique()
+        assert result['order_volume'] == pytest.approx(exact, rel=4 * result['relative_error'])
+        assert result['order_volume_interval'][0] <= result['order_volume'] <= result['order_volume_interval'][1]
+        assert result['total_revenue'] == pytest.approx(df_full.loc[in_range, 'revenue'].sum())
+        with pytest.raises(ValueError):
+            pipeline.approximate_kpis(precision=pipeline.HLL_PRECISION + 1)
+    finally:
+        pipeline.clear_caches()
@@ -0,0 +1,75 @@
+import os
+import pytest
+import pandas as pd
+from src.analysis.pipeline import (load_data, prepare_data, data_files, data_files_version, convert_to_snapshots,
+                                   append_batch, stream_data, compute_kpis)
+from src.analysis.snapshots import snapshot_parts
+
+pytest.importorskip('pyarrow')
+
+@pytest.fixture
+def csv_dataset(tmp_path):
+    pd.DataFrame({
+        'order_id': ['order1', 'order2'],
+        'customer_id': ['cust1', 'cust2'],
+        'order_purchase_timestamp': ['2023-01-01 10:00:00', '2023-01-02 11:30:00'],
+        'order_approved_at': ['2023-01-01 12:00:00', '2023-01-02 12:00:00']
+    }).to_csv(tmp_path / 'df_Orders.csv', index=False)
+    pd.DataFrame({
+        'order_id': ['order1', 'order2', 'order2'],
+        'price': [100.0, 200.0, 50.0],
+        'shipping_charges': [10.0, 20.0, 5.0]
+    }).to_csv(tmp_path / 'df_OrderItems.csv', index=False)
+    pd.DataFrame({
+        'customer_id': ['cust1', 'cust2'],
+        'customer_city': ['Sao Paulo', 'Rio']
+    }).to_csv(tmp_path / 'df_Customers.csv', index=False)
+    return str(tmp_path)
+
+def test_load_data_falls_back_to_csv(csv_dataset):
+    assert all(path.endswith('.csv') for path in data_files(csv_dataset))
+    df_order_items, df_orders, df_customers = load_data(csv_dataset)
+    assert 'price' in df_order_items.columns
+
+def test_convert_to_snapshots(csv_dataset):
+    written = convert_to_snapshots(csv_dataset)
+    assert all(os.path.isfile(path) for path in written)
+    assert data_files(csv_dataset) == written
+
+    df_order_items, df_orders, df_customers = load_data(csv_dataset)
+    assert list(df_order_items.columns) == ['order_id', 'revenue']
+    assert pd.api.types.is_datetime64_any_dtype(df_orders['order_purchase_timestamp'])
+    assert list(df_customers.columns) == ['customer_id']
+
+def test_snapshot_and_csv_paths_agree(csv_dataset):
+    from_csv = prepare_data(*load_data(csv_dataset))
+    convert_to_snapshots(csv_dataset)
+    from_snapshot = prepare_data(*load_data(csv_dataset))
+
+    assert from_snapshot['revenue'].sum() == from_csv['revenue'].sum()
+    pd.testing.assert_series_equal(
+        from_snapshot['order_purchase_timestamp'],
+        from_csv['order_purchase_timestamp']
+    )
+
+def test_appended_batches_reach_every_snapshot_reader(csv_dataset):
+    convert_to_snapshots(csv_dataset)
+    version = data_files_version(csv_dataset)
+    append_batch(order_items=pd.DataFrame({'order_id': ['order1', 'order3'], 'price': [7.0, 8.0],
+                                           'shipping_charges': [1.0, 1.0]}),
+                 orders=pd.DataFrame({'order_id': ['order3'], 'customer_id': ['cust2'],
+                                      'order_purchase_timestamp': ['2023-01-03 09:00:00'],
+                                      'order_approved_at': ['2023-01-03 09:30:00']}),
+                 data_path=csv_dataset)
+    orders_file, order_items_file, customers_file = data_files(csv_dataset)
+    assert len(snapshot_parts(order_items_file)) == 2 and snapshot_parts(customers_file) == [customers_file]
+    assert data_files_version(csv_dataset) != version
+
+    expected = compute_kpis(prepare_data(*load_data(csv_dataset)))
+    assert expected['total_revenue'] == pytest.approx(402.0)
+    kpis, _, _ = stream_data(csv_dataset, chunk_size=2)
+    assert kpis['order_volume'] == expected['order_volume'] == 3
+    assert kpis['total_revenue'] == pytest.approx(expected['total_revenue'])
+
+    duckdb_backend = pytest.importorskip('src.analysis.duckdb_backend')
+    assert duckdb_backend.compute_kpis(csv_dataset)['total_revenue'] == pytest.approx(expected['total_revenue'])
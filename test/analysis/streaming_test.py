@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.analysis import pipeline
+from src.analysis.pipeline import stream_data, load_data, prepare_data, compute_kpis, clear_caches
+from src.analysis.rollup import build_daily_rollup
+
+@pytest.fixture
+def csv_dataset(tmp_path):
+    rng = np.random.default_rng(3)
+    n_orders, n_items = 400, 1500
+    order_ids = [f'order{i}' for i in range(n_orders)]
+    timestamps = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 90 * 86400, n_orders), unit='s')
+    pd.DataFrame({
+        'order_id': order_ids,
+        # cust99 has no customer record, so its orders drop out of the join.
+        'customer_id': [f'cust{i}' for i in rng.integers(0, 100, n_orders)],
+        'order_purchase_timestamp': timestamps.strftime('%Y-%m-%d %H:%M:%S'),
+        'order_approved_at': timestamps.strftime('%Y-%m-%d %H:%M:%S')
+    }).to_csv(tmp_path / 'df_Orders.csv', index=False)
+    item_orders = [order_ids[i] for i in rng.integers(0, n_orders, n_items)]
+    item_orders[:5] = ['unknown1', 'unknown1', 'unknown2', 'unknown3', 'unknown3']
+    pd.DataFrame({
+        'order_id': item_orders,
+        'price': rng.gamma(2.0, 50.0, n_items).round(2),
+        'shipping_charges': rng.gamma(2.0, 5.0, n_items).round(2)
+    }).to_csv(tmp_path / 'df_OrderItems.csv', index=False)
+    pd.DataFrame({
+        'customer_id': [f'cust{i}' for i in range(99)]
+    }).to_csv(tmp_path / 'df_Customers.csv', index=False)
+    return str(tmp_path)
+
+@pytest.mark.parametrize('chunk_size', [64, 10_000])
+def test_stream_data_matches_in_memory_pipeline(csv_dataset, chunk_size):
+    df_full = prepare_data(*load_data(csv_dataset))
+    expected = compute_kpis(df_full)
+    kpis, rollup, orders = stream_data(csv_dataset, chunk_size=chunk_size)
+
+    assert kpis['order_volume'] == expected['order_volume']
+    assert kpis['total_revenue'] == pytest.approx(expected['total_revenue'])
+    assert kpis['avg_customer_order'] == pytest.approx(expected['avg_customer_order'])
+    assert list(kpis['customer_spending']['customer_id']) == list(expected['customer_spending']['customer_id'])
+    np.testing.assert_allclose(kpis['customer_spending']['total_spent'], expected['customer_spending']['total_spent'])
+    assert list(kpis['orders_per_customer']['order_count']) == list(expected['orders_per_customer']['order_count'])
+
+    expected_rollup = build_daily_rollup(df_full)
+    assert list(rollup.index) == list(expected_rollup.index)
+    assert list(rollup['order_count']) == list(expected_rollup['order_count'])
+    assert list(rollup['item_count']) == list(expected_rollup['item_count'])
+    np.testing.assert_allclose(rollup['revenue'], expected_rollup['revenue'])
+    assert set(orders['order_id']) == set(df_full.loc[df_full['customer_id'].notna(), 'order_id'])
+
+def test_stream_data_keeps_first_row_of_duplicated_orders(csv_dataset):
+    orders_path = f'{csv_dataset}/df_Orders.csv'
+    orders = pd.read_csv(orders_path)
+    # Repeated orders under another customer and day; both modes must ignore the repeats.
+    repeats = orders.head(20).assign(customer_id='cust0', order_purchase_timestamp='2023-06-01 12:00:00')
+    pd.concat([orders, repeats]).to_csv(orders_path, index=False)
+
+    expected = compute_kpis(prepare_data(*load_data(csv_dataset)))
+    kpis, rollup, _ = stream_data(csv_dataset, chunk_size=128)
+    assert kpis['order_volume'] == expected['order_volume']
+    assert kpis['total_revenue'] == pytest.approx(expected['total_revenue'])
+    assert list(kpis['orders_per_customer']['order_count']) == list(expected['orders_per_customer']['order_count'])
+    assert pd.Timestamp('2023-06-01') not in rollup.index
+
+def test_streaming_mode_serves_kpis_and_rejects_intraday(monkeypatch, csv_dataset):
+    monkeypatch.setattr(pipeline, 'ANALYSIS_MODE', 'streaming')
+    monkeypatch.setattr(pipeline, 'base_path', csv_dataset)
+    clear_caches()
+    try:
+        assert pipeline.current_kpis()['order_volume'] > 0
+        assert len(pipeline.revenue_chart_data_batch(freq='W', limit=3)['data']['date']) == 3
+        with pytest.raises(ValueError):
+            pipeline.revenue_chart_data_batch(freq='h')
+    finally:
+        clear_caches()
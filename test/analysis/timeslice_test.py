@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.analysis.timeslice import window_buckets, slice_bounds, valid_length
+
+@pytest.fixture
+def sorted_series():
+    rng = np.random.default_rng(5)
+    offsets = pd.to_timedelta(rng.integers(0, 500 * 86400, 3000), unit='s')
+    timestamps = np.sort((pd.Timestamp('2022-01-03 05:00') + offsets).to_numpy())
+    return timestamps, rng.random(3000)
+
+@pytest.mark.parametrize('freq', ['D', '3D', 'W', 'W-MON', '2W', 'MS', '3MS', 'QS', 'h', '7h', '36h'])
+@pytest.mark.parametrize('offset,limit', [(0, 5), (4, 7), (1, 1), (0, 10_000), (10_000, 5)])
+def test_window_buckets_matches_full_grouping(sorted_series, freq, offset, limit):
+    timestamps, values = sorted_series
+    full = pd.Series(values, index=pd.DatetimeIndex(timestamps)).resample(freq).sum()
+    expected = full.iloc[offset:offset + limit]
+    result = window_buckets(timestamps, values, freq, offset, limit)
+    assert list(result.index) == list(expected.index)
+    np.testing.assert_allclose(result.to_numpy(), expected.to_numpy())
+
+def test_window_buckets_empty_input():
+    empty = np.array([], dtype='datetime64[ns]')
+    assert window_buckets(empty, np.array([]), 'W', 0, 10).empty
+
+def test_slice_bounds_skips_trailing_nat():
+    timestamps = pd.to_datetime(['2023-01-01', '2023-01-02', '2023-01-05', None, None]).to_numpy()
+    assert valid_length(timestamps) == 3
+    assert slice_bounds(timestamps) == (0, 3)
+    assert slice_bounds(timestamps, pd.Timestamp('2023-01-02'), pd.Timestamp('2023-01-05')) == (1, 2)
+    assert slice_bounds(timestamps, pd.Timestamp('2023-02-01'), pd.Timestamp('2023-01-01')) == (3, 3)
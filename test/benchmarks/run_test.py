@@ -0,0 +1,31 @@
+from benchmarks.run import compare, run_suite
+from benchmarks.synthetic import write_csv_dataset
+
+def results(**stages):
+    return {"stages": {name: {"seconds": seconds, "peak_mib": peak} for name, (seconds, peak) in stages.items()}}
+
+def test_compare_flags_regressions_past_threshold():
+    baseline = results(load_data=(1.0, 100.0), compute_kpis=(0.5, 50.0))
+    current = results(load_data=(1.3, 100.0), compute_kpis=(0.55, 80.0))
+    regressions = compare(current, baseline, threshold=0.25)
+    assert len(regressions) == 2
+    assert regressions[0].startswith('load_data seconds')
+    assert regressions[1].startswith('compute_kpis peak_mib')
+
+def test_compare_ignores_noise_on_tiny_stages():
+    baseline = results(revenue_chart_data_batch=(0.004, 0.5))
+    current = results(revenue_chart_data_batch=(0.008, 1.0))
+    assert compare(current, baseline, threshold=0.25) == []
+
+def test_compare_ignores_run_to_run_swings():
+    # 100k load_data medians measured on unchanged code, fastest as the baseline.
+    baseline = results(load_data=(0.33, 26.3))
+    assert compare(results(load_data=(0.49, 26.3)), baseline, threshold=0.25) == []
+    assert compare(results(load_data=(0.66, 26.3)), baseline, threshold=0.25) != []
+
+def test_run_suite_records_every_stage(tmp_path):
+    write_csv_dataset(str(tmp_path), 2000)
+    stages = run_suite(str(tmp_path), repeat=1)
+    assert list(stages) == ['load_data', 'prepare_data', 'compute_kpis',
+                            'compute_weekly_monthly_revenue', 'revenue_chart_data_batch']
+    assert all(stage["seconds"] >= 0 and stage["peak_mib"] >= 0 for stage in stages.values())
@@ -0,0 +1,29 @@
+import pandas as pd
+from benchmarks.synthetic import generate_frames, ensure_dataset
+import benchmarks.synthetic as synthetic
+
+def test_generate_frames_is_deterministic():
+    first = generate_frames(5000, seed=7)
+    second = generate_frames(5000, seed=7)
+    for left, right in zip(first, second):
+        pd.testing.assert_frame_equal(left, right)
+    assert not generate_frames(5000, seed=8)[0].equals(first[0])
+
+def test_generate_frames_shape():
+    order_items, orders, customers = generate_frames(20000, seed=1)
+    assert len(order_items) == 20000
+    assert set(order_items['order_id']) == set(orders['order_id'])
+    assert orders['order_id'].is_unique
+    # A few customers are missing from the customer export.
+    assert 0 < (~orders['customer_id'].isin(customers['customer_id'])).sum() < len(orders) * 0.01
+    # Skewed, not uniform: the busiest 1% of customers place well over 1% of orders.
+    counts = orders['customer_id'].value_counts()
+    assert counts.iloc[:len(counts) // 100].sum() > 0.05 * len(orders)
+
+def test_ensure_dataset_reuses_files(tmp_path, monkeypatch):
+    monkeypatch.setitem(synthetic.SIZES, 'tiny', 500)
+    path = ensure_dataset(str(tmp_path), 'tiny')
+    mtime = (tmp_path / 'tiny-seed0' / 'df_Orders.csv').stat().st_mtime_ns
+    assert ensure_dataset(str(tmp_path), 'tiny') == path
+    assert (tmp_path / 'tiny-seed0' / 'df_Orders.csv').stat().st_mtime_ns == mtime
+    assert len(pd.read_csv(tmp_path / 'tiny-seed0' / 'df_OrderItems.csv')) == 500
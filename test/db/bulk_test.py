@@ -0,0 +1,56 @@
+import uuid
+from decimal import Decimal
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, select, text
+from src.db.bulk import bulk_upsert, merge_sql, staged_records
+from src.db.db_schema import Customer, User
+
+def test_merge_keeps_last_staged_copy_per_key():
+    sql = merge_sql(Customer)
+    assert sql.startswith('INSERT INTO customers (id, user_id, platform, email,')
+    assert 'SELECT DISTINCT ON (id)' in sql
+    assert 'ORDER BY id, _bulk_seq DESC' in sql
+    assert 'ON CONFLICT (id) DO UPDATE SET user_id = EXCLUDED.user_id' in sql
+    assert 'id = EXCLUDED.id' not in sql
+
+def test_staged_records_follow_column_order_and_count():
+    counter = [0]
+    records = list(staged_records(iter([{'id': 'a', 'email': 'x'}, {'email': 'y', 'id': 'b'}]), ['id', 'email', 'platform'],
+                                  counter))
+    assert records == [('a', 'x', None, 0), ('b', 'y', None, 1)]
+    assert counter == [2]
+
+@pytest_asyncio.fixture
+async def user_id():
+    from src.db.utils import readonly_session, writable_session
+    try:
+        async with readonly_session() as session:
+            await session.execute(text('SELECT 1'))
+    except Exception:
+        pytest.skip("database not available")
+    user_id = uuid.uuid4()
+    async with writable_session() as session:
+        session.add(User(id=user_id, email=f'{user_id}@example.com'))
+    yield user_id
+    async with writable_session() as session:
+        await session.execute(delete(User).where(User.id == user_id))
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_inserts_then_updates(user_id):
+    from src.db.utils import writable_session
+    prefix = uuid.uuid4().hex[:8]
+    rows = [{'id': f'{prefix}-{i}', 'user_id': user_id, 'platform': 'shopify', 'total_spent': Decimal(i)}
+            for i in range(5)]
+    async with writable_session() as session:
+        assert await bulk_upsert(session, Customer, rows, batch_size=2) == 5
+    # A later copy of the same key in one call wins.
+    changed = [{**rows[0], 'total_spent': Decimal('99.00')}, {**rows[0], 'total_spent': Decimal('42.00')}]
+    async with writable_session() as session:
+        await bulk_upsert(session, Customer, changed)
+    async with writable_session() as session:
+        stored = dict((await session.execute(
+            select(Customer.id, Customer.total_spent).where(Customer.user_id == user_id))).all())
+    assert len(stored) == 5
+    assert stored[f'{prefix}-0'] == Decimal('42.00')
+    assert stored[f'{prefix}-4'] == Decimal('4.00')
@@ -0,0 +1,22 @@
+import asyncio
+import pytest
+from src.http_client import http_client, close_http_client
+
+@pytest.mark.asyncio
+async def test_calls_share_one_client_until_closed():
+    client = http_client()
+    assert http_client() is client
+    await close_http_client()
+    assert client.is_closed
+    replacement = http_client()
+    assert replacement is not client
+    await close_http_client()
+
+def test_each_event_loop_gets_its_own_client():
+    async def current():
+        return http_client()
+
+    first = asyncio.run(current())
+    second = asyncio.run(current())
+    assert first is not second
+    asyncio.run(close_http_client())
@@ -0,0 +1,330 @@
+import json
+import os
+import re
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.integrations import shopify_sync
+from src.integrations.shopify_sync import (graphql_url, ingest, map_record, sync_shopify, sync_integration,
+                                           upsert_statement, RESOURCES)
+
+PAYLOADS = os.path.join(os.path.dirname(__file__), 'payloads')
+MAX_QUERY_COST = 1000
+
+def recorded_nodes(resource: str) -> list[dict]:
+    # Reassembles the bulk lines into the nested nodes a paged query returns.
+    child = RESOURCES[resource][1]
+    nodes = {}
+    with open(os.path.join(PAYLOADS, f'{resource}.jsonl')) as f:
+        for line in f:
+            record = json.loads(line)
+            parent = record.pop('__parentId', None)
+            if parent is None:
+                nodes[record['id']] = {**record, **({child[0]: {'edges': []}} if child else {})}
+            else:
+                nodes[parent][child[0]]['edges'].append({'node': record})
+    return list(nodes.values())
+
+
+def requested_cost(query: str, variables: dict) -> int:
+    """Shopify's requested query cost: a point per object, and a connection costs two plus first x its nodes."""
+    cost, frames = 0, []
+    for fragment, name, arguments in re.findall(r'(\.\.\. on \w+\s*\{)|(\w+)\s*(\([^)]*\))?\s*\{|\}', query):
+        if not fragment and not name:
+            frames.pop()
+            continue
+        kind, multiplier, size = frames[-1] if frames else ('root', 1, 1)
+        first = re.search(r'first:\s*(\$?\w+)', arguments or '')
+        if not frames or fragment or name == 'edges':
+            frames.append((kind if frames else 'object', multiplier, size))
+        elif first:
+            size = first.group(1)
+            size = int(variables[size[1:]] if size.startswith('$') else size)
+            cost += 2 * multiplier
+            frames.append(('connection', multiplier, size))
+        elif name == 'node' and kind == 'connection':
+            cost += multiplier * size
+            frames.append(('object', multiplier * size, 1))
+        else:
+            cost += multiplier
+            frames.append(('object', multiplier, 1))
+    return cost
+
+def child_connection(edges: list, first: int, after: str | None) -> dict:
+    offset = int(after or 0)
+    page = edges[offset:offset + first]
+    return {'edges': page, 'pageInfo': {'hasNextPage': offset + len(page) < len(edges),
+                                        'endCursor': str(offset + len(page))}}
+
+
+class BulkHandler(BaseHTTPRequestHandler):
+    """Stands in for the Admin GraphQL API and the bulk export storage."""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body: bytes, content_type: str = 'application/json', status: int = 200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        state = self.server.state
+        state['tokens'].add(self.headers.get('X-Shopify-Access-Token'))
+        if 'pageInfo' in request['query']:
+            variables = request['variables']
+            cost = requested_cost(request['query'], variables)
+            state['costs'].append(cost)
+            if cost > MAX_QUERY_COST:
+                error = {'message': f'Query cost is {cost}, which exceeds the single query max cost limit '
+                                    f'({MAX_QUERY_COST}).',
+                         'extensions': {'code': 'MAX_COST_EXCEEDED', 'cost': cost, 'maxCost': MAX_QUERY_COST}}
+                self._send(json.dumps({'errors': [error]}).encode())
+                return
+            resource = re.search(r'\{\s*(\w+)\(', request['query']).group(1)
+            if resource == 'node':
+                parent = next(node for name in RESOURCES for node in recorded_nodes(name)
+                              if node['id'] == variables['id'])
+                child = next(key for key, value in parent.items() if isinstance(value, dict) and 'edges' in value)
+                state['pages'].append((child, variables['id'], variables['after']))
+                data = {'node': {child: child_connection(parent[child]['edges'], variables['first'],
+                                                         variables['after'])}}
+            else:
+                since = re.search(r"updated_at:>'([^']+)'", variables['query']).group(1)
+                # sortKey: UPDATED_AT
+                nodes = sorted((node for node in recorded_nodes(resource)
+                                if datetime.fromisoformat(node['updatedAt']) > datetime.fromisoformat(since)),
+                               key=lambda node: datetime.fromisoformat(node['updatedAt']))
+                child = RESOURCES[resource][1]
+                if child:
+                    nested_first = int(re.search(rf'{child[0]}\(first: (\d+)\)', request['query']).group(1))
+                    nodes = [{**node, child[0]: child_connection(node[child[0]]['edges'], nested_first, None)}
+                             for node in nodes]
+                state['pages'].append((resource, variables['after']))
+                data = {resource: child_connection([{'node': node} for node in nodes], variables['first'],
+                                                   variables['after'])}
+            self._send(json.dumps({'data': data, 'extensions': {'cost': {'requestedQueryCost': cost}}}).encode())
+            return
+        elif 'bulkOperationRunQuery' in request['query']:
+            name = request['variables']['query'].lstrip('{ ').split()[0]
+            state['queries'].append(name)
+            data = {'bulkOperationRunQuery': {'bulkOperation': {'id': f'gid://shopify/BulkOperation/{name}',
+                                                                'status': 'CREATED'}, 'userErrors': []}}
+        else:
+            name = request['variables']['id'].rsplit('/', 1)[-1]
+            polls = state['polls'][name] = state['polls'].get(name, 0) + 1
+            path = os.path.join(PAYLOADS, f'{name}.jsonl')
+            url = f'http://127.0.0.1:{self.server.server_port}/exports/{name}.jsonl' if os.path.exists(path) else None
+            status = 'RUNNING' if polls == 1 else state['final_status']
+            data = {'node': {'id': request['variables']['id'], 'status': status, 'errorCode': None,
+                             'objectCount': '0', 'url': url if status == 'COMPLETED' else None}}
+        self._send(json.dumps({'data': data}).encode())
+
+    def do_GET(self):
+        with open(os.path.join(PAYLOADS, os.path.basename(self.path)), 'rb') as f:
+            self._send(f.read(), 'application/jsonl')
+
+
+@pytest.fixture
+def shopify_server(monkeypatch):
+    monkeypatch.setattr(shopify_sync, 'BULK_POLL_SECONDS', 0)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), BulkHandler)
+    server.state = {'queries': [], 'polls': {}, 'pages': [], 'costs': [], 'tokens': set(),
+                    'final_status': 'COMPLETED'}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def collecting_writer(writes: list):
+    async def write(model, rows):
+        writes.append((model.__tablename__, list(rows)))
+    return write
+
+@pytest.mark.asyncio
+async def test_bulk_sync_streams_payloads_into_models(shopify_server):
+    writes = []
+    user_id = uuid.uuid4()
+    endpoint = f'http://127.0.0.1:{shopify_server.server_port}/admin/api/2024-10/graphql.json'
+    counts = await sync_shopify('test-shop', 'token', user_id, collecting_writer(writes), endpoint=endpoint)
+
+    assert shopify_server.state['queries'] == ['customers', 'products', 'orders']
+    assert shopify_server.state['tokens'] == {'token'}
+    assert counts == {'customers': 2, 'products': 1, 'variants': 2, 'orders': 2, 'order_items': 3}
+    assert [table for table, _ in writes] == ['customers', 'products', 'variants', 'orders', 'order_items']
+
+    rows = {table: rows for table, rows in writes}
+    assert rows['customers'][1]['created_at'] == datetime(2024, 1, 5, 10, 30)
+    assert rows['customers'][0]['total_spent'] == Decimal('150.50')
+    assert rows['variants'][0]['product_id'] == '201'
+    assert rows['orders'][0]['customer_id'] == '101'
+    assert rows['orders'][1]['customer_id'] is None
+    assert [item['order_id'] for item in rows['order_items']] == ['401', '401', '402']
+    assert rows['order_items'][1]['product_id'] is None
+    assert all(row['user_id'] == user_id for row in rows['order_items'])
+
+@pytest.mark.asyncio
+async def test_failed_bulk_operation_raises(shopify_server):
+    shopify_server.state['final_status'] = 'FAILED'
+    endpoint = f'http://127.0.0.1:{shopify_server.server_port}/graphql.json'
+    with pytest.raises(ValueError):
+        await sync_shopify('test-shop', 'token', uuid.uuid4(), collecting_writer([]), endpoint=endpoint)
+
+@pytest.mark.asyncio
+async def test_ingest_flushes_bounded_batches_parents_first():
+    async def records():
+        with open(os.path.join(PAYLOADS, 'orders.jsonl')) as f:
+            for line in f:
+                yield json.loads(line)
+
+    writes = []
+    counts = await ingest(records(), uuid.uuid4(), collecting_writer(writes), batch_size=2)
+    assert counts['orders'] == 2 and counts['order_items'] == 3
+    assert all(len(rows) <= 2 for _, rows in writes)
+    assert [table for table, _ in writes] == ['orders', 'order_items', 'orders', 'order_items', 'order_items']
+
+def test_mapping_and_upsert_statement():
+    assert map_record({'id': 'gid://shopify/BulkOperation/1'}, uuid.uuid4()) is None
+    assert graphql_url('test-shop') == 'https://test-shop.myshopify.com/admin/api/2024-10/graphql.json'
+    sql = str(upsert_statement(shopify_sync.Order).compile(dialect=postgresql.dialect()))
+    assert 'ON CONFLICT (id) DO UPDATE SET' in sql
+    assert 'total_price = excluded.total_price' in sql
+
+@pytest.mark.asyncio
+async def test_incremental_sync_pages_changes_after_watermark(monkeypatch, shopify_server):
+    monkeypatch.setattr(shopify_sync, 'SYNC_PAGE_SIZE', 1)
+    writes = []
+    endpoint = f'http://127.0.0.1:{shopify_server.server_port}/graphql.json'
+    counts = await sync_shopify('test-shop', 'token', uuid.uuid4(), collecting_writer(writes), endpoint=endpoint,
+                                since=datetime(2024, 2, 5, tzinfo=timezone.utc))
+
+    assert shopify_server.state['queries'] == []
+    assert shopify_server.state['pages'] == [('customers', None), ('customers', '1'), ('products', None),
+                                             ('orders', None)]
+    assert counts == {'customers': 2, 'products': 0, 'variants': 0, 'orders': 1, 'order_items': 1}
+    rows = dict(writes)
+    assert rows['order_items'][0]['order_id'] == '402'
+
+@pytest.mark.asyncio
+async def test_pages_stay_under_the_query_cost_limit(shopify_server):
+    endpoint = f'http://127.0.0.1:{shopify_server.server_port}/graphql.json'
+    await sync_shopify('test-shop', 'token', uuid.uuid4(), collecting_writer([]), endpoint=endpoint,
+                       since=datetime(2024, 1, 1, tzinfo=timezone.utc))
+    assert 0 < max(shopify_server.state['costs']) <= MAX_QUERY_COST
+    for resource in ['products', 'orders']:
+        cost = requested_cost(shopify_sync.page_query(resource), {'first': shopify_sync.page_size(resource)})
+        # Nested children make these the expensive pages; they are sized up to the limit, not far below it.
+        assert MAX_QUERY_COST - 100 < cost <= MAX_QUERY_COST
+
+@pytest.mark.asyncio
+async def test_queries_over_the_cost_limit_are_rejected(monkeypatch, shopify_server):
+    # Sized for a limit Shopify does not have, the pages ask for more than it serves.
+    monkeypatch.setattr(shopify_sync, 'MAX_QUERY_COST', 50000)
+    endpoint = f'http://127.0.0.1:{shopify_server.server_port}/graphql.json'
+    with pytest.raises(ValueError, match='max cost limit'):
+        await sync_shopify('test-shop', 'token', uuid.uuid4(), collecting_writer([]), endpoint=endpoint,
+                           since=datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+@pytest.mark.asyncio
+async def test_children_past_the_first_page_are_paged_per_parent(monkeypatch, shopify_server):
+    monkeypatch.setattr(shopify_sync, 'CHILD_PAGE_SIZE', 1)
+    writes = []
+    endpoint = f'http://127.0.0.1:{shopify_server.server_port}/graphql.json'
+    counts = await sync_shopify('test-shop', 'token', uuid.uuid4(), collecting_writer(writes), endpoint=endpoint,
+                                since=datetime(2023, 12, 1, tzinfo=timezone.utc))
+
+    assert counts['variants'] == 2
+    assert counts['order_items'] == 3
+    assert ('variants', 'gid://shopify/Product/201', '1') in shopify_server.state['pages']
+    assert ('lineItems', 'gid://shopify/Order/401', '1') in shopify_server.state['pages']
+    # A parent's children all come before the next parent, so batches still complete parents in order.
+    order_items = [row['id'] for table, rows in writes if table == 'order_items' for row in rows]
+    assert order_items == ['501', '502', '503']
+
+def transactions(session) -> list[list]:
+    # The statements of each committed transaction, in order.
+    committed, pending = [], []
+    for call in session.mock_calls:
+        if call[0] == 'execute':
+            pending.append(call.args[0])
+        elif call[0] == 'commit':
+            committed.append(pending)
+            pending = []
+    assert not pending
+    return committed
+
+@pytest.mark.asyncio
+async def test_watermark_advances_with_each_committed_batch(monkeypatch, shopify_server):
+    monkeypatch.setattr(shopify_sync.result_cache, 'bump_user_data_version', AsyncMock())
+    monkeypatch.setattr(shopify_sync, 'SYNC_BULK_COPY', False)
+    session = AsyncMock(spec=AsyncSession)
+    integration = SimpleNamespace(id=uuid.uuid4(), user_id=uuid.uuid4(), shop_url='test-shop', refresh_token='token',
+                                  last_synced_at=datetime(2024, 2, 1, tzinfo=timezone.utc))
+    endpoint = f'http://127.0.0.1:{shopify_server.server_port}/graphql.json'
+    started_at = datetime.now(timezone.utc)
+    report = await sync_integration(integration, session, endpoint=endpoint, batch_size=2)
+
+    assert report['mode'] == 'incremental'
+    assert report['total_records'] == 7
+    watermarks = []
+    for statements in transactions(session):
+        sql = [str(statement) for statement in statements]
+        # At most one watermark update per transaction, after the batch it covers.
+        assert all(text.startswith('INSERT') for text in sql[:-1])
+        if sql and sql[-1].startswith('UPDATE integrations SET last_synced_at'):
+            watermarks.append(statements[-1].compile().params['last_synced_at'])
+    overlap = timedelta(seconds=shopify_sync.SYNC_OVERLAP_SECONDS)
+    # Customers commit without moving it; then each orders batch moves it to the newest order it completes
+    # (401, then 402, whose line items came in later batches), and the finished sync to its start.
+    assert watermarks[:2] == [datetime(2024, 2, 2, 10, tzinfo=timezone.utc) - overlap,
+                              datetime(2024, 2, 10, 16, 45, tzinfo=timezone.utc) - overlap]
+    assert len(watermarks) == 3 and watermarks[2] >= started_at - overlap
+    assert report['watermark'] == watermarks[2].isoformat()
+    shopify_sync.result_cache.bump_user_data_version.assert_awaited_once_with(integration.user_id)
+    assert shopify_sync.SHOPIFY_SYNC_RECORDS.get(integration=str(integration.id), mode='incremental',
+                                                 table='customers') == 2
+
+@pytest.mark.asyncio
+async def test_failed_batch_keeps_earlier_watermark(monkeypatch, shopify_server):
+    monkeypatch.setattr(shopify_sync, 'SYNC_BULK_COPY', False)
+    session = AsyncMock(spec=AsyncSession)
+    executed = []
+
+    async def execute(statement, *args):
+        executed.append(str(statement))
+        # The upsert of order 402's line item fails.
+        if len(args) and args[0][0].get('id') == '503':
+            raise ValueError("connection lost")
+    session.execute.side_effect = execute
+    integration = SimpleNamespace(id=uuid.uuid4(), user_id=uuid.uuid4(), shop_url='test-shop', refresh_token='token',
+                                  last_synced_at=datetime(2024, 2, 1, tzinfo=timezone.utc))
+    with pytest.raises(ValueError):
+        await sync_integration(integration, session, batch_size=2,
+                               endpoint=f'http://127.0.0.1:{shopify_server.server_port}/graphql.json')
+    updates = [text for text in executed if text.startswith('UPDATE integrations')]
+    # Only order 401's batch committed a watermark; the failed batch's never ran.
+    assert len(updates) == 1
+    assert executed[-1].startswith('INSERT INTO order_items')
+
+@pytest.mark.asyncio
+async def test_failed_sync_keeps_watermark(shopify_server):
+    shopify_server.state['final_status'] = 'FAILED'
+    session = AsyncMock(spec=AsyncSession)
+    integration = SimpleNamespace(id=uuid.uuid4(), user_id=uuid.uuid4(), shop_url='test-shop', refresh_token='token',
+                                  last_synced_at=None)
+    with pytest.raises(ValueError):
+        await sync_integration(integration, session,
+                               endpoint=f'http://127.0.0.1:{shopify_server.server_port}/graphql.json')
+    session.execute.assert_not_awaited()
@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+import pytest
+
+from src.integrations import throttle
+from src.integrations.shopify_sync import sync_shopify
+from src.integrations.sync_scheduler import SyncScheduler
+from src.integrations.throttle import CostLimiter
+
+QUERY_COST = 40
+CAPACITY = 100
+RESTORE_RATE = 100
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    """Answers every page query with an empty page, metering each shop like Shopify does."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        shop = self.path.strip('/').split('/')[0]
+        state = self.server.state
+        with state['lock']:
+            now = time.monotonic()
+            available, updated = state['buckets'].get(shop, (CAPACITY, now))
+            available = min(CAPACITY, available + (now - updated) * RESTORE_RATE)
+            throttled = available < QUERY_COST
+            if not throttled:
+                available -= QUERY_COST
+            state['buckets'][shop] = (available, now)
+            state['calls'] += 1
+            state['throttled'] += throttled
+        cost = {'requestedQueryCost': QUERY_COST, 'actualQueryCost': None if throttled else QUERY_COST,
+                'throttleStatus': {'maximumAvailable': CAPACITY, 'currentlyAvailable': available,
+                                   'restoreRate': RESTORE_RATE}}
+        if throttled and shop.endswith('-rest'):
+            body, status = b'{"errors": "Exceeded 2 calls per second for api client."}', 429
+        elif throttled:
+            body, status = json.dumps({'errors': [{'message': 'Throttled', 'extensions': {'code': 'THROTTLED'}}],
+                                       'extensions': {'cost': cost}}).encode(), 200
+        else:
+            resource = request['query'].split('{', 1)[1].split('(', 1)[0].strip()
+            body = json.dumps({'data': {resource: {'edges': [], 'pageInfo': {'hasNextPage': False, 'endCursor': None}}},
+                               'extensions': {'cost': cost}}).encode()
+            status = 200
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if status == 429:
+            self.send_header('Retry-After', '0.05')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def throttling_server(monkeypatch):
+    monkeypatch.setattr(throttle, 'BACKOFF_BASE_SECONDS', 0.01)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ThrottlingHandler)
+    server.state = {'lock': threading.Lock(), 'buckets': {}, 'calls': 0, 'throttled': 0}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def integration(user_id, shop: str):
+    return SimpleNamespace(id=uuid.uuid4(), user_id=user_id, shop_url=shop, refresh_token='token',
+                           last_synced_at=datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+def test_round_robin_interleaves_tenants():
+    a, b, c = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    integrations = [integration(a, 'a1'), integration(a, 'a2'), integration(a, 'a3'),
+                    integration(b, 'b1'), integration(c, 'c1'), integration(c, 'c2')]
+    order = [item.shop_url for item in SyncScheduler.round_robin(integrations)]
+    assert order == ['a1', 'b1', 'c1', 'a2', 'c2', 'a3']
+
+@pytest.mark.asyncio
+async def test_scheduler_caps_concurrency_and_survives_throttling(throttling_server):
+    base = f'http://127.0.0.1:{throttling_server.server_port}'
+    running = peak = 0
+
+    async def write(model, rows):
+        pass
+
+    async def sync(item, limiter):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        try:
+            counts = await sync_shopify(item.shop_url, item.refresh_token, item.user_id, write,
+                                        endpoint=f'{base}/{item.shop_url}/graphql.json',
+                                        since=item.last_synced_at, limiter=limiter)
+            return {"integration_id": str(item.id), "records": counts}
+        finally:
+            running -= 1
+
+    tenants = [uuid.uuid4() for _ in range(3)]
+    integrations = [integration(tenants[i % 3], f'shop{i}' + ('-rest' if i % 2 else '')) for i in range(6)]
+    scheduler = SyncScheduler(sync, concurrency=2)
+    # Another app has just emptied every shop's bucket; the limiters start out assuming a full one.
+    throttling_server.state['buckets'] = {item.shop_url: (0.0, time.monotonic()) for item in integrations}
+    reports = await scheduler.run(integrations)
+    throttled = throttling_server.state['throttled']
+    assert throttled > 0
+    assert all(limiter.capacity == CAPACITY for limiter in scheduler.limiters.values())
+
+    # Having learnt the real buckets, the second run paces itself instead of being throttled.
+    reports += await scheduler.run(integrations)
+    assert throttling_server.state['throttled'] == throttled
+    assert peak == 2
+    assert all('error' not in report for report in reports)
+
+@pytest.mark.asyncio
+async def test_failed_sync_is_reported_not_raised():
+    async def sync(item, limiter):
+        if item.shop_url == 'broken':
+            raise ValueError("Shopify API error: 401")
+        return {"integration_id": str(item.id)}
+
+    user_id = uuid.uuid4()
+    reports = await SyncScheduler(sync, concurrency=4).run([integration(user_id, 'broken'), integration(user_id, 'ok')])
+    assert reports[0]["error"] == "Shopify API error: 401"
+    assert 'error' not in reports[1]
+
+@pytest.mark.asyncio
+async def test_limiter_waits_for_restored_points():
+    limiter = CostLimiter(capacity=100, restore_rate=1000)
+    limiter.observe(cost={'requestedQueryCost': 50,
+                          'throttleStatus': {'maximumAvailable': 100, 'currentlyAvailable': 0, 'restoreRate': 1000}})
+    started = time.monotonic()
+    await limiter.acquire(50)
+    assert time.monotonic() - started >= 0.04
+    assert limiter.waited == pytest.approx(0.05, abs=0.01)
+
+    limiter.observe(call_limit='38/40')
+    assert (limiter.capacity, limiter.available) == (40, 2)
@@ -0,0 +1,51 @@
+import pytest
+from src.metrics import Registry, stage_timer, PIPELINE_STAGE_ERRORS
+
+def test_counter_and_gauge_render_in_prometheus_text_format():
+    registry = Registry()
+    requests = registry.counter('requests_total', 'Requests served.', ('route',))
+    requests.inc(route='/a')
+    requests.inc(2, route='/a')
+    registry.gauge('queue_depth', 'Queued calls.').set(3)
+    text = registry.render()
+    assert '# TYPE requests_total counter\n' in text
+    assert 'requests_total{route="/a"} 3\n' in text
+    assert 'queue_depth 3\n' in text
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1.0))
+    for value in [0.05, 0.5, 0.5, 5.0]:
+        latency.observe(value)
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert 'latency_seconds_count 4' in lines
+    assert latency.get() == (4, pytest.approx(6.05))
+
+def test_label_values_are_escaped_and_checked():
+    registry = Registry()
+    errors = registry.counter('errors_total', 'Errors.', ('message',))
+    errors.inc(message='say "hi"\n')
+    assert 'errors_total{message="say \\"hi\\"\\n"} 1' in registry.render()
+    with pytest.raises(ValueError):
+        errors.inc(route='/a')
+
+def test_drained_deltas_merge_into_another_registry():
+    worker, parent = Registry(), Registry()
+    for registry in (worker, parent):
+        registry.counter('calls_total', 'Calls.').inc()
+        registry.histogram('call_seconds', 'Call time.', buckets=(1.0,)).observe(0.5)
+    deltas = worker.drain()
+    assert worker.drain() == {}
+    parent.merge(deltas)
+    assert parent.counter('calls_total', 'Calls.').get() == 2
+    assert parent.histogram('call_seconds', 'Call time.').get() == (2, 1.0)
+
+def test_stage_timer_counts_failures():
+    before = PIPELINE_STAGE_ERRORS.get(stage='metrics_test') or 0
+    with pytest.raises(KeyError):
+        with stage_timer('metrics_test'):
+            raise KeyError('missing')
+    assert PIPELINE_STAGE_ERRORS.get(stage='metrics_test') == before + 1